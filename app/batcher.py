@@ -0,0 +1,67 @@
+import asyncio
+import time
+
+
+class MicroBatcher:
+    """
+    Микро-батчинг одиночных предсказаний в цикле событий: запросы копятся
+    в очереди и раз в max_wait секунд (или при наборе max_batch_size)
+    считаются одной матрицей через predict(items, model). Каждый запрос
+    получает свой результат через собственный future.
+
+    Запросы к разным версиям модели (A/B) попадают в разные пакеты.
+    Весь код выполняется в одном цикле событий, поэтому блокировки не нужны.
+    """
+
+    def __init__(self, predict, max_batch_size=64, max_wait=0.002, batch_observer=None, wait_observer=None):
+        self.predict = predict
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.batch_observer = batch_observer  # размер пакета
+        self.wait_observer = wait_observer    # секунды ожидания в очереди
+        self._pending = []  # (модель, данные, future, время постановки)
+        self._timer = None
+
+    async def submit(self, data, model):
+        """Результат predict для одного матча: {"prediction", "probabilities"} или {"error"}"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((model, data, future, time.perf_counter()))
+        if len(self._pending) >= self.max_batch_size:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self.flush)
+        return await future
+
+    def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+
+        flushed = time.perf_counter()
+        groups = {}
+        for entry in pending:
+            groups.setdefault(id(entry[0]), (entry[0], []))[1].append(entry)
+
+        for model, entries in groups.values():
+            if self.batch_observer is not None:
+                self.batch_observer(len(entries))
+            if self.wait_observer is not None:
+                for entry in entries:
+                    self.wait_observer(flushed - entry[3])
+
+            try:
+                results = self.predict([entry[1] for entry in entries], model)
+            except Exception as e:
+                for entry in entries:
+                    if not entry[2].done():
+                        entry[2].set_exception(e)
+                continue
+
+            # Клиент мог отключиться — его future уже отменён
+            for entry, result in zip(entries, results):
+                if not entry[2].done():
+                    entry[2].set_result(result)
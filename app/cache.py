@@ -0,0 +1,126 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+
+
+class PredictionCache:
+    """
+    Кэш предсказаний в памяти процесса: ограничение по размеру (LRU),
+    время жизни записей (TTL) и сброс при изменении файлов модели.
+    """
+
+    def __init__(self, maxsize=10000, ttl=300.0, float_digits=6, watch_paths=(), check_interval=1.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.float_digits = float_digits
+        self.watch_paths = list(watch_paths)
+        self.check_interval = check_interval
+
+        self._entries = OrderedDict()  # ключ -> (истекает, значение)
+        self._lock = threading.Lock()
+        self.listeners = []  # вызываются со списком изменившихся файлов после сброса
+        self.generation = 0  # растёт при каждом сбросе
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+        self._signature = self._artifacts_signature()
+        self._next_check = time.monotonic() + check_interval
+
+    def make_key(self, data: dict) -> str:
+        """Канонический ключ запроса: округлённые числа, отсортированные ключи"""
+        canonical = {}
+        for key, value in data.items():
+            if isinstance(value, float):
+                value = round(value, self.float_digits)
+            elif isinstance(value, date):
+                value = value.isoformat()
+            canonical[key] = value
+        # Без даты предсказание считается на сегодня — это часть ключа
+        canonical['Date'] = canonical.get('Date') or date.today().isoformat()
+        return json.dumps(canonical, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+
+    def get(self, key):
+        self._check_artifacts()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, generation=None):
+        """
+        generation — значение self.generation до начала расчёта: если кэш с тех пор
+        сбрасывался, результат посчитан по устаревшему состоянию и не сохраняется.
+        """
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+    def _artifacts_signature(self):
+        signature = []
+        for path in self.watch_paths:
+            try:
+                stat = os.stat(path)
+                signature.append((path, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append((path, None, None))
+        return signature
+
+    def _check_artifacts(self):
+        # Файлы проверяются не чаще раза в check_interval секунд
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+
+        signature = self._artifacts_signature()
+        if signature != self._signature:
+            changed = [new[0] for old, new in zip(self._signature, signature) if old != new]
+            self._signature = signature
+            self.clear()
+            for listener in self.listeners:
+                listener(changed)
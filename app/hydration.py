@@ -0,0 +1,108 @@
+import os
+from datetime import date, datetime
+
+import pandas as pd
+
+from elo import compute_elo
+from storage import read_table
+from team_state import FeatureState
+
+# Без расширения: read_table возьмёт Parquet или CSV
+DATA_PATH = os.path.join(os.path.dirname(__file__), "../data/processed_with_all_features")
+
+# Статистика матча со стороны хозяев и гостей
+HOME_STATS = ['HTHG', 'HS', 'HST', 'HF', 'HC', 'HY', 'HR']
+AWAY_STATS = ['HTAG', 'AS', 'AST', 'AF', 'AC', 'AY', 'AR']
+ODDS = ['B365H', 'B365D', 'B365A']
+# Состояние команд пересчитывается из исходных колонок — готовые фичи не читаем
+COLUMNS = ['Date', 'HomeTeam', 'AwayTeam', 'FTR'] + HOME_STATS + AWAY_STATS + ODDS
+
+
+class FeatureHydrator:
+    """
+    Таблица последнего состояния команд, собранная из обработанного датасета.
+    Позволяет клиенту прислать только команды (и дату) — остальные признаки
+    заполняются на сервере поиском по словарям.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        df = df.sort_values(by='Date', kind='stable').reset_index(drop=True)
+
+        # Форма, личные встречи, средние и Elo после последнего сыгранного матча
+        _, _, elo_ratings = compute_elo(df['HomeTeam'], df['AwayTeam'], df['FTR'])
+        self.state = FeatureState.from_history(df, elo_ratings)
+
+        # Последние известные статистика и коэффициенты команды дома и в гостях
+        self.home_rows = self._latest(df, ['HomeTeam'], HOME_STATS + ODDS)
+        self.away_rows = self._latest(df, ['AwayTeam'], AWAY_STATS + ODDS)
+        self.meetings = self._latest(df, ['HomeTeam', 'AwayTeam'], ODDS)
+
+        # Уже учтённые матчи: повторно присланный результат не считается дважды
+        self.recorded = set(zip(df['Date'], df['HomeTeam'], df['AwayTeam']))
+
+    @staticmethod
+    def _latest(df, keys, columns):
+        latest = df.groupby(keys, sort=False).tail(1)
+        index = latest[keys[0]] if len(keys) == 1 else zip(*(latest[k] for k in keys))
+        return dict(zip(index, latest[columns].to_dict('records')))
+
+    @classmethod
+    def from_table(cls, path=DATA_PATH):
+        return cls(read_table(path, columns=COLUMNS))
+
+    @property
+    def teams(self):
+        return sorted(self.state.teams)
+
+    def hydrate(self, data: dict) -> dict:
+        """Заполняет недостающие признаки; переданные клиентом значения имеют приоритет"""
+        home_team = data['HomeTeam']
+        away_team = data['AwayTeam']
+
+        match_date = data.get('Date') or date.today()
+        if isinstance(match_date, str):
+            match_date = datetime.fromisoformat(match_date).date()
+
+        filled = {'Year': match_date.year, 'Month': match_date.month, 'Day': match_date.day}
+        filled.update(self.state.features(home_team, away_team))
+
+        home_row = self.home_rows.get(home_team, {})
+        away_row = self.away_rows.get(away_team, {})
+        filled.update({column: home_row.get(column) for column in HOME_STATS})
+        filled.update({column: away_row.get(column) for column in AWAY_STATS})
+
+        # Коэффициенты: последняя очная встреча, иначе последние матчи команд
+        odds = self.meetings.get((home_team, away_team)) or {
+            'B365H': home_row.get('B365H'),
+            'B365D': home_row.get('B365D'),
+            'B365A': away_row.get('B365A'),
+        }
+        filled.update(odds)
+
+        filled.update({key: value for key, value in data.items() if value is not None})
+        return filled
+
+    def is_recorded(self, result: dict) -> bool:
+        return (pd.Timestamp(result['Date']), result['HomeTeam'], result['AwayTeam']) in self.recorded
+
+    def record(self, result: dict):
+        """
+        Учитывает сыгранный матч (как features.py --incremental): форма, личные
+        встречи и Elo команд, а также последние статистика и коэффициенты.
+        В result — команды, дата, FTR и удары в створ HST/AST.
+        """
+        home_team = result['HomeTeam']
+        away_team = result['AwayTeam']
+        match_date = pd.Timestamp(result['Date'])
+        self.state.update(home_team, away_team, float(result['HST']), float(result['AST']),
+                          result['FTR'], match_date)
+        self.recorded.add((match_date, home_team, away_team))
+
+        # Пропущенные в результате колонки остаются прежними
+        def merge(previous, columns):
+            return {**previous, **{c: result[c] for c in columns if result.get(c) is not None}}
+
+        self.home_rows[home_team] = merge(self.home_rows.get(home_team, {}), HOME_STATS + ODDS)
+        self.away_rows[away_team] = merge(self.away_rows.get(away_team, {}), AWAY_STATS + ODDS)
+        if any(result.get(c) is not None for c in ODDS):
+            self.meetings[(home_team, away_team)] = merge(self.meetings.get((home_team, away_team), {}), ODDS)
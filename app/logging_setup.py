@@ -0,0 +1,166 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+from datetime import datetime, timezone
+
+# ----------------------------
+# Неблокирующее логирование: обработчики только кладут записи в очередь,
+# фоновый поток пишет их пачками в JSON Lines с ротацией файла.
+# ----------------------------
+
+# Стандартные атрибуты LogRecord — всё остальное считается полями extra
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает только долю sample_rate записей ниже WARNING; ошибки — всегда"""
+
+    def __init__(self, sample_rate=1.0):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.sample_rate >= 1.0:
+            return True
+        return random.random() < self.sample_rate
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, который при переполнении очереди отбрасывает запись, а не ждёт"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Сообщение и трассировку фиксируем сразу, сериализация — в фоновом потоке
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def format_record(record):
+    entry = {
+        "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+        "level": record.levelname,
+        "logger": record.name,
+        "message": record.getMessage(),
+    }
+    for key, value in vars(record).items():
+        if key not in _RECORD_ATTRIBUTES:
+            entry[key] = value
+    if record.exc_text:
+        entry["exc_info"] = record.exc_text
+    return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class BatchedJsonWriter(threading.Thread):
+    """Фоновый поток: забирает записи из очереди пачками и пишет их одним вызовом"""
+
+    _STOP = object()
+
+    def __init__(self, log_queue, filename, max_bytes=10 * 1024 * 1024, backup_count=5,
+                 batch_size=500, flush_interval=0.5):
+        super().__init__(name="log-writer", daemon=True)
+        self.queue = log_queue
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._stream = open(filename, 'a', encoding='utf-8')
+
+    def run(self):
+        while True:
+            try:
+                first = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            batch = [first]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = any(item is self._STOP for item in batch)
+            records = [item for item in batch if item is not self._STOP]
+            if records:
+                self._write(records)
+            if stop:
+                break
+
+        self._stream.close()
+
+    def _write(self, records):
+        lines = []
+        for record in records:
+            try:
+                lines.append(format_record(record))
+            except Exception:
+                lines.append(json.dumps({"level": "ERROR", "message": "Не удалось сериализовать запись лога"}))
+        self._stream.write("\n".join(lines) + "\n")
+        self._stream.flush()
+
+        if self.max_bytes and self._stream.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        self._stream.close()
+        for i in range(self.backup_count - 1, 0, -1):
+            source = f"{self.filename}.{i}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.filename}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.filename, f"{self.filename}.1")
+        else:
+            os.remove(self.filename)
+        self._stream = open(self.filename, 'a', encoding='utf-8')
+
+    def stop(self):
+        self.queue.put(self._STOP)
+        self.join()
+
+
+def setup_logging(filename=None, level=logging.INFO, sample_rate=None, queue_size=None,
+                  max_bytes=None, backup_count=None):
+    """
+    Подключает к корневому логгеру неблокирующий обработчик.
+    Параметры по умолчанию берутся из переменных окружения LOG_*.
+    """
+    filename = filename or os.getenv("LOG_FILE", "app.log")
+    sample_rate = float(os.getenv("LOG_SUCCESS_SAMPLE_RATE", 1.0)) if sample_rate is None else sample_rate
+    queue_size = int(os.getenv("LOG_QUEUE_SIZE", 10000)) if queue_size is None else queue_size
+    max_bytes = int(os.getenv("LOG_MAX_BYTES", 10 * 1024 * 1024)) if max_bytes is None else max_bytes
+    backup_count = int(os.getenv("LOG_BACKUP_COUNT", 5)) if backup_count is None else backup_count
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    handler = DroppingQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter(sample_rate))
+
+    writer = BatchedJsonWriter(log_queue, filename, max_bytes=max_bytes, backup_count=backup_count)
+    writer.start()
+    atexit.register(writer.stop)
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(handler)
+    return handler, writer
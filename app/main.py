@@ -1,42 +1,329 @@
-from fastapi import FastAPI, HTTPException, Request
-from models import MatchRequest
-from predictor import predict_match
-import logging
-from datetime import datetime
 import sys
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).parent.parent))
 
+from fastapi import BackgroundTasks, FastAPI, Header, HTTPException, Request, Response
+from fastapi.responses import PlainTextResponse
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+from models import BatchMatchRequest, MatchRequest, ModelLoadRequest, ResultsRequest, TrafficRequest
+import predictor
+from predictor import BUNDLE_PATH, predict_batch
+from hydration import DATA_PATH, FeatureHydrator
+from batcher import MicroBatcher
+from cache import PredictionCache
+from logging_setup import setup_logging
+from online import OnlineUpdater
+from registry import ModelRegistry
+from storage import table_path
+import metrics
+import hmac
+import logging
+import pandas as pd
+import os
+import signal
+import threading
+import time
+from typing import Optional
+from datetime import datetime
+
 app = FastAPI(
     title="Football Match Predictor API",
     description="API для предсказания исходов футбольных матчей",
     version="1.0.0"
 )
 
-# Настройка логирования
-logging.basicConfig(
-    filename='app.log',
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
+# Настройка логирования: запись в файл идёт из фонового потока (JSON Lines)
+setup_logging()
+
+# Последнее состояние команд для заполнения признаков на сервере
+hydrator = FeatureHydrator.from_table()
+
+# Кэш предсказаний: сбрасывается при изменении пакета модели или данных
+DATA_FILES = [table_path(DATA_PATH, "csv"), table_path(DATA_PATH, "parquet")]
+cache = PredictionCache(
+    maxsize=int(os.getenv("PREDICTION_CACHE_SIZE", 10000)),
+    ttl=float(os.getenv("PREDICTION_CACHE_TTL", 300)),
+    watch_paths=[os.path.join(BUNDLE_PATH, "manifest.json")] + DATA_FILES,
+)
+
+def reload_hydrator():
+    # Новое состояние команд собирается целиком и подменяет прежнее одной ссылкой.
+    # Результаты из POST /results, которых нет в таблице, при этом не сохраняются.
+    global hydrator
+    try:
+        fresh = FeatureHydrator.from_table()
+    except Exception as e:
+        logging.error("Team state reload failed: %s", e, exc_info=True)
+        return
+    hydrator = fresh
+    # Ответы, посчитанные по старому состоянию во время загрузки, тоже сбрасываются
+    cache.clear()
+    logging.info("Team state reloaded", extra={"last_date": str(fresh.state.last_date)})
+
+def on_artifacts_changed(paths):
+    if any(path in DATA_FILES for path in paths):
+        threading.Thread(target=reload_hydrator, daemon=True).start()
+
+cache.listeners.append(on_artifacts_changed)
+
+# Реестр версий модели: переключение без перезапуска (админ-эндпоинты или SIGHUP)
+registry = ModelRegistry()
+registry.register(predictor.bundle.get(), activate=True)
+registry.listeners.append(cache.clear)
+
+# Микро-батчинг /predict: одиночные запросы считаются общей матрицей раз в несколько
+# миллисекунд или при наборе пакета (PREDICT_BATCH_MAX_SIZE=1 — без ожидания)
+batcher = MicroBatcher(
+    predict_batch,
+    max_batch_size=int(os.getenv("PREDICT_BATCH_MAX_SIZE", 64)),
+    max_wait=float(os.getenv("PREDICT_BATCH_WINDOW_MS", 2)) / 1000,
+    batch_observer=metrics.batch_size.observe,
+    wait_observer=metrics.batch_queue_wait.observe,
+)
+
+# Дообучение по результатам матчей (POST /results)
+online = OnlineUpdater(
+    registry,
+    learning_rate=float(os.getenv("ONLINE_LEARNING_RATE", 0.01)),
+    alpha=float(os.getenv("ONLINE_L2", 1e-4)),
+    observer=metrics.observe_stage,
 )
 
+def reload_default_bundle():
+    # Пакет с диска становится активным как есть: веса, дообученные через POST /results,
+    # сбрасываются, а учтённые результаты остаются в состоянии команд
+    online_updates = registry.active_model().manifest.get('online_updates', 0)
+    try:
+        version = registry.load(BUNDLE_PATH, activate=True)
+        logging.info("Model reloaded", extra={"version": version, "path": BUNDLE_PATH})
+    except Exception as e:
+        logging.error("Model reload failed: %s", e, exc_info=True)
+        return
+    if online_updates:
+        logging.warning("Online updates discarded by model reload",
+                        extra={"version": version, "online_updates": online_updates})
+
+if hasattr(signal, "SIGHUP"):
+    # Загрузка идёт в отдельном потоке, обработчик сигнала только запускает её
+    signal.signal(signal.SIGHUP, lambda signum, frame: threading.Thread(target=reload_default_bundle, daemon=True).start())
+
+def check_admin_token(token):
+    # Без ADMIN_TOKEN админ-эндпоинты и POST /results закрыты для всех
+    expected = os.getenv("ADMIN_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=403, detail="Админ-эндпоинты отключены: не задан ADMIN_TOKEN")
+    if token is None or not hmac.compare_digest(token.encode(), expected.encode()):
+        raise HTTPException(status_code=403, detail="Неверный токен администратора")
+
+def score_shadow(models, items):
+    # Теневой скоринг: результат только логируется, клиенту не возвращается
+    for model in models:
+        try:
+            results = predict_batch(items, model)
+            logging.info("Shadow prediction", extra={"version": model.version, "results": results})
+        except Exception as e:
+            logging.error("Shadow prediction failed: %s", e, exc_info=True)
+
+def update_model(items, results):
+    try:
+        online.update(items, results)
+    except Exception as e:
+        logging.error("Online update failed: %s", e, exc_info=True)
+
+# Метрики задержки по этапам предсказания
+predictor.stage_observer = metrics.observe_stage
+
+@app.middleware("http")
+async def collect_metrics(request: Request, call_next):
+    method = request.method
+    metrics.requests_in_progress.inc(method)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        metrics.requests_in_progress.dec(method)
+        # Шаблон маршрута вместо сырого пути, чтобы не плодить метки
+        route = request.scope.get("route")
+        path = route.path if route is not None else "unmatched"
+        metrics.request_latency.observe(time.perf_counter() - started, method, path)
+        metrics.requests_total.inc(method, path, str(status))
+
 @app.post("/predict", response_model=dict)
-async def predict(match: MatchRequest, request: Request):
+async def predict(match: MatchRequest, request: Request, response: Response, background_tasks: BackgroundTasks):
+    # Версия модели фиксируется на весь запрос
+    model = registry.pick()
+    response.headers["X-Model-Version"] = str(model.version)
+
+    started = time.perf_counter()
+    cache_key = cache.make_key({**match.dict(), "_model_version": model.version})
+    cached = cache.get(cache_key)
+    # Сброс кэша во время расчёта (POST /results, новая таблица) — ответ не кэшируется
+    generation = cache.generation
+    metrics.observe_stage("cache", time.perf_counter() - started)
+    if cached is not None:
+        response.headers["X-Cache"] = "HIT"
+        return cached
+
     try:
-        logging.info(f"Request received from {request.client.host}")
-        input_data = match.dict()
+        logging.info("Request received", extra={"client": request.client.host, "path": "/predict"})
+        started = time.perf_counter()
+        input_data = hydrator.hydrate(match.dict())
+        metrics.observe_stage("hydration", time.perf_counter() - started)
         
         # Дополнительная валидация
-        if input_data['B365H'] < 1.0 or input_data['B365A'] < 1.0:
+        started = time.perf_counter()
+        invalid_odds = any(input_data.get(odds) is not None and input_data[odds] < 1.0 for odds in ('B365H', 'B365A'))
+        metrics.observe_stage("validation", time.perf_counter() - started)
+        if invalid_odds:
             raise HTTPException(status_code=400, detail="Коэффициенты ставок должны быть >= 1.0")
         
-        result = predict_match(input_data)
-        logging.info(f"Prediction successful: {result}")
+        prediction = await batcher.submit(input_data, model)
+        if "error" in prediction:
+            raise ValueError(prediction["error"])
+        result = prediction["prediction"]
+        logging.info("Prediction successful", extra={"result": result, "version": model.version})
+        shadow = registry.shadow_models(model)
+        if shadow:
+            background_tasks.add_task(score_shadow, shadow, [input_data])
+        cache.set(cache_key, {"result": result}, generation)
+        response.headers["X-Cache"] = "MISS"
         return {"result": result}
     except Exception as e:
-        logging.error(f"Error: {str(e)}", exc_info=True)
+        logging.error("Error: %s", e, exc_info=True)
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/predict/batch", response_model=dict)
+async def predict_batch_endpoint(batch: BatchMatchRequest, request: Request, response: Response,
+                                 background_tasks: BackgroundTasks):
+    model = registry.pick()
+    response.headers["X-Model-Version"] = str(model.version)
+    logging.info("Batch request received", extra={"client": request.client.host, "path": "/predict/batch", "matches": len(batch.matches)})
+
+    results = [None] * len(batch.matches)
+    valid_indices, valid_items = [], []
+
+    # Валидация каждого матча отдельно — ошибки не валят весь пакет
+    started = time.perf_counter()
+    for i, item in enumerate(batch.matches):
+        try:
+            input_data = hydrator.hydrate(MatchRequest(**item).dict())
+        except ValidationError as e:
+            details = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            results[i] = {"error": details}
+            continue
+
+        if any(input_data.get(odds) is not None and input_data[odds] < 1.0 for odds in ('B365H', 'B365A')):
+            results[i] = {"error": "Коэффициенты ставок должны быть >= 1.0"}
+            continue
+
+        valid_indices.append(i)
+        valid_items.append(input_data)
+    metrics.observe_stage("batch_validation", time.perf_counter() - started)
+
+    try:
+        for i, result in zip(valid_indices, predict_batch(valid_items, model)):
+            results[i] = result
+    except Exception as e:
+        logging.error("Error: %s", e, exc_info=True)
+        raise HTTPException(status_code=400, detail=str(e))
+
+    shadow = registry.shadow_models(model)
+    if shadow and valid_items:
+        background_tasks.add_task(score_shadow, shadow, valid_items)
+
+    failed = sum(1 for result in results if "error" in result)
+    logging.info("Batch prediction finished", extra={"ok": len(results) - failed, "failed": failed})
+    return {"results": [{"index": i, **result} for i, result in enumerate(results)]}
+
+@app.post("/results")
+async def submit_results(body: ResultsRequest, background_tasks: BackgroundTasks,
+                         x_admin_token: Optional[str] = Header(None)):
+    check_admin_token(x_admin_token)
+    started = time.perf_counter()
+    results = sorted(body.results, key=lambda result: result.Date)
+
+    # Одно и то же состояние на весь запрос, даже если таблица перезагрузится
+    current = hydrator
+    last_date = current.state.last_date
+    if last_date is not None and pd.Timestamp(results[0].Date) < last_date:
+        raise HTTPException(status_code=409,
+                            detail=f"Результаты до {last_date.date()} уже учтены в состоянии команд")
+    duplicates = [f"{r.HomeTeam} — {r.AwayTeam} ({r.Date})" for r in results if current.is_recorded(r.dict())]
+    if duplicates:
+        raise HTTPException(status_code=409, detail=f"Результаты уже учтены: {', '.join(duplicates)}")
+
+    # Состояние меняется в цикле событий — /predict не увидит частично применённый матч
+    items, outcomes = [], []
+    for result in results:
+        data = {**result.dict(), "FTR": result.FTR}
+        items.append(current.hydrate(data))  # признаки до матча + присланная статистика
+        current.record(data)
+        outcomes.append(result.FTR)
+    cache.clear()
+    metrics.observe_stage("results", time.perf_counter() - started)
+
+    background_tasks.add_task(update_model, items, outcomes)
+    logging.info("Results recorded", extra={"matches": len(results), "last_date": str(current.state.last_date.date())})
+    return {"recorded": len(results), "last_date": current.state.last_date.date().isoformat(),
+            "model_update": "scheduled"}
+
+@app.get("/admin/models")
+async def list_models(x_admin_token: Optional[str] = Header(None)):
+    check_admin_token(x_admin_token)
+    return registry.status()
+
+@app.post("/admin/models/load")
+async def load_model(body: ModelLoadRequest, x_admin_token: Optional[str] = Header(None)):
+    check_admin_token(x_admin_token)
+    try:
+        # Чтение и прогрев пакета — в пуле потоков, чтобы не блокировать цикл событий
+        version = await run_in_threadpool(registry.load, body.path or BUNDLE_PATH, body.version, body.activate)
+    except Exception as e:
+        logging.error("Model load failed: %s", e, exc_info=True)
         raise HTTPException(status_code=400, detail=str(e))
+    logging.info("Model loaded", extra={"version": version, "activate": body.activate})
+    return registry.status()
+
+@app.post("/admin/models/{version}/activate")
+async def activate_model(version: str, x_admin_token: Optional[str] = Header(None)):
+    check_admin_token(x_admin_token)
+    try:
+        registry.activate(version)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    logging.info("Model activated", extra={"version": version})
+    return registry.status()
+
+@app.post("/admin/models/traffic")
+async def set_traffic(body: TrafficRequest, x_admin_token: Optional[str] = Header(None)):
+    check_admin_token(x_admin_token)
+    try:
+        registry.set_traffic(body.traffic, body.shadow)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return registry.status()
+
+@app.delete("/admin/models/{version}")
+async def unload_model(version: str, x_admin_token: Optional[str] = Header(None)):
+    check_admin_token(x_admin_token)
+    try:
+        registry.unload(version)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return registry.status()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return cache.stats()
 
 @app.get("/health")
 async def health_check():
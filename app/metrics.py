@@ -0,0 +1,160 @@
+import bisect
+import os
+import threading
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# ----------------------------
+# Лёгкие метрики в текстовом формате Prometheus без внешних зависимостей.
+# Обновление метрики — поиск корзины и пара сложений под блокировкой,
+# поэтому инструментирование можно держать включённым в продакшене.
+# ----------------------------
+
+LATENCY_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+
+def _escape(value):
+    # Экранирование значения метки по формату экспозиции Prometheus
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.extend(self._render_sample(labels, value))
+        return lines
+
+    def _render_sample(self, labels, value):
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {value}"]
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # [счётчики по корзинам (+Inf последняя), сумма, количество]
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _render_sample(self, labels, value):
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            bucket_labels = _format_labels(self.labelnames, labels, ['le="' + le + '"'])
+            lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total}")
+        lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        _update_process_memory()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+request_latency = registry.register(Histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запроса целиком", ["method", "path"]))
+requests_total = registry.register(Counter(
+    "http_requests_total", "Количество HTTP-запросов по коду ответа", ["method", "path", "status"]))
+requests_in_progress = registry.register(Gauge(
+    "http_requests_in_progress", "Запросы, обрабатываемые в данный момент", ["method"]))
+stage_latency = registry.register(Histogram(
+    "prediction_stage_duration_seconds", "Время этапов предсказания", ["stage"]))
+batch_size = registry.register(Histogram(
+    "prediction_batch_size", "Размер пакета микро-батчинга /predict", buckets=BATCH_SIZE_BUCKETS))
+batch_queue_wait = registry.register(Histogram(
+    "prediction_batch_queue_wait_seconds", "Ожидание запроса в очереди микро-батчинга"))
+process_memory = registry.register(Gauge(
+    "process_resident_memory_bytes", "Резидентная память процесса"))
+process_max_memory = registry.register(Gauge(
+    "process_max_resident_memory_bytes", "Пиковая резидентная память процесса"))
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _update_process_memory():
+    try:
+        with open("/proc/self/statm") as f:
+            process_memory.set(int(f.read().split()[1]) * _PAGE_SIZE)
+    except OSError:
+        pass
+    # ru_maxrss в килобайтах (Linux)
+    if resource is not None:
+        process_max_memory.set(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024)
+
+
+def observe_stage(stage, seconds):
+    stage_latency.observe(seconds, stage)
@@ -1,10 +1,16 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+from datetime import date
 
 class MatchRequest(BaseModel):
-    """Модель входных данных для предсказания матча"""
+    """Модель входных данных для предсказания матча.
+
+    Обязательны только команды: остальные признаки сервер заполняет
+    по последнему состоянию команд, переданные значения имеют приоритет.
+    """
     HomeTeam: str
     AwayTeam: str
+    Date: Optional[date] = None
     
     # Основные параметры
     Year: Optional[int] = None
@@ -53,6 +59,7 @@ class MatchRequest(BaseModel):
             "example": {
                 "HomeTeam": "Chelsea",
                 "AwayTeam": "Arsenal",
+                "Date": "2025-08-23",
                 "B365H": 2.1,
                 "B365D": 3.4,
                 "B365A": 3.2,
@@ -63,4 +70,86 @@ class MatchRequest(BaseModel):
                 "HomeTeam_Elo": 1750.0,
                 "AwayTeam_Elo": 1820.0
             }
-        }
\ No newline at end of file
+        }
+
+
+class BatchMatchRequest(BaseModel):
+    """Модель входных данных для пакетного предсказания.
+
+    Матчи валидируются по одному, чтобы ошибка в одном из них
+    не отклоняла весь пакет.
+    """
+    matches: List[Dict[str, Any]] = Field(..., max_length=1000)
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "matches": [
+                    MatchRequest.Config.json_schema_extra["example"],
+                    {"HomeTeam": "Liverpool", "AwayTeam": "Man City", "B365H": 2.4, "B365D": 3.6, "B365A": 2.8}
+                ]
+            }
+        }
+
+
+class ModelLoadRequest(BaseModel):
+    """Загрузка версии модели в реестр"""
+    path: Optional[str] = None  # по умолчанию models/bundle
+    version: Optional[str] = None  # по умолчанию версия из манифеста
+    activate: bool = False
+
+
+class TrafficRequest(BaseModel):
+    """Разбиение трафика между версиями (A/B) и теневой скоринг"""
+    traffic: Dict[str, float] = {}
+    shadow: List[str] = []
+
+
+class MatchResult(BaseModel):
+    """Итог сыгранного матча для онлайн-обновления состояния команд и модели.
+
+    HST/AST обязательны: удары в створ — основа признаков формы.
+    Остальная статистика и коэффициенты необязательны.
+    """
+    HomeTeam: str
+    AwayTeam: str
+    Date: date
+    FTHG: int = Field(..., ge=0)
+    FTAG: int = Field(..., ge=0)
+    HST: float = Field(..., ge=0)
+    AST: float = Field(..., ge=0)
+
+    HTHG: Optional[float] = None
+    HTAG: Optional[float] = None
+    HS: Optional[float] = None
+    AS: Optional[float] = None
+    HF: Optional[float] = None
+    AF: Optional[float] = None
+    HC: Optional[float] = None
+    AC: Optional[float] = None
+    HY: Optional[float] = None
+    AY: Optional[float] = None
+    HR: Optional[float] = None
+    AR: Optional[float] = None
+    B365H: Optional[float] = None
+    B365D: Optional[float] = None
+    B365A: Optional[float] = None
+
+    @property
+    def FTR(self) -> str:
+        return 'H' if self.FTHG > self.FTAG else 'A' if self.FTHG < self.FTAG else 'D'
+
+
+class ResultsRequest(BaseModel):
+    """Результаты тура: применяются в порядке дат"""
+    results: List[MatchResult] = Field(..., min_length=1, max_length=1000)
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "results": [
+                    {"HomeTeam": "Chelsea", "AwayTeam": "Arsenal", "Date": "2025-08-23",
+                     "FTHG": 2, "FTAG": 1, "HST": 6, "AST": 3, "B365H": 2.1, "B365D": 3.4, "B365A": 3.2}
+                ]
+            }
+        }
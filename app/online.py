@@ -0,0 +1,46 @@
+import logging
+import threading
+import time
+
+import numpy as np
+
+# Коды исходов в порядке классов модели (away_win, draw, home_win)
+RESULT_CODES = {'A': 0, 'D': 1, 'H': 2}
+
+
+class OnlineUpdater:
+    """
+    Дообучение активной модели по результатам сыгранных матчей.
+    Каждое обновление — шаг partial_fit от текущей активной версии; новая версия
+    занимает место исходной в реестре (активная, доля A/B, тень) без перезапуска,
+    предыдущая онлайн-версия выгружается. Обновления сериализуются блокировкой,
+    чтобы два тура не дообучали одну и ту же базу.
+    """
+
+    def __init__(self, registry, learning_rate=0.01, alpha=1e-4, observer=None):
+        self.registry = registry
+        self.learning_rate = learning_rate
+        self.alpha = alpha
+        self.observer = observer  # (этап, секунды) — для метрик
+        self._lock = threading.Lock()
+
+    def update(self, items, results):
+        """items — признаки матчей до их начала, results — исходы H/D/A"""
+        started = time.perf_counter()
+        with self._lock:
+            base = self.registry.active_model()
+            if not base.supports_partial_fit:
+                logging.warning("Online update skipped: bundle has no scaler statistics",
+                                extra={"version": base.version})
+                return None
+
+            X = np.array([base.vectorize(item) for item in items])
+            y = np.array([RESULT_CODES[result] for result in results])
+            updated = base.partial_fit(X, y, self.learning_rate, self.alpha)
+            # Промежуточные онлайн-версии не копятся в памяти; версия с диска остаётся
+            version = self.registry.replace(base, updated, unload=bool(base.manifest.get('online_updates')))
+
+        if self.observer is not None:
+            self.observer("online_update", time.perf_counter() - started)
+        logging.info("Model updated online", extra={"version": version, "matches": len(items)})
+        return version
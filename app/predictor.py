@@ -1,35 +1,82 @@
-import joblib
-import pandas as pd
 import numpy as np
 import os
+import time
 
-MODEL_PATH = os.path.join(os.path.dirname(__file__), "../models/logistic_model.pkl")
-SCALER_PATH = os.path.join(os.path.dirname(__file__), "../models/scaler.pkl")
-ENCODER_PATH = os.path.join(os.path.dirname(__file__), "../models/encoder.pkl")
-FEATURE_NAMES_PATH = os.path.join(os.path.dirname(__file__), "../models/feature_names.pkl")
+from model_bundle import LazyBundle
 
-model = joblib.load(MODEL_PATH)
-scaler = joblib.load(SCALER_PATH)
-encoder = joblib.load(ENCODER_PATH)
-feature_names = joblib.load(FEATURE_NAMES_PATH)
+BUNDLE_PATH = os.path.join(os.path.dirname(__file__), "../models/bundle")
 
-def predict_match(data: dict) -> str:
-    df = pd.DataFrame([data])
+# Пакет модели загружается при первом предсказании
+bundle = LazyBundle(BUNDLE_PATH)
 
-    # Кодирование команд
-    encoded_teams = encoder.transform(df[['HomeTeam', 'AwayTeam']])
-    df['HomeTeam_encoded'] = encoded_teams['HomeTeam']
-    df['AwayTeam_encoded'] = encoded_teams['AwayTeam']
-    df.drop(['HomeTeam', 'AwayTeam'], axis=1, inplace=True)
+# Необязательный обработчик (этап, секунды) для метрик задержки по этапам
+stage_observer = None
 
-    # Устанавливаем правильный порядок признаков
-    df = df[feature_names]
 
-    # Стандартизация
-    X_scaled = scaler.transform(df)
+def _observe(stage, started):
+    if stage_observer is not None:
+        stage_observer(stage, time.perf_counter() - started)
 
-    # Предсказание
-    prediction = model.predict(X_scaled)[0]
 
-    result_map = {0: "away_win", 1: "draw", 2: "home_win"}
-    return result_map.get(prediction, "unknown")
\ No newline at end of file
+def predict_match(data: dict, model=None) -> str:
+    kernel = model or bundle.get()
+
+    # Вектор признаков (кодирование команд и порядок признаков)
+    started = time.perf_counter()
+    x = kernel.vectorize(data)
+    missing = [name for name, flag in zip(kernel.feature_names, np.isnan(x)) if flag]
+    _observe("encoding", started)
+    if missing:
+        raise ValueError(f"Отсутствуют или некорректны признаки: {', '.join(missing)}")
+
+    # Стандартизация и предсказание одной операцией
+    started = time.perf_counter()
+    proba = kernel.predict_proba(x[None, :])[0]
+    _observe("model", started)
+
+    return kernel.labels[int(proba.argmax())]
+
+
+def predict_batch(items: list, model=None) -> list:
+    """
+    Предсказание для списка матчей одной матрицей.
+    Возвращает результаты в порядке входа; ошибка в одном матче
+    не мешает остальным — для него возвращается {"error": ...}.
+    model — конкретная версия пакета (по умолчанию models/bundle).
+    """
+    kernel = model or bundle.get()
+    started = time.perf_counter()
+    results = [None] * len(items)
+    try:
+        # Быстрый путь: матрица собирается по колонкам
+        X = kernel.vectorize_many(items)
+    except (TypeError, ValueError):
+        # Есть некорректное значение — собираем по строкам, чтобы ошибка досталась только его матчу
+        X = np.full((len(items), len(kernel.feature_names)), np.nan)
+        for i, data in enumerate(items):
+            try:
+                X[i] = kernel.vectorize(data)
+            except (TypeError, ValueError) as e:
+                results[i] = {"error": f"Некорректные признаки: {e}"}
+
+    # Матчи с пропущенными признаками модель не примет — отмечаем их отдельно
+    missing = np.isnan(X)
+    valid = ~missing.any(axis=1)
+    for i in np.flatnonzero(~valid):
+        if results[i] is None:
+            columns = [name for name, flag in zip(kernel.feature_names, missing[i]) if flag]
+            results[i] = {"error": f"Отсутствуют или некорректны признаки: {', '.join(columns)}"}
+    _observe("encoding", started)
+
+    if valid.any():
+        started = time.perf_counter()
+        probabilities = kernel.predict_proba(X[valid])
+        _observe("model", started)
+
+        for i, proba in zip(np.flatnonzero(valid), probabilities):
+            results[i] = {
+                "prediction": kernel.labels[int(proba.argmax())],
+                "probabilities": {label: float(p) for label, p in zip(kernel.labels, proba)},
+            }
+
+    return results
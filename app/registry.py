@@ -0,0 +1,152 @@
+import bisect
+import random
+import threading
+
+import numpy as np
+
+from model_bundle import load_bundle
+
+
+class _Routing:
+    """Неизменяемый снимок маршрутизации: подменяется целиком одной ссылкой"""
+
+    def __init__(self, models, active, traffic, shadow):
+        self.models = models        # версия -> ModelBundle
+        self.active = active        # версия по умолчанию
+        self.traffic = traffic      # версия -> вес (A/B)
+        self.shadow = shadow        # версии для теневого скоринга
+
+        self._versions = list(traffic)
+        total = float(sum(traffic.values()))
+        cumulative, running = [], 0.0
+        for version in self._versions:
+            running += traffic[version] / total
+            cumulative.append(running)
+        self._cumulative = cumulative
+
+    def pick(self):
+        if not self._versions:
+            return self.models[self.active]
+        i = bisect.bisect_left(self._cumulative, random.random())
+        return self.models[self._versions[min(i, len(self._versions) - 1)]]
+
+
+class ModelRegistry:
+    """
+    Реестр версий модели в памяти. Каждый запрос один раз берёт модель через
+    pick() и доводит работу на ней, поэтому переключение версии не затрагивает
+    запросы в полёте. Все изменения публикуются атомарной заменой снимка.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()  # сериализует только изменения
+        self._routing = _Routing({}, None, {}, [])
+        self.listeners = []  # вызываются после каждого изменения (например, сброс кэша)
+
+    @staticmethod
+    def _warm_up(bundle):
+        # Все массивы отображаются в память до публикации версии: первый запрос
+        # не платит за загрузку, а пересборка пакета на диске не подменит часть из них
+        bundle.load_arrays()
+        bundle.predict_proba(np.zeros((1, len(bundle.feature_names))))
+        return bundle
+
+    def _publish(self, **changes):
+        routing = self._routing
+        fields = {
+            'models': routing.models, 'active': routing.active,
+            'traffic': routing.traffic, 'shadow': routing.shadow,
+        }
+        fields.update(changes)
+        self._routing = _Routing(**fields)
+        for listener in self.listeners:
+            listener()
+
+    def register(self, bundle, version=None, activate=False):
+        version = str(version or bundle.version)
+        self._warm_up(bundle)
+        with self._lock:
+            models = dict(self._routing.models)
+            models[version] = bundle
+            activate = activate or self._routing.active is None
+            self._publish(models=models, active=version if activate else self._routing.active)
+        return version
+
+    def replace(self, previous, bundle, unload=False):
+        """
+        Регистрирует bundle вместо пакета previous во всех ролях: активная версия,
+        доля в разбиении трафика и теневой скоринг. unload=True — previous выгружается.
+        """
+        version = str(bundle.version)
+        self._warm_up(bundle)
+        with self._lock:
+            routing = self._routing
+            replaced = {v for v, model in routing.models.items() if model is previous}
+            if not replaced:
+                raise KeyError("Заменяемая версия модели уже выгружена")
+
+            def swap(v):
+                return version if v in replaced else v
+
+            models = {v: m for v, m in routing.models.items() if not (unload and v in replaced)}
+            models[version] = bundle
+            traffic = {}
+            for v, weight in routing.traffic.items():
+                traffic[swap(v)] = traffic.get(swap(v), 0.0) + weight
+            shadow = list(dict.fromkeys(swap(v) for v in routing.shadow))
+            self._publish(models=models, active=swap(routing.active), traffic=traffic, shadow=shadow)
+        return version
+
+    def load(self, path, version=None, activate=False):
+        """Загружает пакет модели с диска (вне блокировки) и регистрирует его"""
+        return self.register(load_bundle(path), version, activate)
+
+    def activate(self, version):
+        with self._lock:
+            if version not in self._routing.models:
+                raise KeyError(f"Версия модели не загружена: {version}")
+            self._publish(active=version, traffic={})
+
+    def set_traffic(self, traffic=None, shadow=None):
+        """Веса A/B-разбиения трафика и список версий для теневого скоринга"""
+        traffic = {str(k): float(v) for k, v in (traffic or {}).items() if float(v) > 0}
+        shadow = [str(v) for v in (shadow or [])]
+        with self._lock:
+            unknown = [v for v in list(traffic) + shadow if v not in self._routing.models]
+            if unknown:
+                raise KeyError(f"Версии модели не загружены: {', '.join(unknown)}")
+            self._publish(traffic=traffic, shadow=shadow)
+
+    def unload(self, version):
+        with self._lock:
+            routing = self._routing
+            if version == routing.active:
+                raise ValueError("Нельзя выгрузить активную версию модели")
+            models = {v: m for v, m in routing.models.items() if v != version}
+            traffic = {v: w for v, w in routing.traffic.items() if v != version}
+            shadow = [v for v in routing.shadow if v != version]
+            self._publish(models=models, traffic=traffic, shadow=shadow)
+
+    def pick(self):
+        """Модель для нового запроса (с учётом разбиения трафика)"""
+        return self._routing.pick()
+
+    def active_model(self):
+        routing = self._routing
+        return routing.models[routing.active]
+
+    def shadow_models(self, primary):
+        routing = self._routing
+        return [routing.models[v] for v in routing.shadow if routing.models[v] is not primary]
+
+    def status(self):
+        routing = self._routing
+        return {
+            "active": routing.active,
+            "versions": {
+                version: {"path": bundle.path, "created": bundle.manifest.get('created')}
+                for version, bundle in routing.models.items()
+            },
+            "traffic": routing.traffic,
+            "shadow": routing.shadow,
+        }
@@ -0,0 +1,220 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from train import (DATA_PATH, MODELS, MODELS_DIR, RESAMPLERS, RESULT_CODES, SEED, TEAM_COLUMNS,
+                   encode_teams, make_model, make_resampler, prepare_dataset, score_probabilities)
+
+# ----------------------------
+# Walk-forward бэктест: сезон проходится по турам, перед каждым туром модель
+# обучается на всех предыдущих матчах и оценивает следующий тур.
+# Статистики кодировщика команд и скейлера накапливаются по новым турам,
+# а не пересчитываются с нуля; логистическая регрессия дообучается
+# с тёплого старта (warm_start) от коэффициентов предыдущего шага.
+# ----------------------------
+
+WARMUP_ROUNDS = 38  # первый сезон — только обучение
+WARM_START_MODELS = ('logistic', 'logistic_balanced')
+RESULTS_PATH = os.path.join(MODELS_DIR, 'backtest.csv')
+PROBABILITY_COLUMNS = ['p_A', 'p_D', 'p_H']  # порядок кодов RESULT_CODES: A=0, D=1, H=2
+
+
+def matchweeks(df):
+    """
+    Номер тура для матчей df (отсортированных по дате). Тур пополняется целыми
+    игровыми днями, пока ни одна команда не играет в нём дважды, поэтому
+    матчи одного дня никогда не попадают в разные шаги бэктеста.
+    """
+    dates = df['Date'].to_numpy()
+    home = df['HomeTeam'].to_numpy()
+    away = df['AwayTeam'].to_numpy()
+    starts = np.flatnonzero(np.r_[True, dates[1:] != dates[:-1]]) if len(df) else np.array([], dtype=int)
+    ends = np.r_[starts[1:], len(df)]
+
+    rounds = np.empty(len(df), dtype=np.int64)
+    current, seen = 0, set()
+    for start, end in zip(starts, ends):
+        teams = set(home[start:end]) | set(away[start:end])
+        if seen & teams:
+            current += 1
+            seen = set()
+        seen |= teams
+        rounds[start:end] = current
+    return rounds
+
+
+class IncrementalFeatures:
+    """
+    Матрица признаков для префикса матчей с накапливаемыми статистиками:
+    CatBoost-кодирование команд — (сумма целей + prior) / (число матчей + 1),
+    как CatBoostEncoder.transform; стандартизация — StandardScaler.partial_fit.
+    """
+
+    def __init__(self, X, y):
+        from sklearn.preprocessing import StandardScaler
+
+        self.base = X.drop(columns=TEAM_COLUMNS).to_numpy(dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.codes = [pd.factorize(X[column])[0] for column in TEAM_COLUMNS]
+        self.sums = [np.zeros(codes.max() + 1) for codes in self.codes]
+        self.counts = [np.zeros(codes.max() + 1) for codes in self.codes]
+        self.scaler = StandardScaler()
+        self.rows = 0
+
+    def _encoded(self, start, end):
+        prior = self.y[:self.rows].mean()
+        return np.column_stack([
+            (sums[codes[start:end]] + prior) / (counts[codes[start:end]] + 1)
+            for codes, sums, counts in zip(self.codes, self.sums, self.counts)])
+
+    def fit_until(self, end):
+        """Добавляет в статистики матчи с прошлого вызова до end (не включая)"""
+        new = slice(self.rows, end)
+        for codes, sums, counts in zip(self.codes, self.sums, self.counts):
+            np.add.at(sums, codes[new], self.y[new])
+            np.add.at(counts, codes[new], 1)
+        self.scaler.partial_fit(self.base[new])
+        self.rows = end
+
+        # Кодирование меняется для всех прошлых матчей (растут суммы и prior) — это 2 колонки
+        encoded = self._encoded(0, end)
+        self.encoded_mean = encoded.mean(axis=0)
+        std = encoded.std(axis=0)
+        self.encoded_scale = np.where(std > 0, std, 1.0)
+
+    def transform(self, start, end):
+        base = self.scaler.transform(self.base[start:end])
+        encoded = (self._encoded(start, end) - self.encoded_mean) / self.encoded_scale
+        return np.hstack([base, encoded])
+
+
+class RefitFeatures:
+    """Эталон: кодировщик и скейлер обучаются заново на каждом шаге, как в train.py"""
+
+    def __init__(self, X, y):
+        self.X = X
+        self.y = y
+
+    def fit_until(self, end):
+        from category_encoders import CatBoostEncoder
+        from sklearn.preprocessing import StandardScaler
+
+        self.encoder = CatBoostEncoder().fit(self.X[TEAM_COLUMNS][:end], self.y[:end])
+        self.scaler = StandardScaler().fit(encode_teams(self.X[:end], self.encoder))
+
+    def transform(self, start, end):
+        return self.scaler.transform(encode_teams(self.X[start:end], self.encoder))
+
+
+def bookmaker_probabilities(df):
+    """Вероятности исходов по коэффициентам Bet365 (без маржи), столбцы A, D, H"""
+    implied = 1 / df[['B365A', 'B365D', 'B365H']].to_numpy(dtype=np.float64)
+    return implied / implied.sum(axis=1, keepdims=True)
+
+
+class BacktestResult:
+    def __init__(self, predictions, metrics, baseline, steps, fit_seconds, elapsed):
+        self.predictions = predictions
+        self.metrics = metrics
+        self.baseline = baseline
+        self.steps = steps
+        self.fit_seconds = fit_seconds
+        self.elapsed = elapsed
+
+
+def run_backtest(df, model='logistic', resampler='smote', warmup_rounds=WARMUP_ROUNDS, refit_every=1,
+                 max_rounds=None, seed=SEED, incremental=True):
+    """
+    Бэктест с расширяющимся окном: после warmup_rounds туров модель каждые
+    refit_every туров обучается на всех предыдущих матчах и предсказывает
+    следующий тур. incremental=False — эталонный пересчёт всего с нуля.
+    """
+    df = df.sort_values(by='Date', kind='stable').reset_index(drop=True)
+    rounds = matchweeks(df)
+    X, y = prepare_dataset(df)
+    y = y.to_numpy()
+
+    starts = np.flatnonzero(np.r_[True, rounds[1:] != rounds[:-1]])
+    ends = np.r_[starts[1:], len(df)]
+    steps = list(zip(starts, ends))[warmup_rounds:]
+    if max_rounds is not None:
+        steps = steps[:max_rounds]
+    if not steps:
+        raise ValueError(f"Недостаточно туров для бэктеста: {len(starts)} при разогреве {warmup_rounds}")
+
+    features = IncrementalFeatures(X, y) if incremental else RefitFeatures(X, y)
+    warm_start = incremental and model in WARM_START_MODELS
+    classifier = None
+    proba = np.empty((steps[-1][1] - steps[0][0], len(RESULT_CODES)))
+    fit_seconds = 0.0
+
+    started = time.perf_counter()
+    for step, (start, end) in enumerate(steps):
+        if step % refit_every == 0:
+            features.fit_until(start)
+            X_train, y_train = features.transform(0, start), y[:start]
+            sampler = make_resampler(resampler, seed)
+            if sampler is not None:
+                X_train, y_train = sampler.fit_resample(X_train, y_train)
+
+            if classifier is None or not warm_start:
+                classifier = make_model(model, seed)
+                if warm_start:
+                    classifier.set_params(warm_start=True)
+            fit_started = time.perf_counter()
+            classifier.fit(X_train, y_train)
+            fit_seconds += time.perf_counter() - fit_started
+
+        proba[start - steps[0][0]:end - steps[0][0]] = classifier.predict_proba(features.transform(start, end))
+    elapsed = time.perf_counter() - started
+
+    scored = slice(steps[0][0], steps[-1][1])
+    predictions = df.iloc[scored][['Date', 'HomeTeam', 'AwayTeam', 'FTR']].assign(Round=rounds[scored])
+    predictions[PROBABILITY_COLUMNS] = proba
+    classes = sorted(RESULT_CODES.values())
+    metrics = score_probabilities(y[scored], proba, classes)
+
+    baseline = None
+    odds = bookmaker_probabilities(df.iloc[scored])
+    has_odds = ~np.isnan(odds).any(axis=1)
+    if has_odds.any():
+        baseline = score_probabilities(y[scored][has_odds], odds[has_odds], classes)
+    return BacktestResult(predictions, metrics, baseline, len(steps), fit_seconds, elapsed)
+
+
+if __name__ == '__main__':
+    from storage import read_table
+
+    parser = argparse.ArgumentParser(description="Walk-forward бэктест модели по турам")
+    parser.add_argument("--input", default=DATA_PATH)
+    parser.add_argument("--model", default='logistic', choices=MODELS)
+    parser.add_argument("--resampler", default='smote', choices=RESAMPLERS)
+    parser.add_argument("--warmup-rounds", type=int, default=WARMUP_ROUNDS, help="туров только для обучения")
+    parser.add_argument("--refit-every", type=int, default=1, help="переобучать каждые N туров")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--from-scratch", action="store_true",
+                        help="эталон: пересчитывать кодировщик, скейлер и модель с нуля на каждом шаге")
+    parser.add_argument("--output", default=RESULTS_PATH, help="предсказания по матчам (CSV)")
+    args = parser.parse_args()
+
+    print("🔄 Загружаем данные...")
+    df = read_table(args.input)
+
+    result = run_backtest(df, args.model, args.resampler, args.warmup_rounds, args.refit_every,
+                          seed=args.seed, incremental=not args.from_scratch)
+
+    print(f"\n⚡ {result.steps} туров, {len(result.predictions)} матчей за {result.elapsed:.2f} с "
+          f"(обучение — {result.fit_seconds:.2f} с)")
+    print(f"📊 {args.model} + {args.resampler}: log-loss = {result.metrics['log_loss']:.4f}, "
+          f"точность = {result.metrics['accuracy']:.4f}, F1 = {result.metrics['f1_weighted']:.4f}, "
+          f"AUC = {result.metrics['roc_auc_ovr']:.4f}")
+    if result.baseline is not None:
+        print(f"🎲 Bet365: log-loss = {result.baseline['log_loss']:.4f}, "
+              f"точность = {result.baseline['accuracy']:.4f}")
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    result.predictions.to_csv(args.output, index=False)
+    print(f"\n💾 Предсказания сохранены: {args.output}")
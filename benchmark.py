@@ -0,0 +1,312 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# ----------------------------
+# Бенчмарки: сборка фичей (строк/с), сетка обучения (время), задержка
+# predict_match (p50/p99) и пиковая память. Каждый замер идёт в отдельном
+# процессе, чтобы пик памяти относился только к нему. Данные — синтетические,
+# по схеме processed_with_all_features, в масштабах 1×, 10×, 100×, 1000×.
+# Результаты сохраняются в JSON для сравнения между коммитами.
+# ----------------------------
+
+BASE_ROWS = 1120  # размер реального датасета (три сезона АПЛ)
+SCALES = (1, 10, 100, 1000)
+TEAMS_PER_LEAGUE = 20
+RESULTS_DIR = '.benchmarks'
+
+STAT_COLUMNS = ['HTHG', 'HTAG', 'HS', 'AS', 'HST', 'AST', 'HF', 'AF', 'HC', 'AC', 'HY', 'AY', 'HR', 'AR']
+BASE_COLUMNS = ['Div', 'Date', 'HomeTeam', 'AwayTeam', 'FTR'] + STAT_COLUMNS + ['B365H', 'B365D', 'B365A']
+
+
+def _round_robin(n_teams):
+    """Двухкруговой турнир (метод круга): пары (хозяева, гости) по турам"""
+    teams = list(range(n_teams))
+    rounds = []
+    for _ in range(n_teams - 1):
+        rounds.append([(teams[i], teams[-1 - i]) for i in range(n_teams // 2)])
+        teams = [teams[0], teams[-1]] + teams[1:-1]
+    second_half = [[(away, home) for home, away in matches] for matches in rounds]
+    return np.array(rounds + second_half)  # (туры, матчи, 2)
+
+
+def synthetic_matches(scale=1, seed=0):
+    """
+    Исходные матчи (схема processed_with_b365_data) примерно на BASE_ROWS × scale строк:
+    лиги по 20 команд, двухкруговые сезоны, статистика и коэффициенты
+    зависят от силы команд. Масштаб растёт и числом лиг, и числом сезонов.
+    """
+    rng = np.random.default_rng(seed)
+    schedule = _round_robin(TEAMS_PER_LEAGUE)
+    per_season = schedule.shape[0] * schedule.shape[1]
+    seasons_total = max(1, round(BASE_ROWS * scale / per_season))
+    leagues = max(1, round(np.sqrt(seasons_total / 3)))
+    seasons = -(-seasons_total // leagues)
+
+    league = np.repeat(np.arange(leagues), seasons * per_season)
+    season = np.tile(np.repeat(np.arange(seasons), per_season), leagues)
+    round_index = np.tile(np.repeat(np.arange(schedule.shape[0]), schedule.shape[1]), leagues * seasons)
+    pairs = np.tile(schedule.reshape(-1, 2), (leagues * seasons, 1))
+
+    # Сила команды меняется от сезона к сезону
+    strength = rng.normal(0, 0.35, (leagues, seasons, TEAMS_PER_LEAGUE))
+    home_strength = strength[league, season, pairs[:, 0]]
+    away_strength = strength[league, season, pairs[:, 1]]
+    n = len(league)
+
+    home_on_target = rng.poisson(np.exp(1.45 + home_strength - away_strength + 0.1))
+    away_on_target = rng.poisson(np.exp(1.45 + away_strength - home_strength - 0.1))
+    home_goals = rng.binomial(home_on_target, 0.32)
+    away_goals = rng.binomial(away_on_target, 0.32)
+    result = np.where(home_goals > away_goals, 'H', np.where(home_goals < away_goals, 'A', 'D'))
+
+    # Коэффициенты: вероятности по разнице сил + маржа букмекера
+    diff = home_strength - away_strength + 0.15
+    draw = np.full(n, 0.26)
+    home_win = (1 - draw) / (1 + np.exp(-2.2 * diff))
+    away_win = 1 - draw - home_win
+    odds = np.round(1 / (np.column_stack([home_win, draw, away_win]) * 1.05), 2).clip(1.01)
+
+    divisions = np.array([f"L{i}" for i in range(leagues)])
+    names = np.array([[f"L{i} Team {t:02d}" for t in range(TEAMS_PER_LEAGUE)] for i in range(leagues)])
+
+    start = pd.Timestamp('2000-08-12')
+    dates = (start + pd.to_timedelta(season * 365 + round_index * 7 + rng.integers(0, 3, n), unit='D'))
+    df = pd.DataFrame({
+        'Div': divisions[league],
+        'Date': dates,
+        'HomeTeam': names[league, pairs[:, 0]],
+        'AwayTeam': names[league, pairs[:, 1]],
+        'FTR': result,
+        'HTHG': rng.binomial(home_goals, 0.45), 'HTAG': rng.binomial(away_goals, 0.45),
+        'HS': home_on_target + rng.poisson(8, n), 'AS': away_on_target + rng.poisson(7, n),
+        'HST': home_on_target, 'AST': away_on_target,
+        'HF': rng.poisson(10.5, n), 'AF': rng.poisson(11, n),
+        'HC': rng.poisson(5.5, n), 'AC': rng.poisson(4.5, n),
+        'HY': rng.poisson(1.6, n), 'AY': rng.poisson(1.8, n),
+        'HR': rng.poisson(0.05, n), 'AR': rng.poisson(0.06, n),
+        'B365H': odds[:, 0], 'B365D': odds[:, 1], 'B365A': odds[:, 2],
+    })
+    df = df.sort_values(by='Date', kind='stable').reset_index(drop=True)
+    df[STAT_COLUMNS] = df[STAT_COLUMNS].astype(np.float64)
+    return df[BASE_COLUMNS]
+
+
+def synthetic_dataset(scale=1, seed=0):
+    """Полная таблица по схеме processed_with_all_features (исходные колонки + фичи)"""
+    from feature_engine import FEATURE_COLUMNS, build_features
+
+    df = synthetic_matches(scale, seed)
+    features, _ = build_features(df)
+    for column in FEATURE_COLUMNS:
+        df[column] = features[column]
+    return df
+
+
+# ----------------------------
+# Замеры (выполняются в отдельных процессах)
+# ----------------------------
+
+def _peak_mb():
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return peak / 1024  # Linux: килобайты
+
+
+def bench_features(scale, seed, workers):
+    from feature_engine import build_features_sharded
+
+    df = synthetic_matches(scale, seed)
+    data_peak = _peak_mb()
+    started = time.perf_counter()
+    build_features_sharded(df, workers=workers)
+    elapsed = time.perf_counter() - started
+    return {'rows': len(df), 'seconds': elapsed, 'rows_per_second': len(df) / elapsed,
+            'data_peak_mb': data_peak}
+
+
+def bench_training_grid(scale, seed, workers):
+    from experiments import run_grid
+
+    df = synthetic_dataset(scale, seed)
+    data_peak = _peak_mb()
+    started = time.perf_counter()
+    table = run_grid(df, workers=workers, log=lambda message: None)
+    elapsed = time.perf_counter() - started
+    return {'rows': len(df), 'seconds': elapsed, 'combinations': len(table),
+            'fit_seconds': float(table['fit_seconds'].sum()) if 'fit_seconds' in table else None,
+            'best': table.iloc[0][['resampler', 'model', 'f1_weighted']].to_dict(),
+            'data_peak_mb': data_peak}
+
+
+def bench_predict_latency(requests, seed):
+    from app.hydration import FeatureHydrator
+    from app.predictor import bundle, predict_batch, predict_match
+
+    hydrator = FeatureHydrator.from_table()
+    model = bundle.get()
+    rng = np.random.default_rng(seed)
+    teams = hydrator.teams
+    pairs = [rng.choice(teams, 2, replace=False) for _ in range(requests)]
+    items = [hydrator.hydrate({'HomeTeam': home, 'AwayTeam': away}) for home, away in pairs]
+
+    for item in items[:100]:  # прогрев
+        predict_match(item, model)
+
+    latencies = np.empty(requests)
+    for i, item in enumerate(items):
+        started = time.perf_counter_ns()
+        predict_match(item, model)
+        latencies[i] = (time.perf_counter_ns() - started) / 1e3
+
+    hydration = np.empty(requests)
+    for i, (home, away) in enumerate(pairs):
+        started = time.perf_counter_ns()
+        hydrator.hydrate({'HomeTeam': home, 'AwayTeam': away})
+        hydration[i] = (time.perf_counter_ns() - started) / 1e3
+
+    started = time.perf_counter()
+    predict_batch(items, model)
+    batch_seconds = time.perf_counter() - started
+    return {
+        'requests': requests,
+        'p50_us': float(np.percentile(latencies, 50)),
+        'p90_us': float(np.percentile(latencies, 90)),
+        'p99_us': float(np.percentile(latencies, 99)),
+        'mean_us': float(latencies.mean()),
+        'hydration_p50_us': float(np.percentile(hydration, 50)),
+        'hydration_p99_us': float(np.percentile(hydration, 99)),
+        'batch_rows_per_second': requests / batch_seconds,
+    }
+
+
+def _isolated(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    result['wall_seconds'] = time.perf_counter() - started
+    result['peak_mb'] = _peak_mb()
+    return result
+
+
+def run_isolated(func, *args):
+    """Замер в новом процессе: пик памяти не смешивается с другими замерами"""
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(_isolated, func, *args).result()
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(current, previous):
+    """Отношение метрик к предыдущему прогону (>1 — стало медленнее)"""
+    lower_is_better = ('seconds', 'p50_us', 'p90_us', 'p99_us', 'peak_mb')
+    higher_is_better = ('rows_per_second', 'batch_rows_per_second')
+    old = {(case['benchmark'], case.get('scale')): case for case in previous['results']}
+    rows = []
+    for case in current['results']:
+        before = old.get((case['benchmark'], case.get('scale')))
+        if before is None:
+            continue
+        for metric in lower_is_better + higher_is_better:
+            if case.get(metric) and before.get(metric):
+                ratio = case[metric] / before[metric]
+                if metric in higher_is_better:
+                    ratio = 1 / ratio
+                rows.append((case['benchmark'], case.get('scale'), metric, before[metric], case[metric], ratio))
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Бенчмарки сборки фичей, обучения и инференса")
+    parser.add_argument("--scales", nargs='+', type=int, default=[1, 10, 100], choices=SCALES,
+                        help="масштабы данных для сборки фичей")
+    parser.add_argument("--grid-scales", nargs='*', type=int, default=[1], choices=SCALES,
+                        help="масштабы для сетки обучения (полная сетка дорогая)")
+    parser.add_argument("--requests", type=int, default=5000, help="запросов для замера задержки")
+    parser.add_argument("--workers", type=int, help="процессов для шардов и сетки")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help=f"JSON с результатами (по умолчанию {RESULTS_DIR}/<коммит>.json)")
+    parser.add_argument("--compare", help="JSON предыдущего прогона для сравнения")
+    parser.add_argument("--generate", type=int, choices=SCALES, metavar="SCALE",
+                        help="только сохранить синтетический датасет этого масштаба (см. --data-output)")
+    parser.add_argument("--data-output", default="synthetic_with_all_features")
+    args = parser.parse_args()
+
+    if args.generate:
+        from storage import DEFAULT_FORMAT, write_table
+
+        df = synthetic_dataset(args.generate, args.seed)
+        for path in write_table(df, args.data_output, DEFAULT_FORMAT):
+            print(f"💾 Синтетический датасет ({len(df)} матчей): {path}")
+        sys.exit(0)
+
+    report = {'environment': environment(), 'results': []}
+
+    def record(case):
+        report['results'].append(case)
+        peak = f", пик памяти {case['peak_mb']:.0f} МБ" if case.get('peak_mb') else ""
+        if case['benchmark'] == 'features':
+            print(f"⚡ features ×{case['scale']}: {case['rows']} матчей, "
+                  f"{case['rows_per_second']:,.0f} строк/с{peak}")
+        elif case['benchmark'] == 'training_grid':
+            print(f"📊 training_grid ×{case['scale']}: {case['combinations']} сочетаний за "
+                  f"{case['seconds']:.2f} с{peak}")
+        else:
+            print(f"🎯 predict_match: p50 = {case['p50_us']:.1f} мкс, p99 = {case['p99_us']:.1f} мкс, "
+                  f"пакет — {case['batch_rows_per_second']:,.0f} строк/с{peak}")
+
+    print(f"🔄 Бенчмарки ({report['environment']['cpu_count']} ядер)...")
+    for scale in args.scales:
+        record(dict(benchmark='features', scale=scale,
+                    **run_isolated(bench_features, scale, args.seed, args.workers)))
+    for scale in args.grid_scales:
+        record(dict(benchmark='training_grid', scale=scale,
+                    **run_isolated(bench_training_grid, scale, args.seed, args.workers)))
+    record(dict(benchmark='predict_latency', **run_isolated(bench_predict_latency, args.requests, args.seed)))
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['environment']['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Результаты сохранены: {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = json.load(f)
+        print(f"\n📈 Сравнение с {previous['environment'].get('commit')} (>1 — хуже):")
+        for benchmark, scale, metric, before, after, ratio in compare(report, previous):
+            flag = "⚠️" if ratio > 1.1 else "  "
+            label = f"{benchmark}" + (f" ×{scale}" if scale else "")
+            print(f"{flag} {label:<22} {metric:<22} {before:>14.4g} → {after:>14.4g}  ({ratio:.2f})")
@@ -0,0 +1,164 @@
+import argparse
+import itertools
+import time
+
+import numpy as np
+import pandas as pd
+
+# ----------------------------
+# Elo-рейтинги: скалярное обновление для поматчевых движков
+# и векторный перебор параметров (K, преимущество хозяев, стартовый рейтинг)
+# за один хронологический проход.
+# ----------------------------
+
+INITIAL_ELO = 1500
+K = 32  # коэффициент важности матча
+HOME_ADVANTAGE = 0  # бонус к рейтингу хозяев при расчёте ожидаемого результата
+
+_EPS = 1e-15
+
+
+def expected_score(elo_a, elo_b):
+    return 1 / (1 + 10 ** ((elo_b - elo_a) / 400))
+
+
+def update_elo(home_elo, away_elo, result, k=K, home_advantage=HOME_ADVANTAGE):
+    """Новые рейтинги хозяев и гостей после матча с исходом result (H/D/A)"""
+    if result == 'H':
+        delta = k * (1.0 - expected_score(home_elo + home_advantage, away_elo))
+        return home_elo + delta, away_elo - delta
+
+    actual = 1.0 if result == 'A' else 0.5
+    delta = k * (actual - expected_score(away_elo, home_elo + home_advantage))
+    return home_elo - delta, away_elo + delta
+
+
+def compute_elo(home_teams, away_teams, results, initial=INITIAL_ELO, k=K,
+                home_advantage=HOME_ADVANTAGE):
+    """Elo-рейтинги команд до каждого матча (один хронологический проход)"""
+    elo_ratings = {}
+    home_elo_before = np.empty(len(results))
+    away_elo_before = np.empty(len(results))
+
+    for i, (home_team, away_team, result) in enumerate(zip(home_teams, away_teams, results)):
+        home_elo = elo_ratings.get(home_team, initial)
+        away_elo = elo_ratings.get(away_team, initial)
+        home_elo_before[i] = home_elo
+        away_elo_before[i] = away_elo
+
+        elo_ratings[home_team], elo_ratings[away_team] = update_elo(
+            home_elo, away_elo, result, k, home_advantage)
+
+    return home_elo_before, away_elo_before, elo_ratings
+
+
+class EloSweepResult:
+    """Результат перебора: рейтинги до матча для каждой комбинации параметров"""
+
+    def __init__(self, params, home_elo, away_elo, teams, final_ratings):
+        self.params = params            # DataFrame: k, home_advantage, initial, log_loss
+        self.home_elo = home_elo        # (n_matches × n_params)
+        self.away_elo = away_elo        # (n_matches × n_params)
+        self.teams = teams              # порядок команд в final_ratings
+        self.final_ratings = final_ratings  # (n_params × n_teams)
+
+    def columns(self, i):
+        """Колонки HomeTeam_Elo / AwayTeam_Elo для i-й комбинации параметров"""
+        return {'HomeTeam_Elo': self.home_elo[:, i], 'AwayTeam_Elo': self.away_elo[:, i]}
+
+    def to_frame(self, index=None):
+        """Все комбинации в одном DataFrame: HomeTeam_Elo_k32_ha0_i1500 и т.д."""
+        data = {}
+        for i, (k, ha, initial) in enumerate(self.params[['k', 'home_advantage', 'initial']].itertuples(index=False)):
+            suffix = f"k{k:g}_ha{ha:g}_i{initial:g}"
+            data[f'HomeTeam_Elo_{suffix}'] = self.home_elo[:, i]
+            data[f'AwayTeam_Elo_{suffix}'] = self.away_elo[:, i]
+        return pd.DataFrame(data, index=index)
+
+    def best(self):
+        """Комбинация с минимальным log-loss"""
+        return self.params.loc[self.params['log_loss'].idxmin()]
+
+
+def elo_sweep(home_teams, away_teams, results, k=(K,), home_advantage=(HOME_ADVANTAGE,),
+              initial=(INITIAL_ELO,)):
+    """
+    Считает Elo для всех комбинаций k × home_advantage × initial за один проход.
+    Рейтинги хранятся как массив (n_params × n_teams), поэтому стоимость
+    прохода почти не зависит от числа комбинаций.
+
+    log_loss — средняя бинарная кросс-энтропия ожидаемого результата хозяев
+    относительно фактического (победа 1, ничья 0.5, поражение 0).
+    """
+    grid = np.array(list(itertools.product(k, home_advantage, initial)), dtype=np.float64)
+    ks, advantages, initials = grid[:, 0], grid[:, 1], grid[:, 2]
+
+    home_codes, teams = pd.factorize(np.concatenate([np.asarray(home_teams), np.asarray(away_teams)]))
+    n = len(results)
+    home_codes, away_codes = home_codes[:n], home_codes[n:]
+
+    ratings = np.repeat(initials[:, None], len(teams), axis=1)
+    home_elo = np.empty((n, len(grid)))
+    away_elo = np.empty((n, len(grid)))
+    loss = np.zeros(len(grid))
+
+    for i, (h, a, result) in enumerate(zip(home_codes, away_codes, results)):
+        home_rating = ratings[:, h]
+        away_rating = ratings[:, a]
+        home_elo[i] = home_rating
+        away_elo[i] = away_rating
+
+        expected_home = expected_score(home_rating + advantages, away_rating)
+        if result == 'H':
+            loss -= np.log(np.maximum(expected_home, _EPS))
+            delta = ks * (1.0 - expected_home)
+            ratings[:, h] = home_rating + delta
+            ratings[:, a] = away_rating - delta
+        else:
+            actual = 1.0 if result == 'A' else 0.5
+            expected_away = expected_score(away_rating, home_rating + advantages)
+            home_actual = 1.0 - actual
+            loss -= (home_actual * np.log(np.maximum(expected_home, _EPS))
+                     + actual * np.log(np.maximum(1.0 - expected_home, _EPS)))
+            delta = ks * (actual - expected_away)
+            ratings[:, h] = home_rating - delta
+            ratings[:, a] = away_rating + delta
+
+    params = pd.DataFrame({
+        'k': ks,
+        'home_advantage': advantages,
+        'initial': initials,
+        'log_loss': loss / max(n, 1),
+    })
+    return EloSweepResult(params, home_elo, away_elo, list(teams), ratings)
+
+
+if __name__ == '__main__':
+    from storage import read_table
+
+    parser = argparse.ArgumentParser(description="Перебор параметров Elo за один проход")
+    parser.add_argument("--input", default="processed_with_b365_data")
+    parser.add_argument("--k", type=float, nargs='+', default=[16, 20, 24, 28, 32, 36, 40, 48, 56, 64])
+    parser.add_argument("--home-advantage", type=float, nargs='+', default=[0, 25, 50, 75, 100, 125, 150, 175, 200, 250])
+    parser.add_argument("--initial", type=float, nargs='+', default=[INITIAL_ELO])
+    parser.add_argument("--output", help="сохранить колонки Elo всех комбинаций в CSV")
+    args = parser.parse_args()
+
+    print("🔄 Загружаем данные...")
+    df = read_table(args.input, columns=['Date', 'HomeTeam', 'AwayTeam', 'FTR'])
+    df.sort_values(by='Date', inplace=True)
+    df.reset_index(drop=True, inplace=True)
+
+    started = time.perf_counter()
+    sweep = elo_sweep(df['HomeTeam'], df['AwayTeam'], df['FTR'],
+                      k=args.k, home_advantage=args.home_advantage, initial=args.initial)
+    elapsed = time.perf_counter() - started
+
+    print(f"\n⚡ {len(sweep.params)} комбинаций × {len(df)} матчей за {elapsed:.3f} с")
+    print("\n🏆 Лучшие комбинации по log-loss:")
+    print(sweep.params.sort_values('log_loss').head(10).to_string(index=False))
+
+    if args.output:
+        pd.concat([df[['Date', 'HomeTeam', 'AwayTeam', 'FTR']], sweep.to_frame(df.index)], axis=1) \
+            .to_csv(args.output, index=False)
+        print(f"\n💾 Колонки Elo сохранены в файл: {args.output}")
@@ -0,0 +1,124 @@
+import argparse
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import pandas as pd
+
+from train import (DATA_PATH, MODELS, MODELS_DIR, RESAMPLERS, SEED, TEST_SIZE,
+                   evaluate, make_model, resample, split_dataset)
+
+# ----------------------------
+# Сетка экспериментов «балансировка × модель» из again.ipynb.
+# Разбиение, кодирование и стандартизация выполняются один раз; каждая
+# балансировка — один раз на обучающей выборке, её результат переиспользуется
+# всеми моделями. Балансировки и обучение моделей идут в пуле процессов.
+# ----------------------------
+
+RESULTS_PATH = os.path.join(MODELS_DIR, 'experiments.csv')
+
+_split = None
+
+
+def _init_worker(split):
+    # Разбиение передаётся в каждый процесс один раз, а не с каждой задачей
+    global _split
+    _split = split
+
+
+def _resample_task(name, seed):
+    started = time.perf_counter()
+    X, y = resample(_split, name, seed)
+    return X, y, time.perf_counter() - started
+
+
+def _fit_task(resampler, model_name, X, y, seed):
+    model = make_model(model_name, seed)
+    started = time.perf_counter()
+    model.fit(X, y)
+    fit_seconds = time.perf_counter() - started
+    return dict(evaluate(model, _split.X_test_scaled, _split.y_test), fit_seconds=fit_seconds)
+
+
+def run_grid(df, resamplers=RESAMPLERS, models=MODELS, test_size=TEST_SIZE, seed=SEED, workers=None, log=print):
+    """
+    Обучает все сочетания resamplers × models на одном разбиении.
+    Возвращает таблицу метрик (строка на сочетание), лучшие по F1 — сверху.
+    Ошибка одного сочетания не останавливает сетку: она попадает в колонку error.
+    """
+    split = split_dataset(df, test_size, seed)
+    rows = []
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(split,)) as pool:
+        running = {pool.submit(_resample_task, name, seed): ('resample', name) for name in resamplers}
+        resample_seconds = {}
+        # Модели для балансировки запускаются, как только готова её выборка
+        while running:
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                task = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    if task[0] == 'resample':
+                        rows += [dict(resampler=task[1], model=name, error=str(e)) for name in models]
+                    else:
+                        rows.append(dict(resampler=task[1], model=task[2], error=str(e)))
+                    log(f"⚠️ {' + '.join(task[1:][::-1])}: {e}")
+                    continue
+
+                if task[0] == 'resample':
+                    X, y, resample_seconds[task[1]] = result
+                    for name in models:
+                        running[pool.submit(_fit_task, task[1], name, X, y, seed)] = ('fit', task[1], name)
+                else:
+                    _, resampler, model = task
+                    rows.append(dict(resampler=resampler, model=model,
+                                     resample_seconds=resample_seconds[resampler], **result))
+                    log(f"📊 {model} + {resampler}: F1 = {result['f1_weighted']:.4f}, "
+                        f"AUC = {result['roc_auc_ovr']:.4f} ({result['fit_seconds']:.2f} с)")
+
+    table = pd.DataFrame(rows)
+    if 'f1_weighted' in table:
+        table = table.sort_values(['f1_weighted', 'resampler', 'model'], ascending=[False, True, True],
+                                  na_position='last')
+    return table.reset_index(drop=True)
+
+
+if __name__ == '__main__':
+    from storage import read_table
+    from train import train
+
+    parser = argparse.ArgumentParser(description="Параллельный перебор балансировок и моделей")
+    parser.add_argument("--input", default=DATA_PATH)
+    parser.add_argument("--resamplers", nargs='+', default=list(RESAMPLERS), choices=RESAMPLERS)
+    parser.add_argument("--models", nargs='+', default=list(MODELS), choices=MODELS)
+    parser.add_argument("--test-size", type=float, default=TEST_SIZE)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--workers", type=int, help="число процессов (по умолчанию — по числу ядер)")
+    parser.add_argument("--output", default=RESULTS_PATH, help="таблица результатов (CSV)")
+    parser.add_argument("--save-best", metavar="DIR", help="сохранить артефакты лучшего сочетания по F1")
+    args = parser.parse_args()
+
+    print("🔄 Загружаем данные...")
+    df = read_table(args.input)
+    print(f"🔄 Сетка: {len(args.resamplers)} балансировок × {len(args.models)} моделей")
+
+    started = time.perf_counter()
+    table = run_grid(df, args.resamplers, args.models, args.test_size, args.seed, args.workers)
+    elapsed = time.perf_counter() - started
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    table.to_csv(args.output, index=False)
+
+    columns = [column for column in ('resampler', 'model', 'f1_weighted', 'roc_auc_A', 'roc_auc_D', 'roc_auc_H',
+                                     'fit_seconds', 'error') if column in table]
+    print(f"\n✅ Сетка обучена за {elapsed:.2f} с")
+    print(table[columns].to_string(index=False, float_format=lambda value: f"{value:.4f}"))
+    print(f"\n💾 Результаты сохранены: {args.output}")
+
+    if args.save_best and 'f1_weighted' in table and table['f1_weighted'].notna().any():
+        best = table.iloc[0]
+        result = train(df, best['resampler'], best['model'], args.test_size, args.seed)
+        for path in result.save(args.save_best):
+            print(f"💾 {path}")
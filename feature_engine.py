@@ -0,0 +1,232 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from elo import compute_elo
+
+# ----------------------------
+# Колоночный движок фичей: вместо цикла по iterrows матчи разворачиваются
+# в «длинную» таблицу (одна строка = команда в матче), а все скользящие
+# показатели считаются через групповые кумулятивные суммы.
+# ----------------------------
+
+FORM_WINDOW = 5   # форма за последние N матчей
+H2H_WINDOW = 5    # последние N записей личных встреч
+
+SHARD_KEY = 'Div'  # код лиги: истории команд разных лиг не пересекаются
+# Колонки, которые нужны движку (только они передаются в процессы шардов)
+INPUT_COLUMNS = ['HomeTeam', 'AwayTeam', 'FTR', 'HST', 'AST']
+MATCH_KEY = ['Date', 'HomeTeam', 'AwayTeam']  # один матч в таблице
+
+FEATURE_COLUMNS = [
+    # Форма за последние 5 матчей
+    'HomeTeam_AvgGoalsScoredLast5', 'HomeTeam_AvgGoalsConcededLast5', 'HomeTeam_WinRateLast5',
+    'AwayTeam_AvgGoalsScoredLast5', 'AwayTeam_AvgGoalsConcededLast5', 'AwayTeam_WinRateLast5',
+
+    # Личные встречи
+    'HeadToHead_HomeWinRate', 'HeadToHead_AwayWinRate',
+    'HeadToHead_HomeGoals', 'HeadToHead_AwayGoals',
+
+    # Средние показатели по всем матчам
+    'HomeTeam_GlobalAvgGoalsScored', 'HomeTeam_GlobalAvgGoalsConceded',
+    'AwayTeam_GlobalAvgGoalsScored', 'AwayTeam_GlobalAvgGoalsConceded',
+
+    # Elo-рейтинги до матча
+    'HomeTeam_Elo', 'AwayTeam_Elo',
+]
+
+
+class _PriorSums:
+    """Суммы по предыдущим записям внутри группы (без текущей строки)"""
+
+    def __init__(self, group_codes, match_index):
+        # Внутри группы записи упорядочены по номеру матча (хронология)
+        self.order = np.lexsort((match_index, group_codes))
+        sorted_codes = group_codes[self.order]
+
+        starts = np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]
+        start_idx = np.maximum.accumulate(np.where(starts, np.arange(len(sorted_codes)), 0))
+
+        # Позиция строки в группе = сколько записей было до неё
+        self.position = np.empty(len(group_codes), dtype=np.int64)
+        self.position[self.order] = np.arange(len(sorted_codes)) - start_idx
+
+    def last(self, values, counts):
+        """Сумма последних counts[i] предыдущих значений для каждой строки i"""
+        sorted_values = np.asarray(values, dtype=np.float64)[self.order]
+        cumsum = np.r_[0.0, np.cumsum(sorted_values)]
+
+        sorted_idx = np.arange(len(sorted_values))
+        sorted_counts = np.asarray(counts)[self.order]
+
+        result = np.empty(len(sorted_values))
+        result[self.order] = cumsum[sorted_idx] - cumsum[sorted_idx - sorted_counts]
+        return result
+
+
+def _safe_div(numerator, denominator):
+    return np.divide(numerator, denominator,
+                     out=np.zeros_like(numerator, dtype=np.float64),
+                     where=denominator > 0)
+
+
+def build_features(df):
+    """
+    Считает все исторические фичи для матчей df (уже отсортированных по дате).
+    Возвращает DataFrame с колонками FEATURE_COLUMNS и тем же индексом, что у df,
+    и итоговые Elo-рейтинги команд.
+    """
+    n = len(df)
+    home = df['HomeTeam'].to_numpy()
+    away = df['AwayTeam'].to_numpy()
+    result = df['FTR'].to_numpy()
+    home_shots = df['HST'].to_numpy(dtype=np.float64)  # HST вместо FTHG
+    away_shots = df['AST'].to_numpy(dtype=np.float64)  # AST вместо FTAG
+
+    # ----------------------------
+    # 1. Длинная таблица: строки 0..n-1 — хозяева, n..2n-1 — гости
+    # ----------------------------
+    team = np.concatenate([home, away])
+    opponent = np.concatenate([away, home])
+    scored = np.concatenate([home_shots, away_shots])
+    conceded = np.concatenate([away_shots, home_shots])
+    win = np.concatenate([result == 'H', result == 'A']).astype(np.float64)
+    match_index = np.tile(np.arange(n), 2)
+
+    team_codes, teams = pd.factorize(team)
+    opponent_codes = pd.Index(teams).get_indexer(opponent)
+
+    # ----------------------------
+    # 2. Форма за последние 5 матчей и средние по всем матчам
+    # ----------------------------
+    by_team = _PriorSums(team_codes, match_index)
+    played = by_team.position
+    form_count = np.minimum(played, FORM_WINDOW)
+
+    form_scored = _safe_div(by_team.last(scored, form_count), form_count)
+    form_conceded = _safe_div(by_team.last(conceded, form_count), form_count)
+    form_win_rate = _safe_div(by_team.last(win, form_count), form_count)
+
+    global_scored = _safe_div(by_team.last(scored, played), played)
+    global_conceded = _safe_div(by_team.last(conceded, played), played)
+
+    # ----------------------------
+    # 3. Личные встречи
+    # ----------------------------
+    # Как и в исходном цикле, берутся последние 5 записей из списка
+    # «записи хозяев против гостей» + «записи гостей против хозяев»:
+    # при meetings >= 5 это только записи гостей, иначе хвост записей хозяев
+    # дополняет все записи гостей.
+    by_pair = _PriorSums(team_codes * len(teams) + opponent_codes, match_index)
+    meetings = by_pair.position[:n]
+    away_taken = np.minimum(meetings, H2H_WINDOW)
+    home_taken = np.clip(H2H_WINDOW - meetings, 0, meetings)
+    taken = np.concatenate([home_taken, away_taken])
+    h2h_total = home_taken + away_taken
+
+    h2h_wins = by_pair.last(win, taken)
+    h2h_goals = by_pair.last(scored, taken)
+
+    # ----------------------------
+    # 4. Elo-рейтинги до матча
+    # ----------------------------
+    home_elo, away_elo, elo_ratings = compute_elo(home, away, result)
+
+    features = pd.DataFrame({
+        'HomeTeam_AvgGoalsScoredLast5': form_scored[:n],
+        'HomeTeam_AvgGoalsConcededLast5': form_conceded[:n],
+        'HomeTeam_WinRateLast5': form_win_rate[:n],
+        'AwayTeam_AvgGoalsScoredLast5': form_scored[n:],
+        'AwayTeam_AvgGoalsConcededLast5': form_conceded[n:],
+        'AwayTeam_WinRateLast5': form_win_rate[n:],
+        'HeadToHead_HomeWinRate': _safe_div(h2h_wins[:n], h2h_total),
+        'HeadToHead_AwayWinRate': _safe_div(h2h_wins[n:], h2h_total),
+        'HeadToHead_HomeGoals': _safe_div(h2h_goals[:n], h2h_total),
+        'HeadToHead_AwayGoals': _safe_div(h2h_goals[n:], h2h_total),
+        'HomeTeam_GlobalAvgGoalsScored': global_scored[:n],
+        'HomeTeam_GlobalAvgGoalsConceded': global_conceded[:n],
+        'AwayTeam_GlobalAvgGoalsScored': global_scored[n:],
+        'AwayTeam_GlobalAvgGoalsConceded': global_conceded[n:],
+        'HomeTeam_Elo': home_elo,
+        'AwayTeam_Elo': away_elo,
+    }, index=df.index)
+
+    return features[FEATURE_COLUMNS], elo_ratings
+
+
+# ----------------------------
+# Шардирование по лигам: фичи команды зависят только от матчей с её участием,
+# поэтому лиги без общих команд считаются независимо в пуле процессов
+# ----------------------------
+
+def league_shards(df, key=SHARD_KEY):
+    """
+    Индексы строк df по независимым шардам. Лиги, связанные общими командами
+    (повышение и вылет), объединяются в один шард — иначе история команды
+    разорвалась бы между процессами. Без колонки key — один шард.
+    """
+    if key not in df or df.empty:
+        return [df.index]
+
+    leagues = df[key].astype(str).to_numpy()
+    parent = {league: league for league in pd.unique(leagues)}
+
+    def find(league):
+        while parent[league] != league:
+            parent[league] = parent[parent[league]]
+            league = parent[league]
+        return league
+
+    pairs = pd.DataFrame({
+        'team': np.concatenate([df['HomeTeam'].to_numpy(), df['AwayTeam'].to_numpy()]),
+        'league': np.concatenate([leagues, leagues]),
+    }).drop_duplicates()
+    owner = {}
+    for team, league in zip(pairs['team'], pairs['league']):
+        if team in owner:
+            parent[find(league)] = find(owner[team])
+        else:
+            owner[team] = league
+
+    components = np.array([find(league) for league in leagues])
+    return [df.index[components == component] for component in pd.unique(components)]
+
+
+def build_features_sharded(df, key=SHARD_KEY, workers=None):
+    """
+    То же, что build_features(df), но независимые лиги считаются параллельно.
+    Результат совпадает с однопроцессным расчётом: порядок матчей внутри
+    шарда сохраняется, фичи собираются обратно по индексу df.
+    """
+    shards = league_shards(df, key)
+    workers = min(workers or os.cpu_count() or 1, len(shards))
+    if workers == 1:
+        # Один процесс — пул только добавил бы накладные расходы
+        return build_features(df)
+
+    frames = [df.loc[index, INPUT_COLUMNS] for index in shards]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(build_features, frames))
+
+    features = pd.concat([shard_features for shard_features, _ in results]).reindex(df.index)
+    ratings = {}
+    for _, shard_ratings in results:
+        ratings.update(shard_ratings)
+    # Порядок команд — как при одном проходе compute_elo (по первому появлению)
+    order = pd.unique(np.column_stack([df['HomeTeam'].to_numpy(), df['AwayTeam'].to_numpy()]).ravel())
+    return features, {team: ratings[team] for team in order}
+
+
+def stale_matches(df, processed, last_date):
+    """
+    Матчи df не позже last_date, которых нет в уже посчитанной таблице processed
+    с теми же входными данными: добавленные задним числом (в том числе в последний
+    игровой день снимка) или исправленные. Досчёт от снимка их не учитывает.
+    """
+    columns = MATCH_KEY + [column for column in INPUT_COLUMNS if column not in MATCH_KEY]
+    history = df.loc[df['Date'] <= last_date, columns]
+    known = processed[columns].drop_duplicates()
+    merged = history.merge(known, how='left', on=columns, indicator=True)
+    return history[merged['_merge'].to_numpy() == 'left_only']
@@ -1,13 +1,15 @@
+import argparse
 import pandas as pd
 from datetime import datetime
 
-print("🔄 Загружаем исходные данные...")
-df = pd.read_csv("combined_epl_results.csv")
+from storage import DEFAULT_FORMAT, FORMATS, TableWriter, apply_schema, find_table, write_table
+
+OUTPUT_FILE = "processed_with_b365_data"
 
 # ----------------------------
 # 1. Выбираем только нужные колонки + Date
 # ----------------------------
-columns_to_keep = [
+COLUMNS_TO_KEEP = [
     # Дата матча
     'Date',
 
@@ -30,54 +32,201 @@ columns_to_keep = [
     'B365H', 'B365D', 'B365A'  # Победа домашней / Ничья / Победа гостей
 ]
 
-# Фильтруем датасет
-df_filtered = df[columns_to_keep]
-
-# ----------------------------
-# 2. Обрабатываем дату — указываем явно формат DD/MM/YYYY
-# ----------------------------
-print("\n📅 Преобразуем столбец Date в формат datetime...")
-
-# Явно указываем формат даты как DD/MM/YYYY
-df_filtered['Date'] = pd.to_datetime(df_filtered['Date'], format='%d/%m/%Y', errors='coerce')
-
-# Диагностика: проверяем некорректные даты
-invalid_dates = df_filtered[df_filtered['Date'].isna()]
-if not invalid_dates.empty:
-    print(f"\n⚠️ Найдено {len(invalid_dates)} строк с некорректной датой.")
-    print("📉 Примеры:")
-    print(invalid_dates[['Date', 'HomeTeam', 'AwayTeam']].head())
-
-# ----------------------------
-# 3. Удаляем матчи из будущего
-# ----------------------------
-now = pd.Timestamp(datetime.now())
-future_matches = df_filtered[df_filtered['Date'] > now]
-if not future_matches.empty:
-    print(f"\n⏳ Найдено {len(future_matches)} матчей из будущего.")
-    print("🔮 Примеры:")
-    print(future_matches[['Date', 'HomeTeam', 'AwayTeam']].head())
-
-df_filtered = df_filtered[df_filtered['Date'] <= now]
-
-# ----------------------------
-# 4. Сортируем по дате — важно для дальнейшего анализа
-# ----------------------------
-df_filtered.sort_values(by='Date', inplace=True)
-df_filtered.reset_index(drop=True, inplace=True)
-
-# ----------------------------
-# 5. Проверяем результат
-# ----------------------------
-print("\n✅ Фильтрация завершена.")
-print(f"📊 Размер датасета после очистки: {df_filtered.shape}")
-print("\n📅 Первые 2 строки:")
-print(df_filtered[['Date', 'HomeTeam', 'AwayTeam', 'FTR']].head(2))
-
-# ----------------------------
-# 6. Сохраняем обработанный датасет
-# ----------------------------
-output_file = "processed_with_b365_data.csv"
-df_filtered.to_csv(output_file, index=False)
-
-print(f"\n💾 Данные сохранены в файл: {output_file}")
\ No newline at end of file
+DATE_FORMAT = '%d/%m/%Y'
+N_EXAMPLES = 5
+
+
+class RowReport:
+    """Диагностика по всем чанкам: общее число строк и первые примеры"""
+
+    def __init__(self):
+        self.count = 0
+        self.examples = []
+
+    def add(self, rows):
+        self.count += len(rows)
+        if len(self.examples) < N_EXAMPLES and not rows.empty:
+            self.examples.append(rows.head(N_EXAMPLES))
+
+    def print(self, title, examples_title):
+        if not self.count:
+            return
+        print(f"\n{title.format(count=self.count)}")
+        print(examples_title)
+        print(pd.concat(self.examples).head(N_EXAMPLES))
+
+
+class FilterResult:
+    def __init__(self, written, shape, head, ordered, invalid_dates, future_matches):
+        self.written = written
+        self.shape = shape
+        self.head = head
+        self.ordered = ordered
+        self.invalid_dates = invalid_dates
+        self.future_matches = future_matches
+
+
+def resolve_input(input_path):
+    """Файл объединённой таблицы: CSV или Parquet (более свежий из двух, как в storage)"""
+    resolved = find_table(input_path)
+    if resolved is None:
+        raise FileNotFoundError(f"Таблица не найдена: {input_path}")
+    return resolved
+
+
+def select_columns(resolved):
+    """Колонки для выходной таблицы; код лиги (если есть) — ключ шардирования в features.py"""
+    if resolved.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        header = pq.ParquetFile(resolved).schema_arrow.names
+    else:
+        header = pd.read_csv(resolved, nrows=0).columns
+    columns = list(COLUMNS_TO_KEEP)
+    if 'Div' in header:
+        columns.insert(0, 'Div')
+    return columns
+
+
+def read_input(resolved, columns, chunk_size=None):
+    """
+    Нужные колонки таблицы целиком (chunk_size=None) или частями по chunk_size строк:
+    CSV — чанками pandas (даты строками), Parquet — пакетами строк pyarrow.
+    """
+    if resolved.endswith('.parquet'):
+        if not chunk_size:
+            yield pd.read_parquet(resolved, columns=columns)
+            return
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(resolved).iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+    elif not chunk_size:
+        yield pd.read_csv(resolved, usecols=columns, dtype={'Date': str})
+    else:
+        yield from pd.read_csv(resolved, usecols=columns, dtype={'Date': str}, chunksize=chunk_size)
+
+
+def clean_chunk(chunk, columns, now, invalid_dates, future_matches):
+    """
+    Дата по явному формату DD/MM/YYYY (в Parquet она уже datetime),
+    отсев некорректных дат и матчей из будущего
+    """
+    # Собственная копия нужных колонок — присваивание Date не создаёт копию среза
+    chunk = chunk.reindex(columns=columns)
+    raw_dates = chunk['Date']
+    chunk['Date'] = pd.to_datetime(raw_dates, format=DATE_FORMAT, errors='coerce')
+
+    invalid = chunk['Date'].isna()
+    invalid_dates.add(chunk.loc[invalid, ['HomeTeam', 'AwayTeam']].assign(Date=raw_dates[invalid])
+                      [['Date', 'HomeTeam', 'AwayTeam']])
+    future_matches.add(chunk.loc[chunk['Date'] > now, ['Date', 'HomeTeam', 'AwayTeam']])
+
+    return chunk[chunk['Date'] <= now]
+
+
+def filter_results(input_path, output=OUTPUT_FILE, fmt=DEFAULT_FORMAT, csv_export=False, chunk_size=None,
+                   now=None):
+    """
+    Очищает объединённые результаты и сохраняет их в output.
+    chunk_size — потоковый режим: память не зависит от размера файла.
+    """
+    resolved = resolve_input(input_path)
+    columns = select_columns(resolved)
+    now = pd.Timestamp(now or datetime.now())
+    invalid_dates = RowReport()
+    future_matches = RowReport()
+
+    if chunk_size:
+        # ----------------------------
+        # 2–4. Потоковый режим: читаем только нужные колонки чанками,
+        #      очищаем и сразу дописываем в выходной файл
+        # ----------------------------
+        writers = [TableWriter(output, fmt)]
+        if csv_export and fmt != 'csv':
+            writers.append(TableWriter(output, 'csv'))
+
+        head = None
+        rows = 0
+        ordered = True
+        last_date = None
+        for chunk in read_input(resolved, columns, chunk_size):
+            # Внутри чанка — сортировка по дате; глобальный порядок только проверяем
+            chunk = clean_chunk(chunk, columns, now, invalid_dates, future_matches)
+            chunk = apply_schema(chunk.sort_values(by='Date', kind='stable'))
+            if chunk.empty:
+                continue
+            if last_date is not None and chunk['Date'].iloc[0] < last_date:
+                ordered = False
+            last_date = chunk['Date'].iloc[-1]
+
+            for writer in writers:
+                writer.write(chunk)
+            if head is None:
+                head = chunk.head(2)
+            rows += len(chunk)
+
+        if head is None:
+            # Пустой результат — записываем хотя бы заголовок
+            empty = apply_schema(pd.DataFrame(columns=columns))
+            for writer in writers:
+                writer.write(empty)
+            head = empty
+        for writer in writers:
+            writer.close()
+        written = [writer.path for writer in writers]
+        shape = (rows, len(columns))
+    else:
+        # Читаем только нужные колонки из широкого исходного файла
+        df_filtered = clean_chunk(next(read_input(resolved, columns)), columns, now, invalid_dates, future_matches)
+
+        # ----------------------------
+        # 4. Сортируем по дате — важно для дальнейшего анализа
+        # ----------------------------
+        df_filtered.sort_values(by='Date', kind='stable', inplace=True)
+        df_filtered.reset_index(drop=True, inplace=True)
+        ordered = True
+        head = df_filtered.head(2)
+        shape = df_filtered.shape
+
+        # Команды — category, статистика — float32, дата — datetime
+        apply_schema(df_filtered)
+        written = write_table(df_filtered, output, fmt, csv_export=csv_export)
+
+    return FilterResult(written, shape, head, ordered, invalid_dates, future_matches)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Отбор колонок и очистка исходных результатов матчей")
+    parser.add_argument("--input", default="combined_epl_results.csv",
+                        help="объединённая таблица с результатами (CSV или Parquet)")
+    parser.add_argument("--format", choices=FORMATS, default=DEFAULT_FORMAT, help="формат выходной таблицы")
+    parser.add_argument("--csv", action="store_true", help="дополнительно сохранить CSV")
+    parser.add_argument("--chunk-size", type=int,
+                        help="потоковый режим: читать и записывать по N строк (память не зависит от размера файла)")
+    args = parser.parse_args()
+
+    print("🔄 Загружаем исходные данные...")
+    print("\n📅 Преобразуем столбец Date в формат datetime...")
+
+    result = filter_results(args.input, OUTPUT_FILE, args.format, args.csv, args.chunk_size)
+
+    # ----------------------------
+    # Диагностика: некорректные даты и матчи из будущего (по всем чанкам)
+    # ----------------------------
+    result.invalid_dates.print("⚠️ Найдено {count} строк с некорректной датой.", "📉 Примеры:")
+    result.future_matches.print("⏳ Найдено {count} матчей из будущего.", "🔮 Примеры:")
+
+    # ----------------------------
+    # 5. Проверяем результат
+    # ----------------------------
+    print("\n✅ Фильтрация завершена.")
+    print(f"📊 Размер датасета после очистки: {result.shape}")
+    print("\n📅 Первые 2 строки:")
+    print(result.head[['Date', 'HomeTeam', 'AwayTeam', 'FTR']])
+    if not result.ordered:
+        print("\n⚠️ Чанки идут не по порядку дат: файл отсортирован только внутри чанков "
+              "(features.py сортирует матчи по дате при загрузке).")
+
+    # ----------------------------
+    # 6. Сохраняем обработанный датасет
+    # ----------------------------
+    print(f"\n💾 Данные сохранены в файл: {', '.join(result.written)}")
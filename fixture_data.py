@@ -0,0 +1,63 @@
+from datetime import datetime
+
+from model_bundle import LazyBundle
+
+# ----------------------------
+# Данные десктопного приложения без Qt: исторические матчи, индекс пар
+# команд и пакет модели. pandas импортируется только при загрузке данных.
+# ----------------------------
+
+DATA_PATH = 'data/processed_with_all_features'
+
+# Пакет модели (загружается в фоне вместе с данными)
+bundle = LazyBundle()
+
+
+def build_fixture_index(df):
+    """(хозяева, гости) -> позиция последней строки с этой парой в df"""
+    last = df.reset_index(drop=True).drop_duplicates(['HomeTeam', 'AwayTeam'], keep='last')
+    return dict(zip(zip(last['HomeTeam'], last['AwayTeam']), last.index))
+
+
+class FixtureData:
+    """Исторические матчи, список команд и индекс пар для быстрого поиска"""
+
+    def __init__(self, full_data):
+        self.full_data = full_data.reset_index(drop=True)
+        self.teams = sorted(set(self.full_data['HomeTeam'].unique()) | set(self.full_data['AwayTeam'].unique()))
+        # Индекс строится один раз: поиск пары при клике — обращение к словарю
+        self.fixture_index = build_fixture_index(self.full_data)
+
+    @classmethod
+    def load(cls, path=DATA_PATH):
+        # pandas импортируется здесь, в фоновом потоке, а не до показа окна
+        from storage import read_table
+        return cls(read_table(path))
+
+    def has_fixture(self, home, away):
+        return (home, away) in self.fixture_index
+
+    def predict(self, home, away):
+        """Вероятности [гости, ничья, хозяева] по последнему матчу пары; None — нет истории"""
+        position = self.fixture_index.get((home, away))
+        if position is None:
+            return None
+
+        today = datetime.today()
+        row = self.full_data.iloc[position].to_dict()
+        row['Date'] = today.strftime('%Y-%m-%d')
+        row['Year'] = today.year
+        row['Month'] = today.month
+        row['Day'] = today.day
+
+        # Кодирование команд, заполнение пропусков, стандартизация и модель — в пакете
+        model = bundle.get()
+        x = model.vectorize(row)
+        return model.predict_proba(x[None, :], impute=True)[0]
+
+
+def warm_up_model():
+    """Загружает пакет модели и делает пробный прогноз: первый клик не ждёт диска"""
+    model = bundle.get().load_arrays()
+    model.predict_proba(model.vectorize({})[None, :], impute=True)
+    return model
@@ -0,0 +1,241 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from storage import DEFAULT_FORMAT, FORMATS, find_table, read_table, table_path, write_table
+
+# ----------------------------
+# Загрузка сезонных CSV (football-data.co.uk): файлы читаются в пуле процессов,
+# приводятся к объявленной схеме колонок и кэшируются по хэшу содержимого.
+# Манифест хранит хэши — при повторном запуске перечитываются только новые
+# или изменённые сезоны.
+# ----------------------------
+
+INGEST_SCHEMA_VERSION = 2  # 2: сезон в имени файла кэша
+
+REQUIRED_COLUMNS = ['Div', 'Date', 'HomeTeam', 'AwayTeam', 'FTR']
+MATCH_COLUMNS = [
+    'Div', 'Date', 'Time', 'HomeTeam', 'AwayTeam',
+    'FTHG', 'FTAG', 'FTR', 'HTHG', 'HTAG', 'HTR', 'Referee',
+    'HS', 'AS', 'HST', 'AST', 'HF', 'AF', 'HC', 'AC', 'HY', 'AY', 'HR', 'AR',
+]
+# Наборы букмекеров различаются по сезонам: отсутствующие колонки заполняются пропусками
+ODDS_COLUMNS = [
+    'B365H', 'B365D', 'B365A', 'PSH', 'PSD', 'PSA',
+    'MaxH', 'MaxD', 'MaxA', 'AvgH', 'AvgD', 'AvgA',
+    'B365CH', 'B365CD', 'B365CA', 'AvgCH', 'AvgCD', 'AvgCA',
+]
+SCHEMA = MATCH_COLUMNS + ODDS_COLUMNS + ['Season']
+TEXT_COLUMNS = ['Div', 'Time', 'HomeTeam', 'AwayTeam', 'FTR', 'HTR', 'Referee', 'Season']
+
+# Старые названия колонок в архивных сезонах
+COLUMN_ALIASES = {
+    'HT': 'HomeTeam', 'AT': 'AwayTeam',
+    'BbAvH': 'AvgH', 'BbAvD': 'AvgD', 'BbAvA': 'AvgA',
+    'BbMxH': 'MaxH', 'BbMxD': 'MaxD', 'BbMxA': 'MaxA',
+    'PH': 'PSH', 'PD': 'PSD', 'PA': 'PSA',
+}
+
+DATE_FORMAT = '%d/%m/%Y'
+SHORT_DATE_FORMAT = '%d/%m/%y'  # в ранних сезонах год двузначный
+ENCODINGS = ('utf-8-sig', 'latin-1')
+
+DEFAULT_MANIFEST = "ingest_manifest.json"
+DEFAULT_CACHE_DIR = ".ingest_cache"
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_csv(path):
+    for encoding in ENCODINGS:
+        try:
+            return pd.read_csv(path, encoding=encoding, dtype=str, skipinitialspace=True)
+        except UnicodeDecodeError:
+            continue
+    raise ValueError(f"Не удалось определить кодировку файла {path}")
+
+
+def parse_dates(values):
+    """DD/MM/YYYY с запасным разбором DD/MM/YY"""
+    dates = pd.to_datetime(values, format=DATE_FORMAT, errors='coerce')
+    short = dates.isna() & values.notna()
+    if short.any():
+        dates[short] = pd.to_datetime(values[short], format=SHORT_DATE_FORMAT, errors='coerce')
+    return dates
+
+
+def normalize_season(df, season):
+    """Приводит таблицу сезона к SCHEMA; возвращает (таблица, отсутствующие, отброшенные колонки)"""
+    df = df.rename(columns=lambda column: COLUMN_ALIASES.get(column.strip(), column.strip()))
+    df = df.loc[:, ~df.columns.duplicated()]
+
+    missing_required = [column for column in REQUIRED_COLUMNS if column not in df]
+    if missing_required:
+        raise ValueError(f"нет обязательных колонок: {', '.join(missing_required)}")
+
+    # Хвостовые пустые строки (",,,,") в файлах football-data
+    df = df.dropna(subset=['HomeTeam', 'AwayTeam'], how='all')
+
+    missing = [column for column in SCHEMA if column not in df and column != 'Season']
+    dropped = [column for column in df.columns if column not in SCHEMA]
+
+    df = df.reindex(columns=SCHEMA)
+    df['Season'] = season
+    df['Date'] = parse_dates(df['Date'])
+    for column in SCHEMA:
+        if column not in TEXT_COLUMNS and column != 'Date':
+            df[column] = pd.to_numeric(df[column], errors='coerce')
+    return df.reset_index(drop=True), missing, dropped
+
+
+def ingest_file(path, sha256, cache_dir, fmt):
+    """Задача воркера: читает один сезон и сохраняет нормализованную таблицу в кэш"""
+    season = os.path.splitext(os.path.basename(path))[0]
+    df, missing, dropped = normalize_season(_read_csv(path), season)
+    # Сезон входит в ключ: одинаковые по содержимому файлы разных сезонов не делят кэш
+    cache = os.path.join(cache_dir, f"{season}-{sha256}")
+    write_table(df, cache, fmt)
+    return {
+        'rows': len(df),
+        'bad_dates': int(df['Date'].isna().sum()),
+        'missing': missing,
+        'dropped': dropped,
+        'cache': table_path(cache, fmt),
+    }
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    # Изменилась схема — все сезоны перечитываются
+    if manifest.get('schema_version') != INGEST_SCHEMA_VERSION or manifest.get('schema') != SCHEMA:
+        return {}
+    return manifest.get('files', {})
+
+
+def save_manifest(path, files):
+    manifest = {'schema_version': INGEST_SCHEMA_VERSION, 'schema': SCHEMA, 'files': files}
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def find_season_files(sources):
+    """Файлы по шаблонам glob или каталогам (рекурсивно — лиги в подкаталогах)"""
+    files = set()
+    for source in sources:
+        if os.path.isdir(source):
+            source = os.path.join(source, '**', '*.csv')
+        files.update(glob.glob(source, recursive=True))
+    return sorted(os.path.abspath(path) for path in files)
+
+
+def ingest(sources, output="combined_epl_results", manifest_path=DEFAULT_MANIFEST,
+           cache_dir=DEFAULT_CACHE_DIR, fmt='csv', workers=None, log=print):
+    """
+    Объединяет сезонные файлы в одну таблицу по схеме SCHEMA.
+    Возвращает сводку: сколько файлов перечитано, переиспользовано и удалено.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    previous = load_manifest(manifest_path)
+    files = find_season_files(sources)
+
+    # Хэш пересчитывается только если изменились размер или время модификации
+    entries, pending = {}, []
+    for path in files:
+        stat = os.stat(path)
+        entry = previous.get(path)
+        if entry and (entry['size'], entry['mtime_ns']) == (stat.st_size, stat.st_mtime_ns):
+            sha256 = entry['sha256']
+        else:
+            sha256 = file_sha256(path)
+        if entry and entry['sha256'] == sha256 and os.path.exists(entry['cache']):
+            entries[path] = dict(entry, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        else:
+            pending.append((path, sha256, stat))
+
+    failed = []
+    if pending:
+        log(f"🔄 Читаем {len(pending)} сезон(ов) из {len(files)}...")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [(path, sha256, stat, pool.submit(ingest_file, path, sha256, cache_dir, DEFAULT_FORMAT))
+                       for path, sha256, stat in pending]
+            for path, sha256, stat, future in futures:
+                try:
+                    report = future.result()
+                except Exception as e:
+                    failed.append(path)
+                    # Последняя удачная версия сезона остаётся в таблице; в манифесте —
+                    # её хэш, поэтому при следующем запуске файл будет прочитан снова
+                    if path in previous and os.path.exists(previous[path]['cache']):
+                        entries[path] = previous[path]
+                        log(f"⚠️ Ошибка при чтении файла {path}: {e} — оставлена прошлая версия")
+                    else:
+                        log(f"⚠️ Ошибка при чтении файла {path}: {e}")
+                    continue
+                entries[path] = dict(report, sha256=sha256, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+                if report['bad_dates']:
+                    log(f"⚠️ {os.path.basename(path)}: некорректных дат — {report['bad_dates']}")
+
+    removed = [path for path in previous if path not in entries and path not in failed]
+    # Кэш удалённых и изменённых сезонов больше не нужен
+    live = {entry['cache'] for entry in entries.values()}
+    for entry in previous.values():
+        if entry['cache'] not in live and os.path.exists(entry['cache']):
+            os.remove(entry['cache'])
+
+    changed = bool(pending) or bool(removed) or find_table(output) is None
+    if changed and entries:
+        combined = pd.concat([read_table(entries[path]['cache']) for path in sorted(entries)], ignore_index=True)
+        # В CSV даты остаются в формате football-data, который ожидает filter.py
+        written = write_table(combined[SCHEMA], output, fmt, date_format=DATE_FORMAT)
+        log(f"💾 Объединено {len(combined)} матчей из {len(entries)} файлов: {', '.join(written)}")
+    elif not entries and not failed:
+        # Сезонов не осталось — старая объединённая таблица не должна питать пайплайн
+        for stale in (table_path(output, name) for name in FORMATS):
+            if os.path.exists(stale):
+                os.remove(stale)
+                log(f"🗑️ Файлов сезонов не найдено, удалена таблица: {stale}")
+
+    save_manifest(manifest_path, entries)
+    return {
+        'files': len(files),
+        'read': len(pending) - len(failed),
+        'reused': len(files) - len(pending),
+        'removed': len(removed),
+        'failed': failed,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Объединение сезонных CSV в общий датасет")
+    parser.add_argument("sources", nargs='+', help="каталоги или шаблоны glob с файлами сезонов")
+    parser.add_argument("--output", default="combined_epl_results")
+    parser.add_argument("--format", choices=FORMATS, default='csv', help="формат объединённой таблицы")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST, help="манифест хэшей файлов")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="кэш нормализованных сезонов")
+    parser.add_argument("--workers", type=int, help="число процессов (по умолчанию — по числу ядер)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    summary = ingest(args.sources, args.output, args.manifest, args.cache_dir, args.format, args.workers)
+    elapsed = time.perf_counter() - started
+
+    print(f"\n✅ Файлов: {summary['files']}, прочитано: {summary['read']}, "
+          f"из кэша: {summary['reused']}, удалено: {summary['removed']} ({elapsed:.2f} с)")
+    if summary['failed']:
+        print(f"⚠️ Не удалось прочитать: {len(summary['failed'])}")
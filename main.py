@@ -1,30 +1,252 @@
 import sys
-import pandas as pd
-import numpy as np
-import joblib
 import os
 from PySide6.QtWidgets import (
     QApplication, QWidget, QLabel, QComboBox, QPushButton,
     QVBoxLayout, QHBoxLayout, QMessageBox, QSpacerItem, QSizePolicy,
-    QFrame, QGraphicsDropShadowEffect
+    QFrame, QGraphicsDropShadowEffect, QProgressBar, QDialog, QTableWidget, QTableWidgetItem,
+    QHeaderView
 )
-from PySide6.QtGui import QPixmap, QFont, QIcon, QColor, QLinearGradient, QBrush, QPalette
-from PySide6.QtCore import Qt, QSize, QPropertyAnimation, QEasingCurve
-from datetime import datetime
-
-# === Загрузка моделей ===
-model = joblib.load('models/logistic_model.pkl')
-scaler = joblib.load('models/scaler.pkl')
-imputer = joblib.load('models/imputer.pkl')
-encoder = joblib.load('models/encoder.pkl')
-final_features = joblib.load('models/final_feature_order.pkl')
-
-# === Загрузка данных и списка команд ===
-full_data = pd.read_csv('data/processed_with_all_features.csv')
-all_teams = sorted(set(full_data['HomeTeam'].unique()) | set(full_data['AwayTeam'].unique()))
-
-# === Путь к логотипам ===
+from PySide6.QtGui import QImage, QPixmap, QFont, QIcon, QColor, QLinearGradient, QBrush, QPalette
+from PySide6.QtCore import (
+    Qt, QSize, QPropertyAnimation, QEasingCurve, QObject, QRunnable, QThreadPool, Signal
+)
+from fixture_data import FixtureData, bundle, warm_up_model
+
+# === Пути и размеры ===
 LOGO_PATH = "logos"
+LOGO_SIZES = (120, 50)  # главное окно и окно результата
+
+
+class LogoCache:
+    """Логотипы, заранее масштабированные под каждый размер; общий для окна и диалога"""
+
+    def __init__(self):
+        self._pixmaps = {}
+
+    @staticmethod
+    def load_images(teams, sizes=LOGO_SIZES):
+        # QImage, в отличие от QPixmap, можно читать и масштабировать вне GUI-потока
+        images = {}
+        for team in teams:
+            image = QImage(os.path.join(LOGO_PATH, f"{team}.png"))
+            if image.isNull():
+                continue
+            for size in sizes:
+                images[(team, size)] = image.scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        return images
+
+    def add_images(self, images):
+        for key, image in images.items():
+            self._pixmaps[key] = QPixmap.fromImage(image)
+
+    def get(self, team, size):
+        pixmap = self._pixmaps.get((team, size))
+        if pixmap is None:
+            # Нет в предзагрузке (нет файла или нестандартный размер) — читаем один раз
+            path = os.path.join(LOGO_PATH, f"{team}.png")
+            pixmap = (QPixmap(path).scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+                      if os.path.exists(path) else QPixmap())
+            self._pixmaps[(team, size)] = pixmap
+        return pixmap
+
+
+logos = LogoCache()
+
+
+class LoaderSignals(QObject):
+    status = Signal(str)
+    loaded = Signal(object, object)
+    error = Signal(str)
+
+
+class LoaderWorker(QRunnable):
+    """Фоновая загрузка данных, логотипов и модели: окно показывается сразу"""
+
+    def __init__(self):
+        super().__init__()
+        self.signals = LoaderSignals()
+
+    def run(self):
+        try:
+            self.signals.status.emit("Загрузка данных...")
+            data = FixtureData.load()
+            self.signals.status.emit("Загрузка логотипов...")
+            images = LogoCache.load_images(data.teams)
+            self.signals.status.emit("Загрузка модели...")
+            warm_up_model()
+            self.signals.loaded.emit(data, images)
+        except Exception as e:
+            self.signals.error.emit(str(e))
+
+
+class WorkerSignals(QObject):
+    finished = Signal(str, str, object)
+    error = Signal(str)
+
+
+class PredictionWorker(QRunnable):
+    """Прогноз в пуле потоков: окно не замирает на время расчёта"""
+
+    def __init__(self, data, home, away):
+        super().__init__()
+        self.data = data
+        self.home = home
+        self.away = away
+        self.signals = WorkerSignals()
+
+    def run(self):
+        try:
+            self.signals.finished.emit(self.home, self.away, self.data.predict(self.home, self.away))
+        except Exception as e:
+            self.signals.error.emit(str(e))
+
+
+class SimulationSignals(QObject):
+    progress = Signal(int, int)
+    finished = Signal(object, object)
+    cancelled = Signal()
+    error = Signal(str)
+
+
+class SimulationWorker(QRunnable):
+    """Монте-Карло симуляция оставшейся части сезона в пуле потоков"""
+
+    def __init__(self, data, n_simulations):
+        super().__init__()
+        self.data = data
+        self.n_simulations = n_simulations
+        self.signals = SimulationSignals()
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        try:
+            from app.hydration import FeatureHydrator
+            from season_sim import SeasonFixtures, fixture_probabilities, simulate_season
+
+            df = self.data.full_data
+            fixtures = SeasonFixtures(df)
+            # Вероятности всех оставшихся матчей — одним вызовом модели
+            probs = fixture_probabilities(bundle.get(), FeatureHydrator(df), fixtures.fixtures)
+            result = simulate_season(fixtures, probs, self.n_simulations,
+                                     progress=self.signals.progress.emit,
+                                     cancelled=lambda: self._cancelled)
+            if result is None:
+                self.signals.cancelled.emit()
+            else:
+                self.signals.finished.emit(fixtures, result)
+        except Exception as e:
+            self.signals.error.emit(str(e))
+
+
+class SeasonDialog(QDialog):
+    """Распределение итоговых мест, очков и шансов на титул/вылет"""
+
+    N_SIMULATIONS = 100_000
+
+    def __init__(self, data, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Симуляция сезона")
+        self.setWindowIcon(QIcon(os.path.join(LOGO_PATH, "premier_league.png")))
+        self.resize(1100, 650)
+
+        self.status = QLabel(f"Симулируем {self.N_SIMULATIONS:,} сезонов...".replace(",", " "))
+        self.status.setFont(QFont("Arial", 13, QFont.Bold))
+
+        self.progress = QProgressBar()
+        self.progress.setRange(0, self.N_SIMULATIONS)
+
+        self.table = QTableWidget()
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.hide()
+
+        self.cancel_btn = QPushButton("Отмена")
+        self.cancel_btn.setCursor(Qt.PointingHandCursor)
+        self.cancel_btn.clicked.connect(self.cancel_or_close)
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.status)
+        layout.addWidget(self.progress)
+        layout.addWidget(self.table)
+        buttons = QHBoxLayout()
+        buttons.addSpacerItem(QSpacerItem(0, 0, QSizePolicy.Expanding, QSizePolicy.Minimum))
+        buttons.addWidget(self.cancel_btn)
+        layout.addLayout(buttons)
+        self.setLayout(layout)
+
+        self.worker = SimulationWorker(data, self.N_SIMULATIONS)
+        self.worker.signals.progress.connect(self.on_progress)
+        self.worker.signals.finished.connect(self.on_finished)
+        self.worker.signals.cancelled.connect(self.on_cancelled)
+        self.worker.signals.error.connect(self.on_error)
+        QThreadPool.globalInstance().start(self.worker)
+
+    def cancel_or_close(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.cancel_btn.setEnabled(False)
+        else:
+            self.accept()
+
+    def reject(self):
+        # Закрытие окна во время расчёта останавливает симуляцию
+        if self.worker is not None:
+            self.worker.cancel()
+        super().reject()
+
+    def _done(self, status):
+        self.worker = None
+        self.status.setText(status)
+        self.progress.hide()
+        self.cancel_btn.setEnabled(True)
+        self.cancel_btn.setText("Закрыть")
+
+    def on_progress(self, done, total):
+        self.progress.setValue(done)
+
+    def on_cancelled(self):
+        self._done("Симуляция отменена")
+
+    def on_error(self, message):
+        self._done(f"Ошибка симуляции: {message}")
+
+    def on_finished(self, fixtures, result):
+        season = f"{fixtures.season}/{fixtures.season + 1}"
+        remaining = "весь сезон" if fixtures.full_season else f"осталось матчей: {len(fixtures.fixtures)}"
+        self._done(f"Сезон {season} ({remaining}), симуляций: {result.n_simulations:,}".replace(",", " "))
+
+        frame = result.to_frame()
+        order = [result.teams.index(team) for team in frame['Team']]
+        n_teams = len(result.teams)
+        headers = ["Команда", "Очки (ср.)", "Очки 5–95%", "Чемпион", "Топ-4", "Вылет"]
+        headers += [str(place) for place in range(1, n_teams + 1)]
+
+        self.table.setColumnCount(len(headers))
+        self.table.setRowCount(len(frame))
+        self.table.setHorizontalHeaderLabels(headers)
+        for row, (team_position, record) in enumerate(zip(order, frame.itertuples(index=False))):
+            cells = [
+                record.Team,
+                f"{record.MeanPoints:.1f}",
+                f"{record[2]}–{record[3]}",
+                f"{record.Title:.1%}",
+                f"{record.Top4:.1%}",
+                f"{record.Relegation:.1%}",
+            ]
+            cells += [f"{p:.0%}" if p >= 0.005 else "" for p in result.position_probs[team_position]]
+            for column, text in enumerate(cells):
+                item = QTableWidgetItem(text)
+                if column:
+                    item.setTextAlignment(Qt.AlignCenter)
+                self.table.setItem(row, column, item)
+            self.table.item(row, 0).setIcon(QIcon(logos.get(record.Team, 50)))
+
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.show()
+
 
 class MatchPredictor(QWidget):
     def __init__(self):
@@ -116,10 +338,9 @@ class MatchPredictor(QWidget):
         # Команды
         self.home_combo = QComboBox()
         self.away_combo = QComboBox()
-        self.home_combo.addItems(all_teams)
-        self.away_combo.addItems(all_teams)
-        self.home_combo.setCurrentIndex(all_teams.index("Арсенал") if "Арсенал" in all_teams else 0)
-        self.away_combo.setCurrentIndex(all_teams.index("Челси") if "Челси" in all_teams else 1)
+        # Списки команд заполняются после фоновой загрузки данных
+        self.home_combo.setEnabled(False)
+        self.away_combo.setEnabled(False)
 
         self.home_combo.setFont(QFont("Arial", 12))
         self.away_combo.setFont(QFont("Arial", 12))
@@ -174,6 +395,17 @@ class MatchPredictor(QWidget):
         btn_shadow.setOffset(0, 3)
         self.predict_btn.setGraphicsEffect(btn_shadow)
 
+        # Симуляция оставшейся части сезона
+        self.season_btn = QPushButton("Симулировать сезон")
+        self.season_btn.setCursor(Qt.PointingHandCursor)
+        self.season_btn.setFont(QFont("Arial", 14, QFont.Bold))
+        self.season_btn.setStyleSheet("""
+            QPushButton { background-color: #007bff; }
+            QPushButton:hover { background-color: #0069d9; }
+            QPushButton:pressed { background-color: #0062cc; }
+        """)
+        self.season_btn.clicked.connect(self.simulate_season)
+
         # Layouts
         main_layout = QVBoxLayout()
         main_layout.setContentsMargins(40, 30, 40, 40)
@@ -210,34 +442,75 @@ class MatchPredictor(QWidget):
         btn_container = QHBoxLayout()
         btn_container.addSpacerItem(QSpacerItem(0, 0, QSizePolicy.Expanding, QSizePolicy.Minimum))
         btn_container.addWidget(self.predict_btn)
+        btn_container.addWidget(self.season_btn)
         btn_container.addSpacerItem(QSpacerItem(0, 0, QSizePolicy.Expanding, QSizePolicy.Minimum))
         
         main_layout.addLayout(btn_container)
         main_layout.addSpacerItem(QSpacerItem(0, 20, QSizePolicy.Minimum, QSizePolicy.Minimum))
 
+        # Индикатор расчёта (бесконечная полоса), скрыт до нажатия кнопки
+        self.busy_bar = QProgressBar()
+        self.busy_bar.setRange(0, 0)
+        self.busy_bar.setTextVisible(False)
+        self.busy_bar.setFixedHeight(6)
+        self.busy_bar.hide()
+        main_layout.addWidget(self.busy_bar)
+
         self.setLayout(main_layout)
 
-        # Обновить логотипы при запуске
+        self.thread_pool = QThreadPool.globalInstance()
+        self.data = None
+        self.worker = None
+
+        # Данные и модель грузятся в фоне, пока окно уже на экране
+        self.predict_btn.setEnabled(False)
+        self.season_btn.setEnabled(False)
+        self.predict_btn.setText("Загрузка...")
+        self.busy_bar.show()
+        self.loader = LoaderWorker()
+        self.loader.signals.status.connect(self.predict_btn.setText)
+        self.loader.signals.loaded.connect(self.on_loaded)
+        self.loader.signals.error.connect(self.on_load_error)
+        self.thread_pool.start(self.loader)
+
+    def on_loaded(self, data, images):
+        self.data = data
+        self.loader = None
+        logos.add_images(images)
+
+        teams = data.teams
+        for combo in (self.home_combo, self.away_combo):
+            combo.blockSignals(True)
+            combo.addItems(teams)
+        self.home_combo.setCurrentIndex(teams.index("Арсенал") if "Арсенал" in teams else 0)
+        self.away_combo.setCurrentIndex(teams.index("Челси") if "Челси" in teams else 1)
+        for combo in (self.home_combo, self.away_combo):
+            combo.blockSignals(False)
+            combo.setEnabled(True)
+
+        self.busy_bar.hide()
+        self.predict_btn.setEnabled(True)
+        self.season_btn.setEnabled(True)
+        self.predict_btn.setText("Сделать прогноз")
         self.update_logos()
 
+    def simulate_season(self):
+        if self.data is None:
+            return
+        SeasonDialog(self.data, self).exec()
+
+    def on_load_error(self, message):
+        self.loader = None
+        self.busy_bar.hide()
+        self.predict_btn.setText("Данные не загружены")
+        QMessageBox.critical(self, "Ошибка", f"Не удалось загрузить данные или модель: {message}")
+
     def update_logos(self):
         home = self.home_combo.currentText()
         away = self.away_combo.currentText()
 
-        home_logo_path = os.path.join(LOGO_PATH, f"{home}.png")
-        away_logo_path = os.path.join(LOGO_PATH, f"{away}.png")
-
-        if os.path.exists(home_logo_path):
-            pixmap = QPixmap(home_logo_path).scaled(120, 120, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-            self.home_logo.setPixmap(pixmap)
-        else:
-            self.home_logo.setPixmap(QPixmap())
-
-        if os.path.exists(away_logo_path):
-            pixmap = QPixmap(away_logo_path).scaled(120, 120, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-            self.away_logo.setPixmap(pixmap)
-        else:
-            self.away_logo.setPixmap(QPixmap())
+        self.home_logo.setPixmap(logos.get(home, 120))
+        self.away_logo.setPixmap(logos.get(away, 120))
 
     def animate_button(self):
         animation = QPropertyAnimation(self.predict_btn, b"geometry")
@@ -249,6 +522,15 @@ class MatchPredictor(QWidget):
         animation.setEndValue(original_geometry.adjusted(0, 5, 0, 5))
         animation.start()
 
+    def set_busy(self, busy):
+        self.predict_btn.setEnabled(not busy)
+        self.predict_btn.setText("Считаем..." if busy else "Сделать прогноз")
+        self.busy_bar.setVisible(busy)
+        if busy:
+            QApplication.setOverrideCursor(Qt.WaitCursor)
+        else:
+            QApplication.restoreOverrideCursor()
+
     def make_prediction(self):
         # Анимация кнопки при нажатии
         self.animate_button()
@@ -256,36 +538,30 @@ class MatchPredictor(QWidget):
         home = self.home_combo.currentText()
         away = self.away_combo.currentText()
 
-        today = pd.to_datetime(datetime.today().strftime('%Y-%m-%d'))
-
-        match_rows = full_data[
-            (full_data['HomeTeam'] == home) & (full_data['AwayTeam'] == away)
-        ]
-
-        if match_rows.empty:
+        if self.data is None:
+            return
+        if not self.data.has_fixture(home, away):
             QMessageBox.warning(self, "Нет данных", f"Нет истории матчей между {home} и {away}")
             return
 
-        row = match_rows.iloc[-1].copy()
-        row['Date'] = today
-        row['Year'] = today.year
-        row['Month'] = today.month
-        row['Day'] = today.day
-
-        encoded = encoder.transform(pd.DataFrame([[home, away]], columns=['HomeTeam', 'AwayTeam']))
-        row['HomeTeam_encoded'] = encoded['HomeTeam'].values[0]
-        row['AwayTeam_encoded'] = encoded['AwayTeam'].values[0]
-
-        for col in ['FTR', 'HomeTeam', 'AwayTeam', 'Date']:
-            if col in row:
-                row.pop(col)
-
-        X_df = pd.DataFrame([row])
-        X_imputed = imputer.transform(X_df)
-        X_scaled = scaler.transform(X_imputed)
-        X_final = pd.DataFrame(X_scaled, columns=final_features)
-
-        proba = model.predict_proba(X_final)[0]
+        self.set_busy(True)
+        # Ссылку на воркер держим, пока не придёт сигнал
+        self.worker = PredictionWorker(self.data, home, away)
+        self.worker.signals.finished.connect(self.on_prediction)
+        self.worker.signals.error.connect(self.on_prediction_error)
+        self.thread_pool.start(self.worker)
+
+    def on_prediction_error(self, message):
+        self.set_busy(False)
+        self.worker = None
+        QMessageBox.critical(self, "Ошибка", f"Не удалось сделать прогноз: {message}")
+
+    def on_prediction(self, home, away, proba):
+        self.set_busy(False)
+        self.worker = None
+        if proba is None:
+            QMessageBox.warning(self, "Нет данных", f"Нет истории матчей между {home} и {away}")
+            return
 
         # Создаем кастомное сообщение
         msg = QMessageBox(self)
@@ -325,10 +601,10 @@ class MatchPredictor(QWidget):
         msg.setText(result_html)
         
         # Добавляем логотипы в сообщение
-        home_logo_path = os.path.join(LOGO_PATH, f"{home}.png")
-        away_logo_path = os.path.join(LOGO_PATH, f"{away}.png")
+        home_pixmap = logos.get(home, 50)
+        away_pixmap = logos.get(away, 50)
         
-        if os.path.exists(home_logo_path) and os.path.exists(away_logo_path):
+        if not home_pixmap.isNull() and not away_pixmap.isNull():
             msg.setIconPixmap(QPixmap())  # Убираем стандартную иконку
             
             # Создаем layout для кастомного содержимого
@@ -338,8 +614,8 @@ class MatchPredictor(QWidget):
             logo_layout = QHBoxLayout()
             home_logo = QLabel()
             away_logo = QLabel()
-            home_logo.setPixmap(QPixmap(home_logo_path).scaled(50, 50, Qt.KeepAspectRatio, Qt.SmoothTransformation))
-            away_logo.setPixmap(QPixmap(away_logo_path).scaled(50, 50, Qt.KeepAspectRatio, Qt.SmoothTransformation))
+            home_logo.setPixmap(home_pixmap)
+            away_logo.setPixmap(away_pixmap)
             
             logo_layout.addWidget(home_logo, 0, Qt.AlignLeft)
             logo_layout.addSpacerItem(QSpacerItem(40, 0, QSizePolicy.Expanding))
@@ -0,0 +1,300 @@
+import argparse
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+from functools import cached_property
+
+import numpy as np
+
+# ----------------------------
+# Единый пакет модели: манифест (версия схемы, порядок признаков, классы,
+# команды) + массивы NumPy, которые открываются через memory-map.
+# Несколько воркеров читают одни и те же страницы файла вместо того,
+# чтобы каждый распаковывал свои pickle.
+# ----------------------------
+
+BUNDLE_SCHEMA_VERSION = 1
+BUNDLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "bundle")
+MANIFEST_FILE = "manifest.json"
+
+RESULT_MAP = {0: "away_win", 1: "draw", 2: "home_win"}
+TEAM_COLUMNS = {'HomeTeam': 'HomeTeam_encoded', 'AwayTeam': 'AwayTeam_encoded'}
+
+_ARRAYS = ('weights', 'bias', 'fill_values', 'home_encodings', 'away_encodings', 'mean', 'scale')
+# Массивы, которые не меняются при дообучении и переходят в новую версию как есть
+_SHARED = ('fill_values', 'mean', 'scale', 'team_lookup')
+
+
+class ModelBundle:
+    """
+    Скомпилированная логистическая регрессия: кодирование команд — словарь,
+    StandardScaler вложен в коэффициенты, SimpleImputer — вектор значений
+    для пропусков. Массивы загружаются лениво при первом обращении.
+    """
+
+    def __init__(self, path, manifest):
+        self.path = path
+        self.manifest = manifest
+        self.version = manifest.get('model_version')
+        self.feature_names = list(manifest['feature_order'])
+        self.classes = np.asarray(manifest['classes'])
+        self.labels = list(manifest['labels'])
+        self.team_prior = float(manifest['team_prior'])
+
+        self.team_positions = {
+            column: self.feature_names.index(encoded_column)
+            for column, encoded_column in TEAM_COLUMNS.items()
+        }
+        self.value_positions = [
+            (name, i) for i, name in enumerate(self.feature_names)
+            if name not in TEAM_COLUMNS.values()
+        ]
+
+    def _array(self, name):
+        # Пакеты до появления меток сборки хранят массивы как <имя>.npy
+        filename = self.manifest.get('files', {}).get(name, f"{name}.npy")
+        return np.load(os.path.join(self.path, filename), mmap_mode='r')
+
+    def load_arrays(self):
+        """
+        Отображает в память все массивы сразу, чтобы версия не собрала
+        веса и статистики из разных сборок пакета.
+        """
+        for name in ('weights', 'bias', 'fill_values') + (('mean', 'scale') if self.supports_partial_fit else ()):
+            getattr(self, name)
+        self.team_lookup
+        return self
+
+    @cached_property
+    def weights(self):
+        return self._array('weights')
+
+    @cached_property
+    def bias(self):
+        return self._array('bias')
+
+    @cached_property
+    def fill_values(self):
+        return self._array('fill_values')
+
+    @cached_property
+    def mean(self):
+        return self._array('mean')
+
+    @cached_property
+    def scale(self):
+        return self._array('scale')
+
+    @property
+    def supports_partial_fit(self):
+        # В пакетах до появления mean/scale стандартизация доступна только вложенной в веса
+        return 'scale' in self.manifest.get('arrays', ())
+
+    @cached_property
+    def team_lookup(self):
+        return {
+            'HomeTeam': dict(zip(self.manifest['teams']['HomeTeam'], self._array('home_encodings').tolist())),
+            'AwayTeam': dict(zip(self.manifest['teams']['AwayTeam'], self._array('away_encodings').tolist())),
+        }
+
+    def vectorize(self, data: dict) -> np.ndarray:
+        """Вектор признаков в порядке feature_names; пропуски — NaN"""
+        x = np.empty(len(self.feature_names))
+        for name, i in self.value_positions:
+            value = data.get(name)
+            x[i] = np.nan if value is None else float(value)
+        lookup = self.team_lookup
+        for column, i in self.team_positions.items():
+            x[i] = lookup[column].get(data.get(column), self.team_prior)
+        return x
+
+    def vectorize_many(self, items) -> np.ndarray:
+        """
+        Матрица признаков для списка матчей, собранная по колонкам (None -> NaN).
+        Некорректное значение (например, строка) поднимает исключение для всего списка.
+        """
+        X = np.empty((len(items), len(self.feature_names)))
+        for name, i in self.value_positions:
+            X[:, i] = np.array([data.get(name) for data in items], dtype=np.float64)
+        lookup = self.team_lookup
+        for column, i in self.team_positions.items():
+            teams = lookup[column]
+            X[:, i] = [teams.get(data.get(column), self.team_prior) for data in items]
+        return X
+
+    def predict_proba(self, X: np.ndarray, impute=False) -> np.ndarray:
+        if impute:
+            X = np.where(np.isnan(X), self.fill_values, X)
+        logits = X @ self.weights + self.bias
+        logits -= logits.max(axis=1, keepdims=True)
+        np.exp(logits, out=logits)
+        logits /= logits.sum(axis=1, keepdims=True)
+        return logits
+
+    def partial_fit(self, X, y, learning_rate=0.01, alpha=1e-4, version=None):
+        """
+        Шаг SGD по log-loss (как SGDClassifier.partial_fit) на матчах X с исходами y
+        (коды classes). Шаг делается в стандартизованном пространстве, где обучалась
+        модель, и сворачивается обратно в веса. Возвращает новую версию пакета
+        в памяти; исходный пакет не меняется.
+        """
+        if not self.supports_partial_fit:
+            raise ValueError("Пакет модели собран без mean/scale — пересоберите его model_bundle.py")
+
+        X = np.where(np.isnan(X), self.fill_values, X)
+        Z = (X - self.mean) / self.scale
+        # W = Ws / scale, b = bs - W · mean
+        standardized_weights = self.weights * self.scale[:, None]
+        standardized_bias = self.bias + self.mean @ self.weights
+
+        proba = self.predict_proba(X)
+        proba[np.arange(len(y)), np.searchsorted(self.classes, y)] -= 1.0
+        standardized_weights = standardized_weights - learning_rate * (
+            Z.T @ proba / len(y) + alpha * standardized_weights)
+        standardized_bias = standardized_bias - learning_rate * proba.mean(axis=0)
+
+        updates = self.manifest.get('online_updates', 0) + 1
+        base_version = self.manifest.get('base_version', self.version)
+        manifest = dict(self.manifest, online_updates=updates, base_version=base_version,
+                        model_version=version or f"{base_version}-online{updates}",
+                        created=datetime.now().isoformat(timespec='seconds'))
+        updated = ModelBundle(self.path, manifest)
+        updated.weights = np.ascontiguousarray(standardized_weights / self.scale[:, None])
+        updated.bias = standardized_bias - self.mean @ updated.weights
+        for name in _SHARED:
+            setattr(updated, name, getattr(self, name))
+        return updated
+
+
+def build_bundle(path, model, scaler, encoder, feature_names, imputer=None, model_version=None):
+    """Компилирует обученные артефакты в пакет в каталоге path"""
+    import pandas as pd
+
+    # Пакет — это логиты x · W + b, поэтому модель должна быть линейной
+    if not hasattr(model, 'coef_') or not hasattr(model, 'intercept_'):
+        raise ValueError(f"Пакет модели собирается только из линейной модели с coef_/intercept_, "
+                         f"получено: {type(model).__name__}")
+
+    feature_names = list(feature_names)
+    os.makedirs(path, exist_ok=True)
+
+    # Значения CatBoostEncoder для всех известных команд
+    teams = {}
+    encodings = {}
+    for column in TEAM_COLUMNS:
+        teams[column] = [str(team) for team in encoder.mapping[column].index]
+        encodings[column] = encoder.transform(pd.DataFrame({
+            'HomeTeam': teams[column], 'AwayTeam': teams[column],
+        }))[column].to_numpy(dtype=np.float64)
+
+    # (x - mean) / scale · Wᵀ + b  ==  x · (W / scale)ᵀ + (b - W · mean / scale)
+    coef = model.coef_ / scaler.scale_
+    arrays = {
+        'weights': np.ascontiguousarray(coef.T),
+        'bias': model.intercept_ - coef @ scaler.mean_,
+        'fill_values': (np.asarray(imputer.statistics_, dtype=np.float64) if imputer is not None
+                        else np.zeros(len(feature_names))),
+        'home_encodings': encodings['HomeTeam'],
+        'away_encodings': encodings['AwayTeam'],
+        # Для дообучения (partial_fit) в стандартизованном пространстве
+        'mean': np.asarray(scaler.mean_, dtype=np.float64),
+        'scale': np.asarray(scaler.scale_, dtype=np.float64),
+    }
+    # Массивы каждой сборки пишутся в файлы со своей меткой, а публикуются
+    # подменой манифеста: читатель видит либо старый набор целиком, либо новый
+    build = uuid.uuid4().hex[:12]
+    files = {}
+    for name, array in arrays.items():
+        files[name] = f"{name}.{build}.npy"
+        target = os.path.join(path, files[name])
+        with open(target + ".tmp", 'wb') as f:
+            np.save(f, array)
+        os.replace(target + ".tmp", target)
+
+    manifest = {
+        'schema_version': BUNDLE_SCHEMA_VERSION,
+        'model_version': model_version or datetime.now().strftime('%Y%m%d%H%M%S'),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'model': type(model).__name__,
+        'feature_order': feature_names,
+        'classes': [int(c) for c in model.classes_],
+        'labels': [RESULT_MAP.get(int(c), "unknown") for c in model.classes_],
+        'team_prior': float(encoder._mean),
+        'teams': teams,
+        'arrays': list(_ARRAYS),
+        'files': files,
+    }
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    previous = load_bundle(path) if os.path.exists(manifest_path) else None
+    with open(manifest_path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+    # Файлы предыдущей сборки остаются для тех, кто уже прочитал её манифест
+    keep = set(files.values())
+    if previous is not None:
+        keep |= {previous.manifest.get('files', {}).get(name, f"{name}.npy") for name in _ARRAYS}
+    for filename in os.listdir(path):
+        if filename.endswith('.npy') and filename not in keep:
+            try:
+                os.remove(os.path.join(path, filename))
+            except OSError:
+                pass  # Windows не удаляет файл, пока он отображён в память
+    return load_bundle(path)
+
+
+def load_bundle(path=BUNDLE_DIR):
+    """Читает манифест; сами массивы будут отображены в память при первом использовании"""
+    with open(os.path.join(path, MANIFEST_FILE), encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('schema_version') != BUNDLE_SCHEMA_VERSION:
+        raise ValueError(f"Неподдерживаемая версия пакета модели: {manifest.get('schema_version')} "
+                         f"(ожидается {BUNDLE_SCHEMA_VERSION})")
+    return ModelBundle(path, manifest)
+
+
+class LazyBundle:
+    """Пакет, который загружается при первом обращении (потокобезопасно)"""
+
+    def __init__(self, path=BUNDLE_DIR):
+        self.path = path
+        self._bundle = None
+        self._lock = threading.Lock()
+
+    def get(self) -> ModelBundle:
+        if self._bundle is None:
+            with self._lock:
+                if self._bundle is None:
+                    self._bundle = load_bundle(self.path)
+        return self._bundle
+
+
+if __name__ == '__main__':
+    import joblib
+
+    parser = argparse.ArgumentParser(description="Сборка единого пакета модели из pickle-артефактов")
+    parser.add_argument("--models-dir", default="models")
+    parser.add_argument("--output", default=BUNDLE_DIR)
+    parser.add_argument("--version", help="версия модели (по умолчанию — время сборки)")
+    args = parser.parse_args()
+
+    print("🔄 Загружаем артефакты...")
+    # model.pkl пишет train.py; logistic_model.pkl — артефакт из again.ipynb
+    model_path = os.path.join(args.models_dir, 'model.pkl')
+    if not os.path.exists(model_path):
+        model_path = os.path.join(args.models_dir, 'logistic_model.pkl')
+    model = joblib.load(model_path)
+    scaler = joblib.load(os.path.join(args.models_dir, 'scaler.pkl'))
+    encoder = joblib.load(os.path.join(args.models_dir, 'encoder.pkl'))
+    imputer = joblib.load(os.path.join(args.models_dir, 'imputer.pkl'))
+    feature_names = joblib.load(os.path.join(args.models_dir, 'feature_names.pkl'))
+
+    final_feature_order = os.path.join(args.models_dir, 'final_feature_order.pkl')
+    if os.path.exists(final_feature_order) and joblib.load(final_feature_order) != feature_names:
+        raise ValueError("feature_names.pkl и final_feature_order.pkl задают разный порядок признаков")
+
+    bundle = build_bundle(args.output, model, scaler, encoder, feature_names, imputer, args.version)
+    print(f"\n💾 Пакет модели сохранён: {args.output} (версия {bundle.version}, "
+          f"{len(bundle.feature_names)} признаков)")
@@ -0,0 +1,284 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import runpy
+import shutil
+import sys
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# ----------------------------
+# Конвейер: ingest → filter → features → (publish, train) → export.
+# У каждого этапа объявлены входы, выходы и параметры; результат этапа
+# привязан к хэшу их содержимого, поэтому неизменившиеся этапы пропускаются.
+# Независимые этапы выполняются параллельно, каждый — в отдельном процессе
+# (для замера пикового потребления памяти).
+# ----------------------------
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STATE_FILE = os.path.join('.pipeline', 'state.json')
+LOG_DIR = os.path.join('.pipeline', 'logs')
+
+
+def path_hash(path):
+    """sha256 файла или каталога (по относительным путям и содержимому файлов); None — нет пути"""
+    digest = hashlib.sha256()
+    if os.path.isdir(path):
+        for directory, _, files in sorted(os.walk(path)):
+            for name in sorted(files):
+                full = os.path.join(directory, name)
+                digest.update(os.path.relpath(full, path).encode('utf-8'))
+                digest.update(path_hash(full).encode('ascii'))
+        return digest.hexdigest()
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def run_script(script, argv):
+    """Запуск скрипта конвейера как __main__ с заданными аргументами"""
+    sys.argv = [script] + list(argv)
+    # Как при запуске «python script.py»: соседние модули импортируются из каталога скрипта
+    sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+    runpy.run_path(script, run_name='__main__')
+
+
+def copy_files(pairs):
+    for source, target in pairs:
+        os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+        shutil.copy2(source, target)
+        print(f"📁 {source} → {target}")
+
+
+class Stage:
+    """
+    Этап конвейера. target(*args) выполняется в отдельном процессе;
+    inputs/outputs — файлы или каталоги, code — исходники, от которых зависит результат.
+    """
+
+    def __init__(self, name, target, args=(), inputs=(), outputs=(), deps=(), code=()):
+        self.name = name
+        self.target = target
+        self.args = tuple(args)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.deps = list(deps)
+        self.code = list(code)
+
+    def key(self):
+        payload = {
+            'name': self.name,
+            'target': self.target.__name__,
+            'args': self.args,
+            'inputs': {path: path_hash(path) for path in self.inputs},
+            'code': {path: path_hash(path) for path in self.code},
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def _stage_process(stage, log_path, conn):
+    # Вывод этапа — в его лог, чтобы параллельные этапы не перемешивались
+    with open(log_path, 'w', encoding='utf-8') as log:
+        sys.stdout = sys.stderr = log
+        started = time.perf_counter()
+        error = None
+        try:
+            stage.target(*stage.args)
+        except SystemExit as e:
+            if e.code not in (0, None):
+                error = f"код выхода {e.code}"
+        except BaseException:
+            error = traceback.format_exc()
+            log.write(error)
+        log.flush()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource is not None else None
+    conn.send({'seconds': time.perf_counter() - started, 'peak_mb': peak, 'error': error})
+    conn.close()
+
+
+def execute(stage, log_dir=LOG_DIR):
+    """Выполняет этап в новом процессе; возвращает время, пиковую память (МБ) и ошибку"""
+    os.makedirs(log_dir, exist_ok=True)
+    log_path = os.path.join(log_dir, f"{stage.name}.log")
+    context = multiprocessing.get_context('spawn')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_stage_process, args=(stage, log_path, sender), name=f"stage-{stage.name}")
+    started = time.perf_counter()
+    process.start()
+    sender.close()
+    try:
+        report = receiver.recv()
+    except EOFError:
+        report = {'peak_mb': None, 'error': f"процесс этапа завершился аварийно (код {process.exitcode})"}
+    process.join()
+    report['seconds'] = time.perf_counter() - started
+    report['log'] = log_path
+    return report
+
+
+def load_state(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(path, state):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def is_fresh(stage, key, state):
+    """Ключ совпадает и выходы на месте и не изменены с прошлого запуска"""
+    entry = state.get(stage.name)
+    if not entry or entry['key'] != key:
+        return False
+    return all(path_hash(path) == digest for path, digest in entry['outputs'].items())
+
+
+def run_pipeline(stages, jobs=None, force=(), state_path=STATE_FILE, log_dir=LOG_DIR, log=print):
+    """
+    Выполняет этапы в порядке зависимостей, независимые — параллельно.
+    Возвращает {этап: отчёт}; status — ran, cached, failed или blocked.
+    """
+    by_name = {stage.name: stage for stage in stages}
+    unknown = [dep for stage in stages for dep in stage.deps if dep not in by_name]
+    if unknown:
+        raise ValueError(f"Неизвестные зависимости этапов: {', '.join(sorted(set(unknown)))}")
+
+    state = load_state(state_path)
+    force = set(force)
+    reports = {}
+    pending = list(stages)
+    running = {}
+
+    def start(stage):
+        # Этап после перезапущенного предка всё равно проверяется по хэшам входов
+        key = stage.key()
+        if stage.name not in force and is_fresh(stage, key, state):
+            return dict(status='cached', seconds=0.0, peak_mb=None, key=key)
+        report = execute(stage, log_dir)
+        report['status'] = 'failed' if report['error'] else 'ran'
+        report['key'] = key
+        return report
+
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+        while pending or running:
+            for stage in list(pending):
+                statuses = [reports.get(dep, {}).get('status') for dep in stage.deps]
+                if any(status in ('failed', 'blocked') for status in statuses):
+                    pending.remove(stage)
+                    reports[stage.name] = dict(status='blocked', seconds=0.0, peak_mb=None)
+                    log(f"⛔ {stage.name}: пропущен — ошибка в предыдущем этапе")
+                elif all(status in ('ran', 'cached') for status in statuses):
+                    pending.remove(stage)
+                    running[pool.submit(start, stage)] = stage
+            if not running:
+                if pending:
+                    raise ValueError(f"Циклические зависимости этапов: {', '.join(s.name for s in pending)}")
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage = running.pop(future)
+                report = reports[stage.name] = future.result()
+                if report['status'] == 'ran':
+                    state[stage.name] = {
+                        'key': report['key'],
+                        'outputs': {path: path_hash(path) for path in stage.outputs},
+                    }
+                    save_state(state_path, state)
+                log(format_report(stage.name, report))
+    return reports
+
+
+def format_report(name, report):
+    icon = {'ran': '✅', 'cached': '⏭', 'failed': '❌', 'blocked': '⛔'}[report['status']]
+    if report['status'] == 'cached':
+        return f"{icon} {name}: без изменений"
+    peak = f", пик памяти {report['peak_mb']:.0f} МБ" if report.get('peak_mb') else ""
+    line = f"{icon} {name}: {report['seconds']:.2f} с{peak}"
+    if report['status'] == 'failed':
+        line += f" — ошибка, см. {report['log']}"
+    return line
+
+
+def build_stages(sources=(), fmt='csv', chunk_size=None, models_dir='models', data_dir='data'):
+    """Стандартный конвейер проекта"""
+    from ingest import find_season_files
+
+    # Без этапа ingest конвейер начинается с готового CSV из репозитория
+    combined = f'combined_epl_results.{fmt}' if sources else 'combined_epl_results.csv'
+    filtered = f'processed_with_b365_data.{fmt}'
+    features = f'processed_with_all_features.{fmt}'
+    published = os.path.join(data_dir, features)
+    artifacts = [os.path.join(models_dir, name) for name in (
+        'model.pkl', 'scaler.pkl', 'encoder.pkl', 'imputer.pkl', 'feature_names.pkl')]
+
+    stages = []
+    if sources:
+        stages.append(Stage(
+            'ingest', run_script, ('ingest.py', [*sources, '--output', 'combined_epl_results', '--format', fmt]),
+            inputs=find_season_files(sources), outputs=[combined], code=['ingest.py', 'storage.py']))
+
+    filter_args = ['--input', combined, '--format', fmt] + (['--chunk-size', str(chunk_size)] if chunk_size else [])
+    stages += [
+        Stage('filter', run_script, ('filter.py', filter_args),
+              inputs=[combined], outputs=[filtered], deps=['ingest'] if sources else [],
+              code=['filter.py', 'storage.py']),
+        Stage('features', run_script, ('features.py', ['--format', fmt]),
+              inputs=[filtered], outputs=[features], deps=['filter'],
+              code=['features.py', 'feature_engine.py', 'team_state.py', 'elo.py', 'storage.py']),
+        # Копия для API и приложения; от обучения не зависит
+        Stage('publish', copy_files, ([(features, published)],),
+              inputs=[features], outputs=[published], deps=['features']),
+        Stage('train', run_script, ('train.py', ['--input', features, '--output-dir', models_dir]),
+              inputs=[features], outputs=artifacts, deps=['features'], code=['train.py', 'storage.py']),
+        Stage('export', run_script, ('model_bundle.py', ['--models-dir', models_dir,
+                                                         '--output', os.path.join(models_dir, 'bundle')]),
+              inputs=artifacts, outputs=[os.path.join(models_dir, 'bundle')], deps=['train'],
+              code=['model_bundle.py']),
+    ]
+    return stages
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Запуск конвейера с кэшированием этапов")
+    parser.add_argument("--sources", nargs='*', default=[], help="каталоги с сезонными CSV (этап ingest)")
+    parser.add_argument("--format", choices=('parquet', 'csv'), default='csv', help="формат промежуточных таблиц")
+    parser.add_argument("--chunk-size", type=int, help="потоковый режим filter.py")
+    parser.add_argument("--jobs", type=int, help="сколько этапов выполнять одновременно")
+    parser.add_argument("--force", nargs='*', default=[], help="перезапустить этапы независимо от кэша")
+    parser.add_argument("--only", nargs='*', help="выполнить только эти этапы (без зависимостей)")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    stages = build_stages(args.sources, args.format, args.chunk_size)
+    if args.only:
+        stages = [stage for stage in stages if stage.name in args.only]
+        for stage in stages:
+            stage.deps = [dep for dep in stage.deps if dep in args.only]
+
+    print(f"🔄 Этапы: {' → '.join(stage.name for stage in stages)}")
+    started = time.perf_counter()
+    reports = run_pipeline(stages, args.jobs, args.force)
+    elapsed = time.perf_counter() - started
+
+    ran = sum(report['status'] == 'ran' for report in reports.values())
+    cached = sum(report['status'] == 'cached' for report in reports.values())
+    failed = sum(report['status'] in ('failed', 'blocked') for report in reports.values())
+    print(f"\n✅ Выполнено: {ran}, из кэша: {cached}, с ошибками: {failed} ({elapsed:.2f} с)")
+    sys.exit(1 if failed else 0)
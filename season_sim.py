@@ -0,0 +1,185 @@
+import argparse
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+# ----------------------------
+# Монте-Карло симуляция сезона: вероятности H/D/A всех оставшихся матчей
+# считаются одним батчем, затем сотни тысяч сезонов разыгрываются
+# операциями над массивами NumPy (пачками — для прогресса и отмены).
+# ----------------------------
+
+DATA_PATH = 'data/processed_with_all_features'
+N_SIMULATIONS = 100_000
+CHUNK_SIZE = 10_000
+RELEGATION_PLACES = 3
+TOP_PLACES = 4
+
+POINTS = {'H': (3, 0), 'D': (1, 1), 'A': (0, 3)}
+
+
+def season_start_year(dates):
+    """Сезон АПЛ начинается летом: матчи января–июня относятся к прошлому году"""
+    dates = pd.to_datetime(dates)
+    return np.where(dates.dt.month >= 7, dates.dt.year, dates.dt.year - 1)
+
+
+class SeasonFixtures:
+    """Текущая таблица и оставшиеся матчи последнего сезона в данных"""
+
+    def __init__(self, df, full_season=False):
+        season = season_start_year(df['Date'])
+        self.season = int(season.max())
+        played = df[season == self.season]
+
+        self.teams = sorted(set(played['HomeTeam']) | set(played['AwayTeam']))
+        team_index = {team: i for i, team in enumerate(self.teams)}
+
+        # Сезон доигран (или явно запрошен новый) — разыгрываем все N·(N-1) матчей с нуля
+        self.full_season = full_season or len(played) >= len(self.teams) * (len(self.teams) - 1)
+        self.points = np.zeros(len(self.teams), dtype=np.int64)
+        done = set()
+        if not self.full_season:
+            for home, away, result in zip(played['HomeTeam'], played['AwayTeam'], played['FTR']):
+                home_points, away_points = POINTS[result]
+                self.points[team_index[home]] += home_points
+                self.points[team_index[away]] += away_points
+                done.add((home, away))
+
+        self.fixtures = [(home, away) for home in self.teams for away in self.teams
+                         if home != away and (home, away) not in done]
+        self.home_index = np.array([team_index[home] for home, _ in self.fixtures], dtype=np.int64)
+        self.away_index = np.array([team_index[away] for _, away in self.fixtures], dtype=np.int64)
+
+
+def fixture_probabilities(model, hydrator, fixtures, match_date=None):
+    """Матрица (матчи × [H, D, A]) одним вызовом модели"""
+    match_date = match_date or date.today()
+    if not fixtures:
+        return np.empty((0, 3))
+    X = np.stack([
+        model.vectorize(hydrator.hydrate({'HomeTeam': home, 'AwayTeam': away, 'Date': match_date}))
+        for home, away in fixtures
+    ])
+    proba = model.predict_proba(X, impute=True)
+    columns = [model.labels.index(label) for label in ('home_win', 'draw', 'away_win')]
+    return proba[:, columns]
+
+
+class SeasonSimulation:
+    """Итоги симуляции: распределение мест и очков по командам"""
+
+    def __init__(self, teams, n_simulations, position_counts, points_counts):
+        self.teams = list(teams)
+        self.n_simulations = n_simulations
+        self.position_probs = position_counts / n_simulations   # команды × места
+        self.points_probs = points_counts / n_simulations       # команды × очки
+
+    @property
+    def mean_points(self):
+        return self.points_probs @ np.arange(self.points_probs.shape[1])
+
+    def points_quantile(self, q):
+        cumulative = np.cumsum(self.points_probs, axis=1)
+        return (cumulative < q).sum(axis=1)
+
+    def to_frame(self, relegation_places=RELEGATION_PLACES, top_places=TOP_PLACES):
+        frame = pd.DataFrame({
+            'Team': self.teams,
+            'MeanPoints': self.mean_points,
+            'Points5%': self.points_quantile(0.05),
+            'Points95%': self.points_quantile(0.95),
+            'Title': self.position_probs[:, 0],
+            f'Top{top_places}': self.position_probs[:, :top_places].sum(axis=1),
+            'Relegation': self.position_probs[:, -relegation_places:].sum(axis=1),
+            'MostLikelyPosition': self.position_probs.argmax(axis=1) + 1,
+        })
+        return frame.sort_values('MeanPoints', ascending=False).reset_index(drop=True)
+
+
+def simulate_season(fixtures, probs, n_simulations=N_SIMULATIONS, chunk_size=CHUNK_SIZE,
+                    seed=None, progress=None, cancelled=None):
+    """
+    Разыгрывает n_simulations сезонов. fixtures — SeasonFixtures,
+    probs — (матчи × [H, D, A]) в порядке fixtures.fixtures.
+    Очки — сумма по матчам через матрицы инцидентности; равенство очков
+    решается жребием (в обработанных данных нет забитых голов для разницы мячей).
+    progress(done, total) вызывается после каждой пачки, cancelled() — проверка отмены.
+    Возвращает SeasonSimulation или None, если симуляция отменена.
+    """
+    rng = np.random.default_rng(seed)
+    base_points = fixtures.points
+    n_teams = len(fixtures.teams)
+    n_matches = len(fixtures.fixtures)
+
+    home_incidence = np.zeros((n_matches, n_teams), dtype=np.float32)
+    away_incidence = np.zeros((n_matches, n_teams), dtype=np.float32)
+    home_incidence[np.arange(n_matches), fixtures.home_index] = 1
+    away_incidence[np.arange(n_matches), fixtures.away_index] = 1
+    home_win = np.asarray(probs[:, 0], dtype=np.float64)
+    no_away_win = home_win + probs[:, 1]
+
+    max_points = int(base_points.max()) + 3 * (n_teams - 1) * 2 + 1
+    position_counts = np.zeros(n_teams * n_teams, dtype=np.int64)
+    points_counts = np.zeros(n_teams * max_points, dtype=np.int64)
+    team_offsets = np.arange(n_teams)
+
+    done = 0
+    while done < n_simulations:
+        if cancelled is not None and cancelled():
+            return None
+        size = min(chunk_size, n_simulations - done)
+
+        u = rng.random((size, n_matches))
+        is_home_win = u < home_win
+        is_draw = ~is_home_win & (u < no_away_win)
+        is_away_win = ~is_home_win & ~is_draw
+        home_points = (3 * is_home_win + is_draw).astype(np.float32)
+        away_points = (3 * is_away_win + is_draw).astype(np.float32)
+        points = base_points + (home_points @ home_incidence + away_points @ away_incidence).astype(np.int64)
+
+        # Место = ранг по убыванию очков; дробная случайная добавка разбивает равенство
+        order = np.argsort(-(points + rng.random((size, n_teams))), axis=1)
+        positions = np.empty_like(order)
+        np.put_along_axis(positions, order, team_offsets, axis=1)
+
+        position_counts += np.bincount((team_offsets * n_teams + positions).ravel(),
+                                       minlength=n_teams * n_teams)
+        points_counts += np.bincount((team_offsets * max_points + points).ravel(),
+                                     minlength=n_teams * max_points)
+        done += size
+        if progress is not None:
+            progress(done, n_simulations)
+
+    return SeasonSimulation(fixtures.teams, n_simulations,
+                            position_counts.reshape(n_teams, n_teams),
+                            points_counts.reshape(n_teams, max_points))
+
+
+if __name__ == '__main__':
+    from app.hydration import COLUMNS, FeatureHydrator
+    from model_bundle import load_bundle
+    from storage import read_table
+
+    parser = argparse.ArgumentParser(description="Монте-Карло симуляция оставшейся части сезона")
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--simulations", type=int, default=N_SIMULATIONS)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--full-season", action="store_true", help="разыграть весь сезон с нуля")
+    args = parser.parse_args()
+
+    print("🔄 Загружаем данные и модель...")
+    df = read_table(args.data, columns=COLUMNS)
+    fixtures = SeasonFixtures(df, full_season=args.full_season)
+    probs = fixture_probabilities(load_bundle(), FeatureHydrator(df), fixtures.fixtures)
+    print(f"📅 Сезон {fixtures.season}/{fixtures.season + 1}: осталось матчей — {len(fixtures.fixtures)}")
+
+    started = time.perf_counter()
+    result = simulate_season(fixtures, probs, args.simulations, seed=args.seed)
+    elapsed = time.perf_counter() - started
+
+    with pd.option_context('display.width', 200, 'display.float_format', '{:.3f}'.format):
+        print(result.to_frame().to_string())
+    print(f"\n⏱ {args.simulations} симуляций за {elapsed:.2f} с")
@@ -0,0 +1,178 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401 — движок pandas для Parquet
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+# ----------------------------
+# Колоночное хранение промежуточных датасетов: Parquet с явными типами
+# (команды — category, статистика — float32, даты — datetime64).
+# Этапы читают только нужные колонки и не разбирают даты заново.
+# CSV остаётся как формат экспорта и как запасной вариант без pyarrow.
+# ----------------------------
+
+FORMATS = ('parquet', 'csv')
+DEFAULT_FORMAT = 'parquet' if PARQUET_AVAILABLE else 'csv'
+
+DATE_COLUMNS = ['Date']
+CATEGORY_COLUMNS = ['Div', 'HomeTeam', 'AwayTeam', 'FTR', 'HTR']
+# Счётная статистика матча: целые значения (с пропусками) без потерь помещаются во float32
+STAT_COLUMNS = [
+    'FTHG', 'FTAG', 'HTHG', 'HTAG', 'HS', 'AS', 'HST', 'AST',
+    'HF', 'AF', 'HC', 'AC', 'HY', 'AY', 'HR', 'AR',
+]
+# Коэффициенты, фичи и Elo остаются float64 — от них зависят предсказания модели
+
+
+def apply_schema(df):
+    """Приводит известные колонки к типам хранения (на месте) и возвращает df"""
+    for column in DATE_COLUMNS:
+        if column in df and not pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = pd.to_datetime(df[column], errors='coerce')
+    for column in CATEGORY_COLUMNS:
+        if column in df and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype('category')
+    for column in STAT_COLUMNS:
+        if column in df and df[column].dtype != np.float32:
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype(np.float32)
+    return df
+
+
+def _csv_frame(df):
+    # В CSV целочисленная статистика пишется без «.0», как в исходных файлах
+    df = df.copy()
+    for column in STAT_COLUMNS:
+        if column in df:
+            values = df[column].dropna()
+            if (values == np.round(values)).all():
+                df[column] = df[column].astype('Int64')
+    return df
+
+
+def table_path(path, fmt):
+    """Путь к файлу таблицы в формате fmt (расширение заменяется)"""
+    return os.path.splitext(path)[0] + '.' + fmt
+
+
+def find_table(path):
+    """
+    Существующий файл таблицы: из копий .parquet и .csv берётся более свежая
+    (Parquet — только если установлен pyarrow). None, если файла нет.
+    """
+    candidates = [table_path(path, 'csv')]
+    if PARQUET_AVAILABLE:
+        candidates.insert(0, table_path(path, 'parquet'))
+    existing = [candidate for candidate in candidates if os.path.exists(candidate)]
+    if not existing:
+        return None
+    return max(existing, key=os.path.getmtime)
+
+
+def read_table(path, columns=None):
+    """Читает таблицу (Parquet или CSV) с типами из схемы; columns — только нужные колонки"""
+    resolved = find_table(path)
+    if resolved is None:
+        raise FileNotFoundError(f"Таблица не найдена: {table_path(path, 'parquet')} / {table_path(path, 'csv')}")
+
+    if resolved.endswith('.parquet'):
+        df = pd.read_parquet(resolved, columns=columns)
+    else:
+        df = pd.read_csv(resolved, usecols=columns, float_precision='round_trip')
+    return apply_schema(df)
+
+
+def write_table(df, path, fmt=DEFAULT_FORMAT, csv_export=False, date_format=None):
+    """
+    Сохраняет таблицу в формате fmt (и дополнительно в CSV); возвращает пути файлов.
+    date_format — формат дат в CSV (по умолчанию ISO).
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Неизвестный формат таблицы: {fmt} (ожидается один из {', '.join(FORMATS)})")
+    if fmt == 'parquet' and not PARQUET_AVAILABLE:
+        raise ImportError("Для формата parquet нужен пакет pyarrow")
+
+    df = apply_schema(df.copy())
+    written = []
+    # CSV пишется первым: из двух копий find_table выберет более свежий Parquet
+    if fmt == 'csv' or csv_export:
+        target = table_path(path, 'csv')
+        _csv_frame(df).to_csv(target, index=False, date_format=date_format)
+        written.append(target)
+    if fmt == 'parquet':
+        target = table_path(path, 'parquet')
+        df.to_parquet(target, index=False)
+        written.append(target)
+    return written
+
+
+def append_table(df, path):
+    """Дописывает строки в существующую таблицу: CSV — в конец файла, Parquet — перезаписью"""
+    resolved = find_table(path)
+    if resolved is None:
+        raise FileNotFoundError(f"Таблица не найдена: {path}")
+
+    df = apply_schema(df.copy())
+    if resolved.endswith('.csv'):
+        _csv_frame(df).to_csv(resolved, mode='a', header=False, index=False)
+        return [resolved]
+    return write_table(pd.concat([read_table(resolved), df], ignore_index=True), resolved, 'parquet')
+
+
+class TableWriter:
+    """
+    Построчная (по чанкам) запись таблицы: CSV дописывается в конец файла,
+    Parquet — группами строк через pyarrow. Память ограничена размером чанка.
+    """
+
+    def __init__(self, path, fmt=DEFAULT_FORMAT, date_format=None):
+        if fmt not in FORMATS:
+            raise ValueError(f"Неизвестный формат таблицы: {fmt} (ожидается один из {', '.join(FORMATS)})")
+        if fmt == 'parquet' and not PARQUET_AVAILABLE:
+            raise ImportError("Для формата parquet нужен пакет pyarrow")
+        self.path = table_path(path, fmt)
+        self.fmt = fmt
+        self.date_format = date_format
+        self.rows = 0
+        self._started = False
+        self._writer = None
+        self._schema = None
+
+    def write(self, df):
+        df = apply_schema(df.copy())
+        if self.fmt == 'csv':
+            _csv_frame(df).to_csv(self.path, mode='a' if self._started else 'w', header=not self._started,
+                                  index=False, date_format=self.date_format)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            if self._writer is None:
+                # Словари категорий различаются между чанками — фиксируем тип индексов
+                schema = pa.Schema.from_pandas(df, preserve_index=False)
+                for i, field in enumerate(schema):
+                    if pa.types.is_dictionary(field.type):
+                        value_type = field.type.value_type
+                        if pa.types.is_null(value_type):
+                            value_type = pa.large_string()
+                        schema = schema.set(i, field.with_type(pa.dictionary(pa.int32(), value_type)))
+                self._schema = schema
+                self._writer = pq.ParquetWriter(self.path, schema)
+            self._writer.write_table(pa.Table.from_pandas(df, schema=self._schema, preserve_index=False))
+        self._started = True
+        self.rows += len(df)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,279 @@
+import gzip
+import json
+from collections import deque
+
+import pandas as pd
+
+from elo import INITIAL_ELO, K, update_elo
+from feature_engine import FEATURE_COLUMNS, FORM_WINDOW, H2H_WINDOW
+
+# ----------------------------
+# Потоковый движок фичей: состояние каждой команды обновляется за O(1)
+# на матч, поэтому live-лента результатов не требует переигрывать историю.
+# ----------------------------
+
+SNAPSHOT_VERSION = 1
+
+
+class TeamState:
+    """Состояние команды: кольцевой буфер последних матчей и накопленные суммы"""
+
+    __slots__ = (
+        'window', 'elo', '_scored', '_conceded', '_wins', '_head', '_size',
+        'form_scored', 'form_conceded', 'form_wins',
+        'matches_played', 'total_scored', 'total_conceded',
+    )
+
+    def __init__(self, window=FORM_WINDOW, elo=INITIAL_ELO):
+        self.window = window
+        self.elo = elo
+
+        # Кольцевой буфер фиксированного размера
+        self._scored = [0.0] * window
+        self._conceded = [0.0] * window
+        self._wins = [0.0] * window
+        self._head = 0
+        self._size = 0
+
+        # Суммы по окну формы
+        self.form_scored = 0.0
+        self.form_conceded = 0.0
+        self.form_wins = 0.0
+
+        # Суммы по всем матчам
+        self.matches_played = 0
+        self.total_scored = 0.0
+        self.total_conceded = 0.0
+
+    def push(self, scored, conceded, win):
+        """Добавляет результат матча, вытесняя самый старый из окна"""
+        if self._size == self.window:
+            self.form_scored -= self._scored[self._head]
+            self.form_conceded -= self._conceded[self._head]
+            self.form_wins -= self._wins[self._head]
+        else:
+            self._size += 1
+
+        self._scored[self._head] = scored
+        self._conceded[self._head] = conceded
+        self._wins[self._head] = win
+        self._head = (self._head + 1) % self.window
+
+        self.form_scored += scored
+        self.form_conceded += conceded
+        self.form_wins += win
+
+        self.matches_played += 1
+        self.total_scored += scored
+        self.total_conceded += conceded
+
+    def form(self):
+        """Средние забитые / пропущенные и доля побед за последние матчи"""
+        if not self._size:
+            return 0, 0, 0
+        return (self.form_scored / self._size,
+                self.form_conceded / self._size,
+                self.form_wins / self._size)
+
+    def recent(self):
+        """Матчи из окна в хронологическом порядке: (забито, пропущено, победа)"""
+        start = (self._head - self._size) % self.window
+        idx = [(start + i) % self.window for i in range(self._size)]
+        return [(self._scored[i], self._conceded[i], self._wins[i]) for i in idx]
+
+    def global_averages(self):
+        """Средние забитые / пропущенные по всем матчам"""
+        if not self.matches_played:
+            return 0, 0
+        return (self.total_scored / self.matches_played,
+                self.total_conceded / self.matches_played)
+
+
+class FeatureState:
+    """Состояние всей лиги: команды, личные встречи и Elo"""
+
+    def __init__(self, form_window=FORM_WINDOW, h2h_window=H2H_WINDOW,
+                 initial_elo=INITIAL_ELO, k=K):
+        self.form_window = form_window
+        self.h2h_window = h2h_window
+        self.initial_elo = initial_elo
+        self.k = k
+
+        self.teams = {}
+        # (команда, соперник) -> последние встречи глазами команды: (забито, победа)
+        self.head_to_head = {}
+        self.last_date = None
+
+    @classmethod
+    def from_history(cls, df, elo_ratings, **params):
+        """
+        Собирает итоговое состояние по уже обработанным матчам df
+        (отсортированным по дате) без поматчевого прогона.
+        """
+        state = cls(**params)
+        n = len(df)
+
+        home_win = (df['FTR'] == 'H').to_numpy(dtype=float)
+        away_win = (df['FTR'] == 'A').to_numpy(dtype=float)
+        long = pd.DataFrame({
+            'match': list(range(n)) * 2,
+            'team': list(df['HomeTeam']) + list(df['AwayTeam']),
+            'opponent': list(df['AwayTeam']) + list(df['HomeTeam']),
+            'scored': list(df['HST'].astype(float)) + list(df['AST'].astype(float)),
+            'conceded': list(df['AST'].astype(float)) + list(df['HST'].astype(float)),
+            'win': list(home_win) + list(away_win),
+        }).sort_values('match', kind='stable')
+
+        totals = long.groupby('team', sort=False)[['scored', 'conceded']].agg(['sum', 'count'])
+        for team, recent in long.groupby('team', sort=False).tail(state.form_window).groupby('team', sort=False):
+            team_state = state.team(team)
+            for scored, conceded, win in zip(recent['scored'], recent['conceded'], recent['win']):
+                team_state.push(scored, conceded, win)
+            team_state.matches_played = int(totals.loc[team, ('scored', 'count')])
+            team_state.total_scored = float(totals.loc[team, ('scored', 'sum')])
+            team_state.total_conceded = float(totals.loc[team, ('conceded', 'sum')])
+            team_state.elo = elo_ratings.get(team, state.initial_elo)
+
+        h2h = long.groupby(['team', 'opponent'], sort=False).tail(state.h2h_window)
+        for (team, opponent), meetings in h2h.groupby(['team', 'opponent'], sort=False):
+            state.head_to_head[(team, opponent)] = deque(
+                zip(meetings['scored'], meetings['win']), maxlen=state.h2h_window)
+
+        if n:
+            state.last_date = df['Date'].max()
+        return state
+
+    def team(self, name):
+        if name not in self.teams:
+            self.teams[name] = TeamState(self.form_window, self.initial_elo)
+        return self.teams[name]
+
+    def features(self, home_team, away_team):
+        """Фичи матча по текущему состоянию (до того, как он сыгран)"""
+        empty = TeamState(self.form_window, self.initial_elo)
+        home = self.teams.get(home_team, empty)
+        away = self.teams.get(away_team, empty)
+
+        home_form = home.form()
+        away_form = away.form()
+        home_global = home.global_averages()
+        away_global = away.global_averages()
+
+        # Как и в features.py: последние записи из «хозяева против гостей»
+        # + «гости против хозяев»
+        h2h_home = list(self.head_to_head.get((home_team, away_team), ()))
+        h2h_away = list(self.head_to_head.get((away_team, home_team), ()))
+        h2h = ([(True, m) for m in h2h_home] + [(False, m) for m in h2h_away])[-self.h2h_window:]
+
+        if h2h:
+            h2h_wr_h = sum(win for is_home, (_, win) in h2h if is_home) / len(h2h)
+            h2h_wr_a = sum(win for is_home, (_, win) in h2h if not is_home) / len(h2h)
+            h2h_goals_h = sum(scored for is_home, (scored, _) in h2h if is_home) / len(h2h)
+            h2h_goals_a = sum(scored for is_home, (scored, _) in h2h if not is_home) / len(h2h)
+        else:
+            h2h_wr_h = h2h_wr_a = h2h_goals_h = h2h_goals_a = 0
+
+        values = [
+            *home_form, *away_form,
+            h2h_wr_h, h2h_wr_a, h2h_goals_h, h2h_goals_a,
+            *home_global, *away_global,
+            home.elo, away.elo,
+        ]
+        return dict(zip(FEATURE_COLUMNS, values))
+
+    def update(self, home_team, away_team, home_shots, away_shots, result, date=None):
+        """Учитывает результат матча: форма, средние, личные встречи и Elo"""
+        home = self.team(home_team)
+        away = self.team(away_team)
+
+        home.elo, away.elo = update_elo(home.elo, away.elo, result, self.k)
+
+        home_win = 1.0 if result == 'H' else 0.0
+        away_win = 1.0 if result == 'A' else 0.0
+        home.push(home_shots, away_shots, home_win)
+        away.push(away_shots, home_shots, away_win)
+
+        for key, record in (((home_team, away_team), (home_shots, home_win)),
+                            ((away_team, home_team), (away_shots, away_win))):
+            if key not in self.head_to_head:
+                self.head_to_head[key] = deque(maxlen=self.h2h_window)
+            self.head_to_head[key].append(record)
+
+        if date is not None:
+            self.last_date = date
+
+    def feed(self, home_team, away_team, home_shots, away_shots, result, date=None):
+        """Возвращает фичи матча до его начала и сразу учитывает результат"""
+        features = self.features(home_team, away_team)
+        self.update(home_team, away_team, home_shots, away_shots, result, date)
+        return features
+
+    def replay(self, df):
+        """Прогоняет матчи df (отсортированные по дате) и возвращает их фичи"""
+        rows = []
+        for home_team, away_team, home_shots, away_shots, result, date in zip(
+                df['HomeTeam'], df['AwayTeam'], df['HST'], df['AST'], df['FTR'], df['Date']):
+            rows.append(self.feed(home_team, away_team, float(home_shots), float(away_shots), result, date))
+        return rows
+
+
+# ----------------------------
+# Снимок состояния для инкрементальной сборки фичей
+# ----------------------------
+
+def save_snapshot(state, path):
+    """Сохраняет состояние в сжатый JSON с версией формата"""
+    snapshot = {
+        'version': SNAPSHOT_VERSION,
+        'last_date': state.last_date.isoformat() if state.last_date is not None else None,
+        'params': {
+            'form_window': state.form_window,
+            'h2h_window': state.h2h_window,
+            'initial_elo': state.initial_elo,
+            'k': state.k,
+        },
+        'teams': {
+            name: {
+                'elo': team.elo,
+                'recent': team.recent(),
+                'matches_played': team.matches_played,
+                'total_scored': team.total_scored,
+                'total_conceded': team.total_conceded,
+            }
+            for name, team in state.teams.items()
+        },
+        'head_to_head': [
+            [team, opponent, list(meetings)]
+            for (team, opponent), meetings in state.head_to_head.items()
+        ],
+    }
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        json.dump(snapshot, f, ensure_ascii=False, separators=(',', ':'))
+
+
+def load_snapshot(path):
+    """Восстанавливает состояние из снимка, сохранённого save_snapshot"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        snapshot = json.load(f)
+
+    if snapshot.get('version') != SNAPSHOT_VERSION:
+        raise ValueError(f"Неподдерживаемая версия снимка: {snapshot.get('version')} "
+                         f"(ожидается {SNAPSHOT_VERSION})")
+
+    state = FeatureState(**snapshot['params'])
+    for name, data in snapshot['teams'].items():
+        team = state.team(name)
+        for scored, conceded, win in data['recent']:
+            team.push(scored, conceded, win)
+        team.elo = data['elo']
+        team.matches_played = data['matches_played']
+        team.total_scored = data['total_scored']
+        team.total_conceded = data['total_conceded']
+
+    for team, opponent, meetings in snapshot['head_to_head']:
+        state.head_to_head[(team, opponent)] = deque(
+            (tuple(m) for m in meetings), maxlen=state.h2h_window)
+
+    if snapshot['last_date'] is not None:
+        state.last_date = pd.Timestamp(snapshot['last_date'])
+    return state
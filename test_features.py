@@ -0,0 +1,251 @@
+import numpy as np
+import pandas as pd
+
+from elo import compute_elo, elo_sweep
+from feature_engine import (FEATURE_COLUMNS, build_features, build_features_sharded, league_shards,
+                            stale_matches)
+from storage import DEFAULT_FORMAT, read_table, write_table
+from team_state import FeatureState, load_snapshot, save_snapshot
+
+
+def load_matches():
+    df = pd.read_csv("processed_with_b365_data.csv")
+    df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
+    df.sort_values(by='Date', inplace=True)
+    df.reset_index(drop=True, inplace=True)
+    return df
+
+
+def test_build_features_matches_saved_dataset():
+    df = load_matches()
+    expected = pd.read_csv("processed_with_all_features.csv", float_precision='round_trip')
+
+    features, _ = build_features(df)
+
+    pd.testing.assert_frame_equal(features, expected[FEATURE_COLUMNS], check_exact=True)
+
+
+def test_streaming_state_matches_batch_engine():
+    df = load_matches()
+    expected, elo_ratings = build_features(df)
+
+    state = FeatureState()
+    streamed = pd.DataFrame(state.replay(df), columns=FEATURE_COLUMNS).astype(float)
+
+    pd.testing.assert_frame_equal(streamed, expected, check_exact=True)
+    assert {team: s.elo for team, s in state.teams.items()} == elo_ratings
+
+
+def test_sharded_features_match_single_process():
+    df = load_matches()
+    # Вторая лига — те же матчи с другими командами, вперемешку по дате
+    other = df.assign(HomeTeam=df['HomeTeam'] + ' II', AwayTeam=df['AwayTeam'] + ' II')
+    leagues = pd.concat([df.assign(Div='E0'), other.assign(Div='E1')], ignore_index=True)
+    leagues = leagues.sort_values(by='Date', kind='stable').reset_index(drop=True)
+
+    expected, expected_ratings = build_features(leagues)
+    features, ratings = build_features_sharded(leagues, workers=2)
+
+    assert len(league_shards(leagues)) == 2
+    pd.testing.assert_frame_equal(features, expected, check_exact=True)
+    assert list(ratings.items()) == list(expected_ratings.items())
+
+    # Общая команда связывает лиги — они считаются одним шардом
+    leagues.loc[len(leagues) - 1, 'HomeTeam'] = df['HomeTeam'].iloc[0]
+    assert len(league_shards(leagues)) == 1
+
+
+def test_incremental_build_from_snapshot(tmp_path):
+    df = load_matches()
+    expected, _ = build_features(df)
+
+    cutoff = df['Date'].iloc[800]
+    history = df[df['Date'] <= cutoff]
+    _, elo_ratings = build_features(history)
+    save_snapshot(FeatureState.from_history(history, elo_ratings), tmp_path / "state.json.gz")
+
+    state = load_snapshot(tmp_path / "state.json.gz")
+    new_rows = df[df['Date'] > state.last_date]
+    streamed = pd.DataFrame(state.replay(new_rows), columns=FEATURE_COLUMNS, index=new_rows.index).astype(float)
+
+    pd.testing.assert_frame_equal(streamed, expected.loc[new_rows.index], check_exact=True)
+
+    # Досчёт возможен, только если история до снимка не менялась
+    assert stale_matches(df, history, cutoff).empty
+    late = history.iloc[[-1]].assign(HomeTeam="Late United")
+    corrected = history.copy()
+    corrected.loc[corrected.index[0], 'FTR'] = 'D' if corrected['FTR'].iloc[0] != 'D' else 'H'
+    assert len(stale_matches(pd.concat([df, late]), history, cutoff)) == 1
+    assert len(stale_matches(df, corrected, cutoff)) == 1
+
+
+def test_elo_sweep_matches_scalar_elo():
+    df = load_matches()
+    expected, _ = build_features(df)
+
+    sweep = elo_sweep(df['HomeTeam'], df['AwayTeam'], df['FTR'],
+                      k=[16, 32, 48], home_advantage=[0, 60], initial=[1500])
+
+    default = sweep.params.index[(sweep.params['k'] == 32) & (sweep.params['home_advantage'] == 0)][0]
+    np.testing.assert_allclose(sweep.columns(default)['HomeTeam_Elo'], expected['HomeTeam_Elo'], rtol=1e-12)
+    np.testing.assert_allclose(sweep.columns(default)['AwayTeam_Elo'], expected['AwayTeam_Elo'], rtol=1e-12)
+
+    home_elo, away_elo, _ = compute_elo(df['HomeTeam'], df['AwayTeam'], df['FTR'], k=16, home_advantage=60)
+    other = sweep.params.index[(sweep.params['k'] == 16) & (sweep.params['home_advantage'] == 60)][0]
+    np.testing.assert_allclose(sweep.home_elo[:, other], home_elo)
+    np.testing.assert_allclose(sweep.away_elo[:, other], away_elo)
+    assert np.isfinite(sweep.params['log_loss']).all()
+
+
+def test_typed_storage_round_trip(tmp_path):
+    df = read_table("processed_with_b365_data.csv")
+    assert isinstance(df['HomeTeam'].dtype, pd.CategoricalDtype)
+    assert df['HS'].dtype == np.float32
+    assert pd.api.types.is_datetime64_any_dtype(df['Date'])
+
+    # Фичи по типизированным колонкам не отличаются от сохранённого датасета
+    df.sort_values(by='Date', inplace=True)
+    df.reset_index(drop=True, inplace=True)
+    features, _ = build_features(df)
+    expected = pd.read_csv("processed_with_all_features.csv", float_precision='round_trip')
+    pd.testing.assert_frame_equal(features, expected[FEATURE_COLUMNS], check_exact=True)
+
+    # Основной формат + экспорт в CSV, побайтно совпадающий с исходным файлом
+    for column in FEATURE_COLUMNS:
+        df[column] = features[column]
+    write_table(df, tmp_path / "features", DEFAULT_FORMAT, csv_export=True)
+    with open(tmp_path / "features.csv", 'rb') as exported, open("processed_with_all_features.csv", 'rb') as saved:
+        assert exported.read() == saved.read()
+
+    loaded = read_table(str(tmp_path / "features"), columns=['Date', 'HomeTeam', 'HS', 'HomeTeam_Elo'])
+    assert list(loaded.columns) == ['Date', 'HomeTeam', 'HS', 'HomeTeam_Elo']
+    pd.testing.assert_frame_equal(loaded, df[loaded.columns], check_categorical=False)
+
+
+def test_season_ingestion_is_incremental(tmp_path):
+    from ingest import SCHEMA, ingest
+
+    source = tmp_path / "seasons"
+    source.mkdir()
+    (source / "2000-01.csv").write_bytes(
+        "Div,Date,HT,AT,FTR,HS,AS,BbAvH,BbAvD,BbAvA,Referee\n"
+        "E0,19/08/00,Chelsea,West Ham,H,17,12,1.5,3.6,6.0,Gérard\n"
+        ",,,,,,,,,,\n".encode('latin-1'))
+    (source / "2024-25.csv").write_text(
+        "Div,Date,Time,HomeTeam,AwayTeam,FTR,HS,AS,B365H,B365D,B365A,XYZH\n"
+        "E0,16/08/2024,20:00,Man United,Fulham,H,14,10,1.6,4.2,5.25,1.1\n")
+    kwargs = dict(output=str(tmp_path / "combined"), manifest_path=str(tmp_path / "manifest.json"),
+                  cache_dir=str(tmp_path / "cache"), workers=2, log=lambda message: None)
+
+    assert ingest([str(source)], **kwargs)['read'] == 2
+    combined = pd.read_csv(tmp_path / "combined.csv")
+    assert list(combined.columns) == SCHEMA
+    assert combined['Date'].tolist() == ["19/08/2000", "16/08/2024"]
+    assert combined['HomeTeam'].tolist() == ["Chelsea", "Man United"]
+    assert combined['AvgH'].iloc[0] == 1.5 and np.isnan(combined['AvgH'].iloc[1])
+    assert combined['Referee'].iloc[0] == "Gérard"
+
+    assert ingest([str(source)], **kwargs)['read'] == 0
+
+    (source / "2024-25.csv").write_text(
+        "Div,Date,HomeTeam,AwayTeam,FTR\nE0,16/08/2024,Man United,Fulham,H\nE0,17/08/2024,Ipswich,Liverpool,A\n")
+    (source / "2000-01.csv").unlink()
+    summary = ingest([str(source)], **kwargs)
+    assert (summary['read'], summary['reused'], summary['removed']) == (1, 0, 1)
+    assert len(pd.read_csv(tmp_path / "combined.csv")) == 2
+    assert len(list((tmp_path / "cache").iterdir())) == 1
+
+    # Испорченная правка уже загруженного сезона не выбрасывает его из таблицы
+    good = (source / "2024-25.csv").read_bytes()
+    (source / "2024-25.csv").write_text("Date,HomeTeam\n16/08/2024,Man United\n")
+    summary = ingest([str(source)], **kwargs)
+    assert summary['failed'] == [str(source / "2024-25.csv")] and summary['removed'] == 0
+    assert len(pd.read_csv(tmp_path / "combined.csv")) == 2
+    (source / "2024-25.csv").write_bytes(good)
+    summary = ingest([str(source)], **kwargs)
+    assert (summary['read'], summary['failed']) == (0, [])  # содержимое совпало с кэшем
+
+    # Одинаковые по содержимому файлы разных сезонов сохраняют свои метки
+    (source / "2025-26.csv").write_bytes((source / "2024-25.csv").read_bytes())
+    ingest([str(source)], **kwargs)
+    combined = pd.read_csv(tmp_path / "combined.csv")
+    assert combined['Season'].tolist() == ["2024-25"] * 2 + ["2025-26"] * 2
+
+    # Все сезоны удалены — объединённая таблица тоже
+    for path in source.iterdir():
+        path.unlink()
+    assert ingest([str(source)], **kwargs)['removed'] == 2
+    assert not (tmp_path / "combined.csv").exists()
+    assert not list((tmp_path / "cache").iterdir())
+
+
+def test_chunked_filter_matches_whole_file(tmp_path):
+    from filter import filter_results
+
+    source = pd.read_csv("combined_epl_results.csv", dtype={'Date': str})
+    broken = source.iloc[[10, 250, 600]].assign(Date="31/02/2023")
+    future = source.iloc[[20, 700]].assign(Date="01/01/2099")
+    source = pd.concat([source, broken, future]).sort_index(kind='stable')
+    source.to_csv(tmp_path / "combined.csv", index=False)
+
+    whole = filter_results(tmp_path / "combined.csv", tmp_path / "whole", fmt='csv')
+    chunked = filter_results(tmp_path / "combined.csv", tmp_path / "chunked", fmt='csv', chunk_size=100)
+
+    assert whole.shape == chunked.shape == (1120, len(whole.head.columns))
+    assert chunked.ordered
+    # Счётчики диагностики суммируются по всем чанкам
+    for result in (whole, chunked):
+        assert (result.invalid_dates.count, result.future_matches.count) == (3, 2)
+    pd.testing.assert_frame_equal(read_table(tmp_path / "chunked"), read_table(tmp_path / "whole"))
+
+    # Вход из ingest.py --format parquet: даты уже datetime, чанки — пакеты строк
+    parsed = source.assign(Date=pd.to_datetime(source['Date'], format='%d/%m/%Y', errors='coerce'))
+    write_table(parsed, tmp_path / "combined_parquet", 'parquet')
+    for chunk_size in (None, 100):
+        result = filter_results(tmp_path / "combined_parquet.parquet", tmp_path / "from_parquet", fmt='csv',
+                                chunk_size=chunk_size)
+        assert (result.invalid_dates.count, result.future_matches.count) == (3, 2)
+        pd.testing.assert_frame_equal(read_table(tmp_path / "from_parquet"), read_table(tmp_path / "whole"))
+
+
+def test_pipeline_skips_unchanged_stages(tmp_path):
+    from pipeline import Stage, copy_files, run_pipeline
+
+    source, middle, target = (str(tmp_path / name) for name in ("a.txt", "b.txt", "c.txt"))
+    (tmp_path / "a.txt").write_text("1")
+    stages = [
+        Stage('first', copy_files, ([(source, middle)],), inputs=[source], outputs=[middle]),
+        Stage('second', copy_files, ([(middle, target)],), inputs=[middle], outputs=[target], deps=['first']),
+    ]
+    kwargs = dict(state_path=str(tmp_path / "state.json"), log_dir=str(tmp_path / "logs"), log=lambda message: None)
+
+    def statuses(**extra):
+        return {name: report['status'] for name, report in run_pipeline(stages, **kwargs, **extra).items()}
+
+    assert statuses() == {'first': 'ran', 'second': 'ran'}
+    assert statuses() == {'first': 'cached', 'second': 'cached'}
+    assert statuses(force=['second']) == {'first': 'cached', 'second': 'ran'}
+
+    # Изменился выход этапа — он перезапускается, а следующий этап видит те же входы
+    (tmp_path / "b.txt").write_text("2")
+    assert statuses() == {'first': 'ran', 'second': 'cached'}
+
+    (tmp_path / "a.txt").write_text("3")
+    assert statuses() == {'first': 'ran', 'second': 'ran'}
+    assert (tmp_path / "c.txt").read_text() == "3"
+
+    (tmp_path / "a.txt").unlink()
+    assert statuses() == {'first': 'failed', 'second': 'blocked'}
+
+
+def test_synthetic_dataset_matches_schema():
+    from benchmark import synthetic_dataset, synthetic_matches
+
+    df = synthetic_dataset(scale=1)
+    saved = read_table("processed_with_all_features")
+    assert [c for c in df.columns if c != 'Div'] == [c for c in saved.columns if c != 'Div']
+    assert abs(len(df) - len(saved)) < 0.05 * len(saved)
+    assert df['Date'].is_monotonic_increasing and set(df['FTR']) == {'H', 'D', 'A'}
+
+    large = synthetic_matches(scale=100)
+    assert large['Div'].nunique() > 1 and abs(len(large) - 100 * len(saved)) < 0.05 * 100 * len(saved)
@@ -1,4 +1,27 @@
-from app.predictor import predict_match
+import asyncio
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import time
+from datetime import date
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.batcher import MicroBatcher
+from app.cache import PredictionCache
+from app.hydration import FeatureHydrator
+from app.logging_setup import BatchedJsonWriter, DroppingQueueHandler, SamplingFilter
+from app.metrics import Counter, Histogram, MetricsRegistry
+from app.online import OnlineUpdater
+from app.predictor import bundle, predict_batch, predict_match
+from app.registry import ModelRegistry
+from season_sim import SeasonFixtures, fixture_probabilities, simulate_season
 
 test_data = {
     "HomeTeam": "Chelsea",
@@ -14,8 +37,591 @@ test_data = {
     "AwayTeam_Elo": 1820.0
 }
 
+
+def load_requests(n=20):
+    df = pd.read_csv("data/processed_with_all_features.csv", parse_dates=['Date']).tail(n)
+    df['Year'], df['Month'], df['Day'] = df['Date'].dt.year, df['Date'].dt.month, df['Date'].dt.day
+    return df.drop(columns=['Date', 'FTR']).to_dict('records')
+
+
+@pytest.fixture(scope="module")
+def api(tmp_path_factory):
+    # Приложение импортируется как под uvicorn (из каталога app), лог пишется во временный файл
+    from fastapi.testclient import TestClient
+
+    app_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app")
+    os.environ["LOG_FILE"] = str(tmp_path_factory.mktemp("logs") / "app.log")
+    sys.path.insert(0, app_dir)
+    try:
+        import main
+    finally:
+        sys.path.remove(app_dir)
+        del os.environ["LOG_FILE"]
+    return main, TestClient(main.app)
+
+
+def test_predict_batch_matches_single_predictions():
+    items = load_requests()
+    items.insert(3, {"HomeTeam": "Chelsea", "AwayTeam": "Arsenal"})
+
+    results = predict_batch(items)
+
+    assert len(results) == len(items)
+    assert "error" in results[3]
+    for item, result in zip(items[:3] + items[4:], results[:3] + results[4:]):
+        assert result["prediction"] == predict_match(item)
+        assert abs(sum(result["probabilities"].values()) - 1) < 1e-9
+
+
+def test_model_bundle_matches_sklearn_pipeline():
+    model = joblib.load("models/logistic_model.pkl")
+    scaler = joblib.load("models/scaler.pkl")
+    encoder = joblib.load("models/encoder.pkl")
+    imputer = joblib.load("models/imputer.pkl")
+    feature_names = joblib.load("models/feature_names.pkl")
+    kernel = bundle.get()
+    assert kernel.feature_names == feature_names
+
+    items = load_requests(200)
+    items.append(dict(items[0], HomeTeam="Unknown FC", AwayTeam="Another FC"))
+
+    df = pd.DataFrame(items)
+    encoded_teams = encoder.transform(df[['HomeTeam', 'AwayTeam']])
+    df['HomeTeam_encoded'] = encoded_teams['HomeTeam']
+    df['AwayTeam_encoded'] = encoded_teams['AwayTeam']
+    expected = model.predict_proba(scaler.transform(df[feature_names]))
+
+    X = np.vstack([kernel.vectorize(item) for item in items])
+
+    np.testing.assert_allclose(kernel.predict_proba(X), expected, rtol=1e-9, atol=1e-12)
+    np.testing.assert_array_equal(kernel.classes[kernel.predict_proba(X).argmax(axis=1)],
+                                  model.predict(scaler.transform(df[feature_names])))
+
+    # Путь десктопного приложения: пропуски заполняет SimpleImputer
+    X[::7, 2] = np.nan
+    df.loc[df.index[::7], feature_names[2]] = np.nan
+    imputed = df[feature_names].fillna(dict(zip(feature_names, imputer.statistics_)))
+    expected = model.predict_proba(scaler.transform(imputed))
+    np.testing.assert_allclose(kernel.predict_proba(X, impute=True), expected, rtol=1e-9, atol=1e-12)
+
+
+def test_bundle_rebuild_keeps_loaded_versions_consistent(tmp_path):
+    import copy
+
+    from model_bundle import build_bundle, load_bundle
+
+    artifacts = [joblib.load(f"models/{name}.pkl") for name in ("logistic_model", "scaler", "encoder")]
+    imputer = joblib.load("models/imputer.pkl")
+    feature_names = joblib.load("models/feature_names.pkl")
+    retrained = copy.deepcopy(artifacts[0])
+    retrained.coef_ = retrained.coef_ * 2
+
+    def build(model):
+        return build_bundle(tmp_path, model, *artifacts[1:], feature_names, imputer)
+
+    loaded = build(artifacts[0]).load_arrays()
+    X = np.vstack([loaded.vectorize(item) for item in load_requests(50)])
+    X[::5, 2] = np.nan
+    expected = loaded.predict_proba(X, impute=True)
+
+    # Манифест прочитан до пересборки, массивы — после: набор всё равно от одной сборки
+    pending = load_bundle(tmp_path)
+    build(retrained)
+    np.testing.assert_array_equal(pending.load_arrays().predict_proba(X, impute=True), expected)
+
+    rebuilt = build(retrained)
+    np.testing.assert_array_equal(loaded.predict_proba(X, impute=True), expected)
+    assert not np.allclose(rebuilt.predict_proba(X, impute=True), expected)
+    # На диске — только текущая и предыдущая сборки
+    assert len(list(tmp_path.glob("*.npy"))) == 2 * len(rebuilt.manifest["arrays"])
+
+    # Нелинейную модель в пакет не собрать — понятная ошибка вместо AttributeError
+    from sklearn.ensemble import RandomForestClassifier
+    with pytest.raises(ValueError, match="RandomForestClassifier"):
+        build(RandomForestClassifier())
+
+
+def test_hydrated_request_needs_only_teams():
+    hydrator = FeatureHydrator.from_table()
+
+    filled = hydrator.hydrate({"HomeTeam": "Chelsea", "AwayTeam": "Arsenal", "Date": "2025-08-23", "B365H": 1.9})
+
+    assert filled["B365H"] == 1.9
+    assert (filled["Year"], filled["Month"], filled["Day"]) == (2025, 8, 23)
+    assert filled["HomeTeam_Elo"] == hydrator.state.teams["Chelsea"].elo
+    assert predict_match(filled) in {"home_win", "draw", "away_win"}
+
+
+def test_fixture_data_predicts_from_last_match_of_pair():
+    from fixture_data import FixtureData, build_fixture_index
+
+    played = pd.DataFrame({
+        "HomeTeam": ["Arsenal", "Chelsea", "Arsenal"],
+        "AwayTeam": ["Chelsea", "Arsenal", "Chelsea"],
+    }, index=[10, 20, 30])
+    assert build_fixture_index(played) == {("Arsenal", "Chelsea"): 2, ("Chelsea", "Arsenal"): 1}
+
+    data = FixtureData.load()
+    pairs = data.full_data.groupby(["HomeTeam", "AwayTeam"], observed=True).size()
+    home, away = pairs[pairs > 1].index[0]
+    position = data.fixture_index[(home, away)]
+    assert position == data.full_data.index[(data.full_data["HomeTeam"] == home)
+                                            & (data.full_data["AwayTeam"] == away)][-1]
+
+    # Прогноз строится по последнему матчу пары — как по таблице из одной этой строки
+    probs = data.predict(home, away)
+    assert probs.shape == (3,)
+    np.testing.assert_allclose(probs.sum(), 1)
+    np.testing.assert_allclose(probs, FixtureData(data.full_data.iloc[[position]]).predict(home, away))
+
+    assert data.predict(home, home) is None and not data.has_fixture(home, home)
+
+
+def test_desktop_startup_defers_pandas_and_warms_model():
+    import subprocess
+
+    from fixture_data import warm_up_model
+
+    # Окно показывается до загрузки данных: импорт модуля не тянет pandas
+    check = "import sys, fixture_data; print('pandas' in sys.modules)"
+    output = subprocess.run([sys.executable, "-c", check], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert output.stdout.strip() == "False"
+
+    model = warm_up_model()
+    assert {"weights", "bias", "fill_values", "team_lookup"} <= set(vars(model))
+
+
+def test_season_simulation():
+    played = pd.DataFrame({
+        "Date": pd.to_datetime(["2024-08-17", "2024-09-01", "2025-01-04"]),
+        "HomeTeam": ["Arsenal", "Chelsea", "Everton"],
+        "AwayTeam": ["Chelsea", "Everton", "Arsenal"],
+        "FTR": ["H", "D", "A"],
+    })
+    fixtures = SeasonFixtures(played)
+    assert fixtures.points.tolist() == [6, 1, 1]
+    assert sorted(fixtures.fixtures) == [("Arsenal", "Everton"), ("Chelsea", "Arsenal"), ("Everton", "Chelsea")]
+
+    # Хозяева выигрывают всегда: итог детерминирован, кроме жребия при равенстве очков
+    probs = np.tile([1.0, 0.0, 0.0], (len(fixtures.fixtures), 1))
+    result = simulate_season(fixtures, probs, n_simulations=5000, chunk_size=1000, seed=0)
+    np.testing.assert_allclose(result.mean_points, [9, 4, 4])
+    assert result.position_probs[0, 0] == 1
+    np.testing.assert_allclose(result.position_probs.sum(axis=1), 1)
+    assert abs(result.position_probs[1, 1] - 0.5) < 0.05
+
+    assert simulate_season(fixtures, probs, cancelled=lambda: True) is None
+
+    hydrator = FeatureHydrator.from_table()
+    real = fixture_probabilities(bundle.get(), hydrator, [("Chelsea", "Arsenal"), ("Arsenal", "Chelsea")])
+    np.testing.assert_allclose(real.sum(axis=1), 1)
+
+
+def test_experiment_grid_matches_single_training(tmp_path):
+    from experiments import run_grid
+    from storage import read_table
+    from train import train
+
+    df = read_table("processed_with_all_features")
+    table = run_grid(df, ("none", "smote"), ("logistic", "logistic_balanced"), workers=2, log=lambda message: None)
+
+    assert len(table) == 4 and "error" not in table
+    assert table["f1_weighted"].is_monotonic_decreasing
+    row = table[(table["resampler"] == "smote") & (table["model"] == "logistic")].iloc[0]
+    result = train(df, "smote", "logistic")
+    for metric in ("f1_weighted", "roc_auc_ovr", "roc_auc_A", "roc_auc_D", "roc_auc_H"):
+        assert row[metric] == result.metrics[metric]
+
+    # Имя артефакта не зависит от выбранной модели
+    saved = {os.path.basename(path) for path in result.save(tmp_path)}
+    assert "model.pkl" in saved and "logistic_model.pkl" not in saved
+
+
+def test_walk_forward_backtest():
+    from backtest import IncrementalFeatures, RefitFeatures, matchweeks, run_backtest
+    from storage import read_table
+    from train import prepare_dataset
+
+    df = read_table("processed_with_all_features").sort_values(by="Date", kind="stable").reset_index(drop=True)
+    rounds = matchweeks(df)
+    for _, matches in df.groupby(rounds):
+        teams = pd.concat([matches["HomeTeam"], matches["AwayTeam"]])
+        assert not teams.duplicated().any()
+    assert pd.Series(rounds).groupby(df["Date"]).nunique().max() == 1
+
+    # Накопленные статистики дают ту же матрицу, что и пересчёт с нуля
+    X, y = prepare_dataset(df)
+    incremental, refit = IncrementalFeatures(X, y), RefitFeatures(X, y)
+    for end in (300, 310, 330):
+        incremental.fit_until(end)
+        refit.fit_until(end)
+        np.testing.assert_allclose(incremental.transform(0, end + 10), refit.transform(0, end + 10), atol=1e-12)
+
+    fast = run_backtest(df, resampler="none", max_rounds=15)
+    reference = run_backtest(df, resampler="none", max_rounds=15, incremental=False)
+    assert len(fast.predictions) == len(reference.predictions) and fast.steps == 15
+    assert fast.predictions["Date"].min() > df["Date"].iloc[0]
+    assert abs(fast.metrics["log_loss"] - reference.metrics["log_loss"]) < 0.01
+
+
+def test_online_update_from_results():
+    hydrator = FeatureHydrator.from_table()
+    result = {"HomeTeam": "Chelsea", "AwayTeam": "Arsenal", "Date": "2025-08-16", "FTR": "H", "HST": 9, "AST": 2}
+    features = hydrator.hydrate(result)
+    elo = hydrator.state.teams["Chelsea"].elo
+    assert not hydrator.is_recorded(result)
+    hydrator.record(result)
+    assert hydrator.is_recorded(result) and hydrator.state.teams["Chelsea"].elo > elo
+    assert hydrator.hydrate({"HomeTeam": "Chelsea", "AwayTeam": "Arsenal"})["HomeTeam_Elo"] > elo
+
+    model = bundle.get()
+    X = np.array([model.vectorize(features)] * 4)
+    y = np.array([2] * 4)
+    # Нулевой шаг: перевод весов в стандартизованное пространство и обратно без потерь
+    same = model.partial_fit(X, y, learning_rate=0.0, alpha=0.0)
+    np.testing.assert_allclose(same.predict_proba(X), model.predict_proba(X), rtol=1e-10)
+    assert same.version == f"{model.version}-online1"
+
+    before = model.predict_proba(X)[0, 2]
+    updated = model.partial_fit(X, y, learning_rate=0.5)
+    assert updated.predict_proba(X)[0, 2] > before
+    assert model.predict_proba(X)[0, 2] == before
+    assert updated.partial_fit(X, y).version == f"{model.version}-online2"
+
+
+def test_online_update_takes_over_routing():
+    base = bundle.get()
+    items = load_requests(6)
+    X = np.array([base.vectorize(item) for item in items])
+    challenger = base.partial_fit(X, np.array([0] * len(X)), version="challenger")
+
+    registry = ModelRegistry()
+    registry.register(base, activate=True)
+    registry.register(challenger)
+    registry.set_traffic({str(base.version): 3, "challenger": 1})
+    updater = OnlineUpdater(registry, learning_rate=0.5)
+
+    # Онлайн-версия получает долю исходной в A/B, а не теряется за разбиением трафика
+    first = updater.update(items, ["H"] * len(items))
+    assert registry.status()["traffic"] == {first: 3.0, "challenger": 1.0}
+    assert registry.status()["active"] == first and str(base.version) in registry.status()["versions"]
+
+    second = updater.update(items, ["H"] * len(items))
+    status = registry.status()
+    assert status["traffic"] == {second: 3.0, "challenger": 1.0} and status["active"] == second
+    assert set(status["versions"]) == {str(base.version), "challenger", second}
+
+
+def test_results_update_state_cache_and_model(api, monkeypatch):
+    main, client = api
+    # Состояние команд и маршрутизация восстанавливаются после теста
+    monkeypatch.setattr(main, "hydrator", FeatureHydrator.from_table())
+    monkeypatch.setattr(main.registry, "_routing", main.registry._routing)
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    headers = {"X-Admin-Token": "secret"}
+    base_version = main.registry.status()["active"]
+
+    match = {"HomeTeam": "Chelsea", "AwayTeam": "Arsenal", "Date": "2025-08-23"}
+    client.post("/predict", json=match)
+    assert client.post("/predict", json=match).headers["X-Cache"] == "HIT"
+    elo = main.hydrator.state.teams["Chelsea"].elo
+
+    result = {"HomeTeam": "Chelsea", "AwayTeam": "Arsenal", "Date": "2025-08-16",
+              "FTHG": 2, "FTAG": 0, "HST": 7, "AST": 2}
+    response = client.post("/results", json={"results": [result]}, headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {"recorded": 1, "last_date": "2025-08-16", "model_update": "scheduled"}
+
+    # Состояние команд продвинулось, кэш сброшен
+    assert main.hydrator.is_recorded(result) and main.hydrator.state.teams["Chelsea"].elo > elo
+    assert main.hydrator.state.last_date == pd.Timestamp("2025-08-16")
+    predicted = client.post("/predict", json=match)
+    assert predicted.headers["X-Cache"] == "MISS"
+
+    # Фоновая задача дообучила модель: новая версия активна и отвечает на запросы
+    online_version = main.registry.status()["active"]
+    assert online_version == f"{base_version}-online1"
+    assert predicted.headers["X-Model-Version"] == online_version
+
+    # Повтор и результат раньше уже учтённой даты отклоняются
+    assert client.post("/results", json={"results": [result]}, headers=headers).status_code == 409
+    older = {**result, "HomeTeam": "Everton", "Date": "2025-08-01"}
+    assert client.post("/results", json={"results": [older]}, headers=headers).status_code == 409
+    assert main.registry.status()["active"] == online_version
+
+
+def test_results_require_admin_token(api, monkeypatch):
+    main, client = api
+    result = {"HomeTeam": "Chelsea", "AwayTeam": "Arsenal", "Date": "2030-08-16",
+              "FTHG": 2, "FTAG": 0, "HST": 7, "AST": 2}
+    state = main.hydrator.state
+    elo = state.teams["Chelsea"].elo
+
+    monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+    assert client.post("/results", json={"results": [result]}).status_code == 403
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    assert client.post("/results", json={"results": [result]}).status_code == 403
+    assert client.post("/results", json={"results": [result]},
+                       headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+    # Отклонённые результаты не трогают состояние команд
+    assert main.hydrator.state is state and state.teams["Chelsea"].elo == elo
+    assert not main.hydrator.is_recorded(result)
+
+
+def test_micro_batcher_matches_predict_batch():
+    items = load_requests(50)
+    items[7] = {**items[7], "HS": "много"}  # некорректное значение — ошибка только у этого матча
+    expected = predict_batch(items)
+    assert "error" in expected[7] and "error" not in expected[8]
+
+    batches = []
+    batcher = MicroBatcher(predict_batch, max_batch_size=16, max_wait=0.001, batch_observer=batches.append)
+
+    async def run():
+        return await asyncio.gather(*(batcher.submit(item, bundle.get()) for item in items))
+
+    results = asyncio.run(run())
+    assert batches == [16, 16, 16, 2]
+    assert results[7] == expected[7]
+    for result, reference in zip(results[:7] + results[8:], expected[:7] + expected[8:]):
+        assert result["prediction"] == reference["prediction"]
+        np.testing.assert_allclose(list(result["probabilities"].values()),
+                                   list(reference["probabilities"].values()), rtol=1e-9)
+
+
+def test_model_registry_routing():
+    base = bundle.get()
+    X = np.array([base.vectorize(item) for item in load_requests(8)])
+    y = np.array([2] * len(X))
+    models = {version: base.partial_fit(X, y, learning_rate=0.5, version=version) for version in ("a", "b", "c")}
+
+    registry = ModelRegistry()
+    changes = []
+    registry.listeners.append(lambda: changes.append(1))
+    for model in models.values():
+        registry.register(model)
+    assert registry.active_model() is models["a"] and len(changes) == 3
+
+    # Взвешенное разбиение трафика
+    registry.set_traffic({"a": 3, "b": 1})
+    random.seed(0)
+    picks = [registry.pick().version for _ in range(4000)]
+    assert set(picks) == {"a", "b"}
+    assert abs(picks.count("a") / len(picks) - 0.75) < 0.03
+    with pytest.raises(KeyError):
+        registry.set_traffic({"unknown": 1})
+
+    # Теневой скоринг: основная модель запроса в тень не попадает
+    registry.set_traffic({"a": 1}, shadow=["b", "c"])
+    assert registry.shadow_models(models["a"]) == [models["b"], models["c"]]
+    assert registry.shadow_models(models["b"]) == [models["c"]]
+
+    # Запрос доводит работу на взятой версии, даже если активная сменилась
+    picked = registry.pick()
+    registry.activate("b")
+    assert picked is models["a"] and registry.pick() is models["b"]
+    assert predict_batch(load_requests(3), picked) == predict_batch(load_requests(3), models["a"])
+    # activate сбрасывает разбиение трафика, но не теневые версии
+    assert registry.status()["traffic"] == {} and registry.status()["shadow"] == ["b", "c"]
+    assert {registry.pick().version for _ in range(100)} == {"b"}
+
+    with pytest.raises(ValueError):
+        registry.unload("b")
+    registry.unload("c")
+    assert set(registry.status()["versions"]) == {"a", "b"} and registry.status()["shadow"] == ["b"]
+
+
+def test_prediction_cache(tmp_path):
+    cache = PredictionCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)  # вытесняется давно не читанный "b"
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+    # Сброс во время расчёта: результат по старому состоянию не сохраняется
+    generation = cache.generation
+    cache.clear()
+    cache.set("d", 4, generation)
+    assert cache.get("d") is None
+    cache.set("d", 4, cache.generation)
+    assert cache.get("d") == 4
+
+    cache = PredictionCache(ttl=0.01)
+    cache.set("a", 1)
+    time.sleep(0.02)
+    assert cache.get("a") is None and cache.stats()["expirations"] == 1
+
+    # Округление чисел, порядок ключей и дата по умолчанию
+    key = cache.make_key({"HomeTeam": "Chelsea", "B365H": 2.10000001, "Date": None})
+    assert key == cache.make_key({"B365H": 2.1, "Date": date.today(), "HomeTeam": "Chelsea"})
+    assert key != cache.make_key({"HomeTeam": "Chelsea", "B365H": 2.1, "Date": "2025-08-16"})
+    assert key != cache.make_key({"HomeTeam": "Chelsea", "B365H": 2.11, "Date": None})
+
+    watched = tmp_path / "manifest.json"
+    watched.write_text("{}")
+    changed = []
+    cache = PredictionCache(watch_paths=[watched], check_interval=0)
+    cache.listeners.append(changed.extend)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    stat = os.stat(watched)
+    os.utime(watched, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert cache.get("a") is None
+    assert changed == [watched] and cache.stats()["invalidations"] == 1
+
+
+def test_prediction_cache_header_and_team_state_reload(api, monkeypatch):
+    main, client = api
+    match = {"HomeTeam": "Chelsea", "AwayTeam": "Arsenal", "Date": "2025-08-16"}
+
+    first = client.post("/predict", json=match)
+    second = client.post("/predict", json=match)
+    assert first.status_code == second.status_code == 200
+    assert (first.headers["X-Cache"], second.headers["X-Cache"]) == ("MISS", "HIT")
+    assert first.json() == second.json()
+
+    # Кэш сброшен, пока запрос ждал пакет: ответ не кэшируется
+    submit = main.batcher.submit
+
+    async def submit_during_reset(data, model):
+        main.cache.clear()
+        return await submit(data, model)
+
+    other = {**match, "Date": "2025-08-17"}
+    monkeypatch.setattr(main.batcher, "submit", submit_during_reset)
+    assert client.post("/predict", json=other).headers["X-Cache"] == "MISS"
+    monkeypatch.undo()
+    assert client.post("/predict", json=other).headers["X-Cache"] == "MISS"
+
+    # Новая таблица данных: состояние команд перечитывается, кэш сбрасывается
+    previous = main.hydrator
+    main.reload_hydrator()
+    assert main.hydrator is not previous
+    assert client.post("/predict", json=match).headers["X-Cache"] == "MISS"
+
+
+def test_predict_batch_endpoint(api):
+    _, client = api
+    matches = [
+        {"HomeTeam": "Chelsea", "AwayTeam": "Arsenal", "Date": "2025-08-23"},
+        {"HomeTeam": "Chelsea"},                                               # нет гостей
+        {"HomeTeam": "Everton", "AwayTeam": "Fulham", "B365H": 0.5},           # коэффициент < 1
+        {"HomeTeam": "Liverpool", "AwayTeam": "Everton", "Date": "2025-08-24"},
+        {"HomeTeam": "Fulham", "AwayTeam": "Chelsea", "HS": "много"},          # не число
+    ]
+
+    response = client.post("/predict/batch", json={"matches": matches})
+    assert response.status_code == 200
+    results = response.json()["results"]
+
+    # Порядок входа сохраняется, ошибки не валят остальные матчи
+    assert [result["index"] for result in results] == list(range(len(matches)))
+    assert [("error" in result) for result in results] == [False, True, True, False, True]
+    assert "AwayTeam" in results[1]["error"] and "HS" in results[4]["error"]
+    for i in (0, 3):
+        single = client.post("/predict", json=matches[i]).json()["result"]
+        assert results[i]["prediction"] == single
+        assert abs(sum(results[i]["probabilities"].values()) - 1) < 1e-9
+
+    oversized = {"matches": [matches[0]] * 1001}
+    assert client.post("/predict/batch", json=oversized).status_code == 422
+
+
+def test_metrics_exposition(api):
+    registry = MetricsRegistry()
+    latency = registry.register(Histogram("latency_seconds", "Задержка", ["stage"], buckets=(0.1, 1.0)))
+    errors = registry.register(Counter("errors_total", "Ошибки", ["detail"]))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        latency.observe(value, "model")
+    errors.inc('say "hi"\\n\nbye')
+
+    lines = set(registry.render().splitlines())
+    # Корзины накопительные, граница le включительная
+    assert {
+        'latency_seconds_bucket{stage="model",le="0.1"} 2',
+        'latency_seconds_bucket{stage="model",le="1.0"} 3',
+        'latency_seconds_bucket{stage="model",le="+Inf"} 4',
+        'latency_seconds_sum{stage="model"} 2.65',
+        'latency_seconds_count{stage="model"} 4',
+        'errors_total{detail="say \\"hi\\"\\\\n\\nbye"} 1',
+    } <= lines
+
+    # Через HTTP: метка path — шаблон маршрута, а не сырой путь
+    _, client = api
+    client.delete("/admin/models/metrics-probe")
+    body = client.get("/metrics").text
+    assert "# TYPE http_requests_total counter" in body
+    assert 'path="/admin/models/{version}"' in body and "metrics-probe" not in body
+    assert 'http_request_duration_seconds_bucket{method="DELETE",path="/admin/models/{version}",le="+Inf"}' in body
+
+
+def test_logging_drops_samples_and_rotates(tmp_path):
+    def record(level, message="x"):
+        return logging.LogRecord("app", level, __file__, 1, message, None, None)
+
+    # Переполненная очередь: запись отбрасывается и учитывается, вызов не ждёт
+    handler = DroppingQueueHandler(queue.Queue(maxsize=2))
+    started = time.perf_counter()
+    for _ in range(5):
+        handler.handle(record(logging.INFO))
+    assert time.perf_counter() - started < 0.5
+    assert handler.queue.qsize() == 2 and handler.dropped == 3
+
+    sampling = SamplingFilter(sample_rate=0.0)
+    assert not sampling.filter(record(logging.INFO))
+    assert sampling.filter(record(logging.WARNING)) and sampling.filter(record(logging.ERROR))
+
+    log_file = tmp_path / "app.log"
+    writer = BatchedJsonWriter(queue.Queue(), str(log_file), max_bytes=200, backup_count=2)
+    writer._write([record(logging.INFO, "first")])
+    assert not (tmp_path / "app.log.1").exists()
+    writer._write([record(logging.INFO, "second")] * 3)  # размер превышен — файл ротируется
+    assert (tmp_path / "app.log.1").exists() and log_file.stat().st_size == 0
+    for message in ("third", "fourth"):
+        writer._write([record(logging.INFO, message)] * 4)
+    writer._stream.close()
+
+    # Хранится не больше backup_count старых файлов, самые старые — с большим номером
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["app.log", "app.log.1", "app.log.2"]
+    assert json.loads((tmp_path / "app.log.1").read_text().splitlines()[0])["message"] == "fourth"
+    assert json.loads((tmp_path / "app.log.2").read_text().splitlines()[0])["message"] == "third"
+
+
+def test_admin_endpoints_require_token(api, monkeypatch):
+    _, client = api
+    requests = [
+        ("get", "/admin/models", None),
+        ("post", "/admin/models/load", {"path": "/tmp"}),
+        ("post", "/admin/models/traffic", {"traffic": {}}),
+        ("post", "/admin/models/1/activate", None),
+        ("delete", "/admin/models/1", None),
+    ]
+
+    def send(method, path, body, headers):
+        return getattr(client, method)(path, headers=headers, **({"json": body} if body else {}))
+
+    # Токен не задан — доступ закрыт для всех, в том числе с любым заголовком
+    monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+    for method, path, body in requests:
+        assert send(method, path, body, {}).status_code == 403
+        assert send(method, path, body, {"X-Admin-Token": ""}).status_code == 403
+
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    for method, path, body in requests:
+        assert send(method, path, body, {}).status_code == 403
+        assert send(method, path, body, {"X-Admin-Token": "wrong"}).status_code == 403
+    assert send("get", "/admin/models", None, {"X-Admin-Token": "secret"}).status_code == 200
+
+
 if __name__ == "__main__":
-    result = predict_match(test_data)
+    # predict_match возвращает только метку исхода; вероятности — в predict_batch
+    data = FeatureHydrator.from_table().hydrate(test_data)
+    result = predict_batch([data])[0]
+    assert predict_match(data) == result["prediction"]
     print("Prediction result:")
     print(f"Outcome: {result['prediction']}")
     print(f"Probabilities: {result['probabilities']}")
\ No newline at end of file
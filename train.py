@@ -0,0 +1,223 @@
+import argparse
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+# ----------------------------
+# Обучение модели исхода матча — сценарий из again.ipynb в виде этапа конвейера:
+# CatBoostEncoder для команд, стандартизация, балансировка классов
+# на обучающей выборке и классификатор. Артефакты сохраняются в models/.
+# ----------------------------
+
+DATA_PATH = os.path.join('data', 'processed_with_all_features')
+MODELS_DIR = 'models'
+
+RESULT_CODES = {'A': 0, 'D': 1, 'H': 2}
+# Не признаки: идентификаторы матча и цель
+NON_FEATURE_COLUMNS = ['Div', 'Season', 'Date', 'HomeTeam', 'AwayTeam', 'FTR']
+TEAM_COLUMNS = ['HomeTeam', 'AwayTeam']
+
+TEST_SIZE = 0.2
+SEED = 42
+
+
+def make_resampler(name, seed=SEED):
+    from imblearn.combine import SMOTEENN
+    from imblearn.over_sampling import ADASYN, SMOTE, BorderlineSMOTE
+    from imblearn.under_sampling import NearMiss, RandomUnderSampler
+
+    resamplers = {
+        'none': lambda: None,
+        'smote': lambda: SMOTE(random_state=seed),
+        'adasyn': lambda: ADASYN(random_state=seed),
+        'borderline_smote': lambda: BorderlineSMOTE(random_state=seed),
+        'undersample': lambda: RandomUnderSampler(random_state=seed),
+        'nearmiss': lambda: NearMiss(),
+        'smoteenn': lambda: SMOTEENN(random_state=seed),
+    }
+    if name not in resamplers:
+        raise ValueError(f"Неизвестный метод балансировки: {name} (доступны: {', '.join(resamplers)})")
+    return resamplers[name]()
+
+
+def make_model(name, seed=SEED):
+    from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+
+    models = {
+        'logistic': lambda: LogisticRegression(max_iter=1000, random_state=seed),
+        'logistic_balanced': lambda: LogisticRegression(class_weight='balanced', max_iter=1000, random_state=seed),
+        'random_forest': lambda: RandomForestClassifier(random_state=seed),
+        'random_forest_balanced': lambda: RandomForestClassifier(class_weight='balanced', random_state=seed),
+        'gradient_boosting': lambda: GradientBoostingClassifier(random_state=seed),
+    }
+    if name not in models:
+        raise ValueError(f"Неизвестная модель: {name} (доступны: {', '.join(models)})")
+    return models[name]()
+
+
+RESAMPLERS = ('none', 'smote', 'adasyn', 'borderline_smote', 'undersample', 'nearmiss', 'smoteenn')
+MODELS = ('logistic', 'logistic_balanced', 'random_forest', 'random_forest_balanced', 'gradient_boosting')
+
+
+def prepare_dataset(df):
+    """Признаки (с колонками команд) и цель: FTR -> 0/1/2, дата -> Year/Month/Day"""
+    data = df.reset_index(drop=True)
+    y = data['FTR'].astype(str).map(RESULT_CODES)
+    dates = pd.to_datetime(data['Date'])
+
+    X = data.drop(columns=[column for column in NON_FEATURE_COLUMNS if column in data and column not in TEAM_COLUMNS])
+    X = X.assign(Year=dates.dt.year, Month=dates.dt.month, Day=dates.dt.day)
+    for column in TEAM_COLUMNS:
+        X[column] = X[column].astype(str)
+    return X, y
+
+
+def encode_teams(X, encoder):
+    encoded = encoder.transform(X[TEAM_COLUMNS])
+    X = X.drop(columns=TEAM_COLUMNS)
+    X['HomeTeam_encoded'] = encoded['HomeTeam'].to_numpy()
+    X['AwayTeam_encoded'] = encoded['AwayTeam'].to_numpy()
+    return X
+
+
+def score_probabilities(y, proba, classes):
+    """Метрики по вероятностям исходов; столбцы proba соответствуют classes"""
+    from sklearn.metrics import accuracy_score, f1_score, log_loss, roc_auc_score
+
+    classes = np.asarray(classes)
+    predicted = classes[proba.argmax(axis=1)]
+    metrics = {
+        'f1_weighted': float(f1_score(y, predicted, average='weighted')),
+        'accuracy': float(accuracy_score(y, predicted)),
+        'log_loss': float(log_loss(y, proba, labels=classes)),
+        'roc_auc_ovr': float(roc_auc_score(y, proba, multi_class='ovr', labels=classes)),
+    }
+    # AUC по каждому исходу (один против остальных)
+    names = {code: result for result, code in RESULT_CODES.items()}
+    for i, code in enumerate(classes):
+        metrics[f'roc_auc_{names[code]}'] = float(roc_auc_score(np.asarray(y) == code, proba[:, i]))
+    return metrics
+
+
+def evaluate(model, X, y):
+    return score_probabilities(y, model.predict_proba(X), model.classes_)
+
+
+class TrainingResult:
+    def __init__(self, model, scaler, encoder, imputer, feature_names, metrics):
+        self.model = model
+        self.scaler = scaler
+        self.encoder = encoder
+        self.imputer = imputer
+        self.feature_names = feature_names
+        self.metrics = metrics
+
+    def save(self, output_dir=MODELS_DIR):
+        os.makedirs(output_dir, exist_ok=True)
+        artifacts = {
+            # Имя не зависит от типа модели; в пакет (model_bundle.py) собираются только линейные
+            'model.pkl': self.model,
+            'scaler.pkl': self.scaler,
+            'encoder.pkl': self.encoder,
+            'imputer.pkl': self.imputer,
+            'feature_names.pkl': self.feature_names,
+            'final_feature_order.pkl': self.feature_names,
+        }
+        for name, artifact in artifacts.items():
+            joblib.dump(artifact, os.path.join(output_dir, name))
+        with open(os.path.join(output_dir, 'metrics.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.metrics, f, ensure_ascii=False, indent=2)
+        return [os.path.join(output_dir, name) for name in list(artifacts) + ['metrics.json']]
+
+
+class DatasetSplit:
+    """Обучающая и тестовая выборки: кодировщик команд и скейлер обучены один раз"""
+
+    def __init__(self, encoder, scaler, feature_names, X_train, X_train_scaled, y_train, X_test_scaled, y_test):
+        self.encoder = encoder
+        self.scaler = scaler
+        self.feature_names = feature_names
+        self.X_train = X_train
+        self.X_train_scaled = X_train_scaled
+        self.y_train = y_train
+        self.X_test_scaled = X_test_scaled
+        self.y_test = y_test
+
+
+def split_dataset(df, test_size=TEST_SIZE, seed=SEED):
+    """Кодирование команд, разбиение и стандартизация — как в ноутбуке"""
+    from category_encoders import CatBoostEncoder
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import StandardScaler
+
+    X, y = prepare_dataset(df)
+
+    # Как в ноутбуке: кодировщик команд обучается на всех данных до разбиения
+    encoder = CatBoostEncoder()
+    encoder.fit(X[TEAM_COLUMNS], y)
+    X = encode_teams(X, encoder)
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=test_size, random_state=seed, stratify=y)
+
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train)
+    X_test_scaled = scaler.transform(X_test)
+    return DatasetSplit(encoder, scaler, list(X.columns), X_train, X_train_scaled, y_train, X_test_scaled, y_test)
+
+
+def resample(split, name, seed=SEED):
+    """Балансировка классов только на обучающей выборке"""
+    sampler = make_resampler(name, seed)
+    if sampler is None:
+        return split.X_train_scaled, split.y_train
+    return sampler.fit_resample(split.X_train_scaled, split.y_train)
+
+
+def train(df, resampler='smote', model='logistic', test_size=TEST_SIZE, seed=SEED):
+    """Обучение по сценарию ноутбука: кодирование команд, разбиение, стандартизация, балансировка"""
+    from sklearn.impute import SimpleImputer
+
+    split = split_dataset(df, test_size, seed)
+    X_train, y_train = resample(split, resampler, seed)
+
+    classifier = make_model(model, seed)
+    classifier.fit(X_train, y_train)
+
+    imputer = SimpleImputer(strategy='constant', fill_value=0)
+    imputer.fit(split.X_train)
+
+    metrics = dict(evaluate(classifier, split.X_test_scaled, split.y_test),
+                   resampler=resampler, model=model, train_rows=int(len(y_train)), test_rows=int(len(split.y_test)))
+    return TrainingResult(classifier, split.scaler, split.encoder, imputer, split.feature_names, metrics)
+
+
+if __name__ == '__main__':
+    from storage import read_table
+
+    parser = argparse.ArgumentParser(description="Обучение модели прогноза исхода матча")
+    parser.add_argument("--input", default=DATA_PATH)
+    parser.add_argument("--output-dir", default=MODELS_DIR)
+    parser.add_argument("--resampler", default='smote', choices=RESAMPLERS)
+    parser.add_argument("--model", default='logistic', choices=MODELS)
+    parser.add_argument("--test-size", type=float, default=TEST_SIZE)
+    parser.add_argument("--seed", type=int, default=SEED)
+    args = parser.parse_args()
+
+    print("🔄 Загружаем данные...")
+    df = read_table(args.input)
+
+    started = time.perf_counter()
+    result = train(df, args.resampler, args.model, args.test_size, args.seed)
+    elapsed = time.perf_counter() - started
+
+    print(f"\n📊 {args.model} + {args.resampler}: F1 = {result.metrics['f1_weighted']:.4f}, "
+          f"AUC = {result.metrics['roc_auc_ovr']:.4f}, log-loss = {result.metrics['log_loss']:.4f} "
+          f"({elapsed:.2f} с)")
+    for path in result.save(args.output_dir):
+        print(f"💾 {path}")